@@ -12,8 +12,9 @@ mail = Mail()  # ← ADICIONE ESTA LINHA
  
 @login_manager.user_loader 
 def load_user(user_id): 
-    from app.models import User 
-    return User.query.get(int(user_id)) 
+    from app import usuarios
+    # Cache por processo (app.usuarios): evita o SELECT em toda requisição
+    return usuarios.carregar(int(user_id))
  
 def create_app(): 
     app = Flask(__name__) 
@@ -29,10 +30,33 @@ def create_app():
     from app.routes.auth import auth_bp 
     from app.routes.usuario import usuario_bp 
     from app.routes.admin import admin_bp 
+    from app.routes.api import api_bp
 
     app.register_blueprint(main_bp) 
     app.register_blueprint(auth_bp) 
     app.register_blueprint(usuario_bp, url_prefix='/usuario') 
     app.register_blueprint(admin_bp, url_prefix='/admin') 
+    app.register_blueprint(api_bp, url_prefix='/api')
+
+    from app.commands import register_commands
+    register_commands(app)
+
+    from app import fila_email
+    fila_email.init_app(app)
+
+    from app import painel
+    painel.init_app(app)
+
+    from app import usuarios
+    usuarios.init_app(app)
+
+    from app import metricas
+    metricas.init_app(app)
+
+    from app import consultas_lentas
+    consultas_lentas.init_app(app)
+
+    from app import perfilador
+    perfilador.init_app(app)
 
     return app
\ No newline at end of file
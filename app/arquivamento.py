@@ -0,0 +1,140 @@
+"""Arquivamento de agendamentos encerrados.
+
+A tabela de agendamentos só cresce, e listagens, contagens e verificações de
+conflito passam pelos índices de anos de agendamentos já encerrados.
+arquivar() (comando `flask arquivar-agendamentos`, via cron) move para
+AgendamentoArquivo os agendamentos confirmados, cancelados ou rejeitados cujo
+início e última alteração são mais antigos que ARQUIVAMENTO_IDADE_DIAS, em
+lotes de ARQUIVAMENTO_LOTE linhas, cada lote numa transação curta: INSERT ...
+SELECT no arquivo e DELETE na tabela principal. Pendentes nunca são arquivados.
+
+O resumo dos dashboards e a consolidação de utilização continuam contando os
+arquivados (eles são recalculados a partir de historico()), e os relatórios
+podem incluí-los sob pedido.
+
+Os arquivados de uma doca, terminal ou usuário excluído pelo ORM saem junto,
+depois do flush. O ON DELETE CASCADE das chaves estrangeiras não basta: o
+SQLite (banco padrão) roda sem PRAGMA foreign_keys e deixaria as linhas órfãs.
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session, aliased
+from app import db, versoes
+from app.models import Agendamento, AgendamentoArquivo, Doca, Terminal, User
+
+STATUS_ENCERRADOS = ('confirmado', 'cancelado', 'rejeitado')
+
+
+def historico():
+    """Entidade com as colunas de Agendamento que lê a tabela principal e o
+    arquivo (UNION ALL). Somente para consultas: as instâncias não devem ser alteradas.
+    """
+    tabela = Agendamento.__table__
+    arquivo = AgendamentoArquivo.__table__
+    uniao = db.union_all(
+        db.select(*tabela.columns),
+        db.select(*(arquivo.c[coluna.name] for coluna in tabela.columns))
+    ).subquery('agendamento_historico')
+    return aliased(Agendamento, uniao)
+
+
+def entidade(incluir_arquivo):
+    """Agendamento, ou historico() quando os arquivados forem pedidos"""
+    return historico() if incluir_arquivo else Agendamento
+
+
+def arquivar_lote(idade, tamanho):
+    """Move até `tamanho` agendamentos encerrados com início e última alteração
+    mais antigos que `idade` (timedelta).
+
+    Retorna quantos foram movidos (0 quando não houver mais).
+    """
+    tabela = Agendamento.__table__
+    candidatos = db.select(tabela.c.id, tabela.c.doca_id).where(
+        tabela.c.data_agendamento < datetime.now() - idade,
+        tabela.c.status.in_(STATUS_ENCERRADOS),
+        # Alterações recentes ainda não consolidadas (app.utilizacao) ficam na tabela
+        db.or_(tabela.c.data_atualizacao.is_(None), tabela.c.data_atualizacao < datetime.utcnow() - idade)
+    ).order_by(tabela.c.data_agendamento, tabela.c.id).limit(tamanho)
+    if db.engine.dialect.name == 'sqlite':
+        # O SQLite reutiliza o maior id depois que ele é apagado; mantê-lo na
+        # tabela evita que um agendamento novo receba o id de um arquivado
+        candidatos = candidatos.where(tabela.c.id < db.select(func.max(tabela.c.id)).scalar_subquery())
+    else:
+        # Linhas sendo alteradas por outra transação ficam para o próximo lote
+        candidatos = candidatos.with_for_update(skip_locked=True)
+
+    linhas = db.session.execute(candidatos).all()
+    if not linhas:
+        return 0
+    ids = [linha.id for linha in linhas]
+
+    colunas = [coluna.name for coluna in tabela.columns]
+    db.session.execute(
+        db.insert(AgendamentoArquivo).from_select(
+            colunas + ['data_arquivamento'],
+            db.select(*tabela.columns, db.literal(datetime.utcnow(), db.DateTime)).where(tabela.c.id.in_(ids))
+        )
+    )
+    db.session.execute(tabela.delete().where(tabela.c.id.in_(ids)))
+    # DELETE direto, fora do ORM: a API precisa saber que as docas mudaram
+    versoes.marcar_docas({linha.doca_id for linha in linhas})
+    db.session.commit()
+    return len(ids)
+
+
+def arquivar(idade_dias=None, lote=None, maximo=None):
+    """Arquiva em lotes os agendamentos encerrados mais antigos que `idade_dias`.
+
+    `maximo` limita o total movido numa execução. Retorna o total arquivado.
+    """
+    config = current_app.config
+    idade_dias = config['ARQUIVAMENTO_IDADE_DIAS'] if idade_dias is None else idade_dias
+    lote = lote or config['ARQUIVAMENTO_LOTE']
+    idade = timedelta(days=idade_dias)
+
+    total = 0
+    while maximo is None or total < maximo:
+        tamanho = lote if maximo is None else min(lote, maximo - total)
+        movidos = arquivar_lote(idade, tamanho)
+        if not movidos:
+            break
+        total += movidos
+    return total
+
+
+@event.listens_for(Session, 'before_flush')
+def _detectar_exclusoes(session, flush_context, instances):
+    docas = set()
+    usuarios = set()
+    for objeto in session.deleted:
+        if isinstance(objeto, Doca):
+            docas.add(objeto.id)
+        elif isinstance(objeto, Terminal):
+            docas.update(doca.id for doca in objeto.docas)
+        elif isinstance(objeto, User):
+            usuarios.add(objeto.id)
+    if docas:
+        session.info.setdefault('arquivo_docas', set()).update(docas)
+    if usuarios:
+        session.info.setdefault('arquivo_usuarios', set()).update(usuarios)
+
+
+@event.listens_for(Session, 'after_flush')
+def _excluir_arquivados(session, flush_context):
+    docas = session.info.pop('arquivo_docas', None)
+    usuarios = session.info.pop('arquivo_usuarios', None)
+    condicoes = []
+    if docas:
+        condicoes.append(AgendamentoArquivo.doca_id.in_(docas))
+    if usuarios:
+        condicoes.append(AgendamentoArquivo.user_id.in_(usuarios))
+    if condicoes:
+        session.execute(db.delete(AgendamentoArquivo).where(db.or_(*condicoes)))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_exclusoes(session):
+    session.info.pop('arquivo_docas', None)
+    session.info.pop('arquivo_usuarios', None)
@@ -0,0 +1,161 @@
+import click
+from datetime import datetime, timedelta
+from flask.cli import with_appcontext
+
+
+@click.command('alocar-agendamentos')
+@click.option('--dias', default=7, show_default=True, help='Horizonte em dias a partir de agora.')
+@with_appcontext
+def alocar_agendamentos_command(dias):
+    """Aloca os agendamentos pendentes do horizonte nas docas compatíveis"""
+    from app.scheduling import alocar_pendentes
+
+    inicio = datetime.now()
+    alocados, nao_alocados = alocar_pendentes(inicio, inicio + timedelta(days=dias))
+    click.echo(f'Alocados: {alocados} | Sem doca livre: {nao_alocados}')
+
+
+@click.command('reconstruir-resumo')
+@with_appcontext
+def reconstruir_resumo_command():
+    """Recalcula o resumo de agendamentos dos dashboards a partir da tabela de agendamentos"""
+    from app.resumo import reconstruir
+
+    click.echo(f'Resumo reconstruído: {reconstruir()} linha(s)')
+
+
+@click.command('atualizar-utilizacao')
+@click.option('--completo', is_flag=True, help='Reprocessa todo o histórico.')
+@with_appcontext
+def atualizar_utilizacao_command(completo):
+    """Consolida a utilização diária das docas (execute periodicamente, ex.: via cron)"""
+    from app.utilizacao import atualizar
+
+    click.echo(f'Dias consolidados: {atualizar(completo=completo)}')
+
+
+@click.command('enviar-emails')
+@with_appcontext
+def enviar_emails_command():
+    """Envia os emails pendentes da fila (alternativa aos workers do processo web)"""
+    from app.email import processar_resumo_admin
+    from app.fila_email import esvaziar_fila
+
+    processar_resumo_admin()
+    enviados, falhas = esvaziar_fila()
+    click.echo(f'Enviados: {enviados} | Falhas: {falhas}')
+
+
+@click.command('importar-agendamentos')
+@click.argument('arquivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--usuario', 'email', required=True, help='Email do usuário dono dos agendamentos.')
+@click.option('--somente-validar', is_flag=True, help='Apenas valida, sem gravar.')
+@with_appcontext
+def importar_agendamentos_command(arquivo, email, somente_validar):
+    """Importa agendamentos de um arquivo CSV, JSON ou NDJSON"""
+    from app.importacao import ErroImportacao, importar, ler_arquivo
+    from app.models import User
+
+    usuario = User.query.filter_by(email=email).first()
+    if usuario is None:
+        raise click.ClickException(f'Usuário {email} não encontrado')
+
+    with open(arquivo, 'rb') as entrada:
+        try:
+            linhas = ler_arquivo(entrada.read(), arquivo)
+        except ErroImportacao as erro:
+            raise click.ClickException(str(erro))
+
+    resultado = importar(linhas, usuario, somente_validar=somente_validar)
+    for item in resultado.lista_erros:
+        click.echo(f'Linha {item["linha"]}: ' + ' '.join(item['erros']))
+    click.echo(f'Linhas: {resultado.total} | Válidas: {len(resultado.validas)} | '
+               f'Importadas: {resultado.importados} | Com erro: {len(resultado.erros)}')
+
+
+@click.command('arquivar-agendamentos')
+@click.option('--idade', type=int, help='Idade mínima em dias (padrão: ARQUIVAMENTO_IDADE_DIAS).')
+@click.option('--lote', type=int, help='Agendamentos movidos por transação (padrão: ARQUIVAMENTO_LOTE).')
+@click.option('--maximo', type=int, help='Limite de agendamentos movidos nesta execução.')
+@with_appcontext
+def arquivar_agendamentos_command(idade, lote, maximo):
+    """Move agendamentos encerrados antigos para a tabela de arquivo (execute periodicamente)"""
+    from app.arquivamento import arquivar
+
+    click.echo(f'Agendamentos arquivados: {arquivar(idade, lote, maximo)}')
+
+
+def consultas_criticas():
+    """Consultas mais frequentes das rotas, que devem sempre usar índices"""
+    from app.models import Agendamento, User
+    from app.scheduling import filtro_sobreposicao, STATUS_ATIVOS
+    from app.utils import intervalo_dia
+
+    agora = datetime.now()
+    inicio_hoje, fim_hoje = intervalo_dia(agora.date())
+    return {
+        'usuario.dashboard (status)': Agendamento.query.filter_by(user_id=1, status='pendente'),
+        'usuario.dashboard (hoje)': Agendamento.query.filter(
+            Agendamento.user_id == 1,
+            Agendamento.data_agendamento >= inicio_hoje,
+            Agendamento.data_agendamento < fim_hoje
+        ),
+        'usuario.dashboard (próximos)': Agendamento.query.filter(
+            Agendamento.user_id == 1,
+            Agendamento.data_agendamento >= agora,
+            Agendamento.status.in_(STATUS_ATIVOS)
+        ).order_by(Agendamento.data_agendamento.asc()).limit(5),
+        'usuario.agendamentos': Agendamento.query.filter_by(user_id=1).order_by(
+            Agendamento.data_agendamento.desc()),
+        'usuario.novo_agendamento (conflito)': Agendamento.query.filter(
+            *filtro_sobreposicao(1, agora, agora + timedelta(hours=1))),
+        'admin.dashboard (hoje)': Agendamento.query.filter(
+            Agendamento.data_agendamento >= inicio_hoje,
+            Agendamento.data_agendamento < fim_hoje
+        ),
+        'admin.dashboard (recentes)': Agendamento.query.order_by(
+            Agendamento.data_criacao.desc()).limit(5),
+        'admin.agendamentos (status)': Agendamento.query.filter_by(status='pendente').order_by(
+            Agendamento.data_agendamento.asc()),
+        'admin.relatorio_agendamentos': Agendamento.query.filter(
+            Agendamento.data_agendamento >= inicio_hoje - timedelta(days=30),
+            Agendamento.data_agendamento < fim_hoje
+        ).order_by(Agendamento.data_agendamento.desc()),
+        'auth.confirmar_email': User.query.filter_by(token_confirmacao='token'),
+    }
+
+
+@click.command('verificar-indices')
+@with_appcontext
+def verificar_indices_command():
+    """Mostra o EXPLAIN das consultas críticas e falha se alguma ler a tabela inteira"""
+    from app import db
+    from app.utils import explicar_consulta, varreduras_completas
+
+    if db.engine.dialect.name == 'postgresql':
+        # Com tabelas pequenas o planejador prefere Seq Scan; força o teste dos índices
+        db.session.execute(db.text('SET LOCAL enable_seqscan = off'))
+
+    falhas = 0
+    for nome, consulta in consultas_criticas().items():
+        plano = explicar_consulta(consulta)
+        completas = varreduras_completas(plano)
+        click.echo(f"{'FALHA' if completas else 'OK   '} {nome}")
+        for linha in plano:
+            click.echo(f'      {linha}')
+        falhas += bool(completas)
+    db.session.rollback()
+
+    if falhas:
+        raise click.ClickException(f'{falhas} consulta(s) sem índice adequado')
+
+
+def register_commands(app):
+    """Registra os comandos de linha de comando da aplicação"""
+    app.cli.add_command(alocar_agendamentos_command)
+    app.cli.add_command(verificar_indices_command)
+    app.cli.add_command(reconstruir_resumo_command)
+    app.cli.add_command(atualizar_utilizacao_command)
+    app.cli.add_command(enviar_emails_command)
+    app.cli.add_command(importar_agendamentos_command)
+    app.cli.add_command(arquivar_agendamentos_command)
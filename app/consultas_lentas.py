@@ -0,0 +1,144 @@
+"""Registro de consultas lentas com o plano de execução capturado na hora.
+
+Opcional (CONSULTAS_LENTAS_ATIVAS): quando ativo, todo comando SQL que
+demorar CONSULTAS_LENTAS_LIMITE_MS ou mais é guardado com os parâmetros, o
+endpoint (ou thread) que o executou e o EXPLAIN obtido logo em seguida, na
+mesma conexão e transação. Os registros ficam num buffer circular em memória
+com as últimas CONSULTAS_LENTAS_TAMANHO entradas, por processo, visível em
+/admin/consultas-lentas e exportável em JSON.
+
+O EXPLAIN roda num cursor do driver, fora dos eventos do SQLAlchemy, e não
+executa o comando (EXPLAIN sem ANALYZE / EXPLAIN QUERY PLAN). Desativado, o
+registro não instala nenhum listener.
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from flask import has_request_context, request
+from sqlalchemy import event
+from app import db
+from app.utils import linhas_do_plano, prefixo_explain
+
+# Limites de texto guardado por entrada
+TAMANHO_MAXIMO_SQL = 10000
+TAMANHO_MAXIMO_PARAMETROS = 2000
+
+# Comandos para os quais o EXPLAIN é pedido
+COMANDOS_EXPLICAVEIS = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')
+
+
+class RegistroConsultasLentas:
+    """Buffer circular com as últimas consultas lentas"""
+
+    def __init__(self, limite_ms, tamanho):
+        self.limite = limite_ms / 1000
+        self._trava = threading.Lock()
+        self._entradas = deque(maxlen=tamanho)
+        self._proximo_id = 1
+
+    @property
+    def capacidade(self):
+        return self._entradas.maxlen
+
+    def registrar(self, entrada):
+        with self._trava:
+            entrada['id'] = self._proximo_id
+            self._proximo_id += 1
+            self._entradas.append(entrada)
+
+    def entradas(self):
+        """Entradas da mais recente para a mais antiga"""
+        with self._trava:
+            return list(reversed(self._entradas))
+
+    def limpar(self):
+        with self._trava:
+            self._entradas.clear()
+
+
+def _origem():
+    if has_request_context():
+        return request.endpoint or 'desconhecido', f'{request.method} {request.full_path.rstrip("?")}'
+    return 'sem_requisicao', threading.current_thread().name
+
+
+def _texto(valor, limite):
+    texto = repr(valor)
+    if len(texto) > limite:
+        texto = texto[:limite] + '...'
+    return texto
+
+
+def _explicar(conn, statement, parameters):
+    """Plano do comando, executado direto no driver (sem disparar eventos)"""
+    dialeto = conn.dialect
+    # No PostgreSQL um erro invalidaria a transação da requisição; o savepoint isola o EXPLAIN
+    savepoint = dialeto.name == 'postgresql'
+    cursor = conn.connection.cursor()
+    try:
+        if savepoint:
+            cursor.execute('SAVEPOINT consulta_lenta')
+        try:
+            cursor.execute(prefixo_explain(dialeto) + statement, parameters)
+            plano = linhas_do_plano(dialeto, cursor.fetchall())
+        except Exception:
+            if savepoint:
+                cursor.execute('ROLLBACK TO SAVEPOINT consulta_lenta')
+            raise
+        if savepoint:
+            cursor.execute('RELEASE SAVEPOINT consulta_lenta')
+        return plano
+    finally:
+        cursor.close()
+
+
+def instalar(engine, registro):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('consultas_lentas_inicio', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        inicios = conn.info.get('consultas_lentas_inicio')
+        if not inicios:
+            return
+        segundos = time.perf_counter() - inicios.pop()
+        if segundos < registro.limite:
+            return
+
+        plano = None
+        if not executemany and statement.lstrip().upper().startswith(COMANDOS_EXPLICAVEIS):
+            try:
+                plano = _explicar(conn, statement, parameters)
+            except Exception as erro:
+                plano = [f'EXPLAIN falhou: {erro}']
+        endpoint, origem = _origem()
+        registro.registrar({
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'duracao_ms': round(segundos * 1000, 1),
+            'endpoint': endpoint,
+            'origem': origem,
+            'sql': statement[:TAMANHO_MAXIMO_SQL],
+            'parametros': _texto(parameters, TAMANHO_MAXIMO_PARAMETROS),
+            'lote': len(parameters) if executemany else None,
+            'plano': plano,
+        })
+
+    @event.listens_for(engine, 'handle_error')
+    def _falhou(contexto):
+        # Comando que falhou não passa por _depois: o início não pode ficar na conexão do pool
+        if contexto.connection is not None:
+            contexto.connection.info.pop('consultas_lentas_inicio', None)
+
+
+def init_app(app):
+    if not app.config['CONSULTAS_LENTAS_ATIVAS']:
+        return
+    registro = RegistroConsultasLentas(
+        app.config['CONSULTAS_LENTAS_LIMITE_MS'],
+        app.config['CONSULTAS_LENTAS_TAMANHO']
+    )
+    app.extensions['consultas_lentas'] = registro
+    with app.app_context():
+        instalar(db.engine, registro)
@@ -1,17 +1,62 @@
-from flask_mail import Message
+import threading
+import time
+from datetime import datetime, timedelta
 from flask import render_template, current_app, url_for  # ADICIONE url_for AQUI
-from app import mail
-from threading import Thread
-
-def send_async_email(app, msg):
-    with app.app_context():
-        mail.send(msg)
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app import db
+from app.fila_email import enfileirar
+from app.models import Agendamento, MarcaProcessamento, User
+from app.utils import opcoes_detalhes_agendamento
 
 def send_email(subject, sender, recipients, text_body, html_body):
-    msg = Message(subject, sender=sender, recipients=recipients)
-    msg.body = text_body
-    msg.html = html_body
-    Thread(target=send_async_email, args=(current_app._get_current_object(), msg)).start()
+    """Enfileira o email na transação atual; é enviado pelos workers após o commit"""
+    enfileirar(subject, sender, recipients, text_body, html_body)
+
+# CACHE DOS EMAILS DOS ADMINISTRADORES
+# Invalidado no commit de qualquer alteração relevante em usuários; o prazo
+# cobre alterações feitas por outros processos
+VALIDADE_CACHE_ADMINS = 300  # segundos
+
+_cache_admins = {'emails': None, 'expira': 0.0}
+_trava_admins = threading.Lock()
+
+def emails_administradores():
+    """Emails de todos os administradores (em cache)"""
+    with _trava_admins:
+        if _cache_admins['emails'] is not None and time.monotonic() < _cache_admins['expira']:
+            return list(_cache_admins['emails'])
+    emails = [email for email, in db.session.query(User.email).filter_by(tipo='admin').order_by(User.id)]
+    with _trava_admins:
+        _cache_admins['emails'] = emails
+        _cache_admins['expira'] = time.monotonic() + VALIDADE_CACHE_ADMINS
+    return list(emails)
+
+def invalidar_cache_admins():
+    with _trava_admins:
+        _cache_admins['emails'] = None
+
+def _marcar_admins_alterados(mapper, connection, target):
+    estado = inspect(target)
+    if estado.attrs.tipo.history.has_changes() or estado.attrs.email.history.has_changes():
+        estado.session.info['admins_alterados'] = True
+
+def _marcar_usuario_inserido_ou_removido(mapper, connection, target):
+    if target.tipo == 'admin':
+        inspect(target).session.info['admins_alterados'] = True
+
+event.listen(User, 'after_update', _marcar_admins_alterados)
+event.listen(User, 'after_insert', _marcar_usuario_inserido_ou_removido)
+event.listen(User, 'after_delete', _marcar_usuario_inserido_ou_removido)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_admins_apos_commit(session):
+    if session.info.pop('admins_alterados', False):
+        invalidar_cache_admins()
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_admins_alterados(session):
+    session.info.pop('admins_alterados', None)
 
 def send_agendamento_confirmacao(agendamento):
     """Envia email de confirmação de agendamento"""
@@ -82,11 +127,12 @@ def send_agendamento_cancelamento(agendamento):
 
 def send_novo_agendamento_admin(agendamento):
     """Notifica admin sobre novo agendamento pendente"""
-    from app.models import User
+    # No modo resumo o agendamento entra no próximo email periódico (processar_resumo_admin)
+    if current_app.config['EMAIL_ADMIN_MODO'] == 'resumo':
+        return
+    marcar_notificados([agendamento])
     
-    # Buscar todos os administradores
-    admins = User.query.filter_by(tipo='admin').all()
-    admin_emails = [admin.email for admin in admins]
+    admin_emails = emails_administradores()
     
     if not admin_emails:
         return
@@ -119,6 +165,111 @@ def send_novo_agendamento_admin(agendamento):
         html_body=html_body
     )
 
+# RESUMO PERIÓDICO PARA ADMINISTRADORES (EMAIL_ADMIN_MODO = 'resumo')
+MARCA_RESUMO_ADMIN = 'resumo_admin'
+# Agendamentos listados no corpo do resumo; os demais aparecem só na contagem
+LIMITE_ITENS_RESUMO = 100
+
+def marcar_notificados(agendamentos):
+    """Registra que os administradores já foram avisados dos agendamentos"""
+    ids = [agendamento.id for agendamento in agendamentos]
+    if not ids:
+        return
+    db.session.execute(
+        db.update(Agendamento).where(Agendamento.id.in_(ids)).values(
+            notificado_admin=True,
+            # Não é uma alteração do agendamento (app.utilizacao)
+            data_atualizacao=Agendamento.data_atualizacao
+        ).execution_options(synchronize_session=False)
+    )
+
+def send_resumo_admin(agendamentos, inicio, fim):
+    """Enfileira um email de resumo para cada administrador"""
+    admin_emails = emails_administradores()
+    if not admin_emails or not agendamentos:
+        return 0
+    
+    subject = current_app.config['EMAIL_SUBJECT_PREFIX'] + f'{len(agendamentos)} Novo(s) Agendamento(s) Pendente(s)'
+    
+    listados = agendamentos[:LIMITE_ITENS_RESUMO]
+    restantes = len(agendamentos) - len(listados)
+    linhas = '\n'.join(
+        f"    - {a.data_agendamento.strftime('%d/%m/%Y %H:%M')} | Doca {a.doca.numero} - {a.doca.terminal.nome} "
+        f"| {a.usuario.nome} | {a.placa_veiculo}"
+        for a in listados
+    )
+    if restantes:
+        linhas += f"\n    ... e mais {restantes} agendamento(s)."
+    text_body = f"""
+    Novos agendamentos pendentes de aprovação entre {inicio.strftime('%d/%m/%Y %H:%M')} e {fim.strftime('%d/%m/%Y %H:%M')} (UTC):
+    
+{linhas}
+    
+    Acesse o sistema para aprovar ou rejeitar estes agendamentos.
+    """
+    
+    html_body = render_template('email/resumo_agendamentos_admin.html',
+                               agendamentos=listados, total=len(agendamentos),
+                               restantes=restantes, inicio=inicio, fim=fim)
+    
+    # Um email por administrador, sem expor os demais destinatários
+    for email in admin_emails:
+        send_email(
+            subject=subject,
+            sender=current_app.config['MAIL_DEFAULT_SENDER'],
+            recipients=[email],
+            text_body=text_body,
+            html_body=html_body
+        )
+    return len(admin_emails)
+
+def processar_resumo_admin(agora=None):
+    """Envia o resumo dos agendamentos pendentes ainda não notificados se a janela já terminou.
+
+    A janela é EMAIL_ADMIN_JANELA_MINUTOS, contada a partir do fim da anterior.
+    O avanço da marca é condicional (só um worker/processo envia cada janela) e
+    fica na mesma transação dos emails enfileirados. O resumo inclui os
+    pendentes com notificado_admin falso, e não os criados dentro da janela:
+    um agendamento cuja transação só termina depois do envio entra no
+    próximo resumo.
+    Retorna a quantidade de agendamentos incluídos no resumo.
+    """
+    if current_app.config['EMAIL_ADMIN_MODO'] != 'resumo':
+        return 0
+    agora = agora or datetime.utcnow()
+    janela = timedelta(minutes=current_app.config['EMAIL_ADMIN_JANELA_MINUTOS'])
+    
+    marca = db.session.get(MarcaProcessamento, MARCA_RESUMO_ADMIN)
+    if marca is None or marca.valor is None:
+        # Primeira execução: só começa a contar a janela
+        db.session.merge(MarcaProcessamento(nome=MARCA_RESUMO_ADMIN, valor=agora))
+        db.session.commit()
+        return 0
+    inicio = marca.valor
+    if agora - inicio < janela:
+        db.session.rollback()
+        return 0
+    
+    avancou = db.session.execute(
+        db.update(MarcaProcessamento).where(
+            MarcaProcessamento.nome == MARCA_RESUMO_ADMIN,
+            MarcaProcessamento.valor == inicio
+        ).values(valor=agora).execution_options(synchronize_session=False)
+    ).rowcount
+    if not avancou:
+        # Outro worker já enviou esta janela
+        db.session.rollback()
+        return 0
+    
+    agendamentos = Agendamento.query.options(*opcoes_detalhes_agendamento()).filter(
+        Agendamento.status == 'pendente',
+        Agendamento.notificado_admin.is_(False)
+    ).order_by(Agendamento.data_agendamento, Agendamento.id).all()
+    send_resumo_admin(agendamentos, inicio, agora)
+    marcar_notificados(agendamentos)
+    db.session.commit()
+    return len(agendamentos)
+
 def send_agendamento_rejeitado(agendamento):
     """Envia email quando agendamento é rejeitado pelo admin"""
     subject = current_app.config['EMAIL_SUBJECT_PREFIX'] + 'Agendamento Rejeitado'
@@ -0,0 +1,21 @@
+"""Ganchos executados a cada criação ou mudança de status de um agendamento.
+
+As rotas chamam agendamento_alterado() depois de alterar o agendamento e antes
+do commit, de modo que tudo o que deriva da alteração seja gravado na mesma
+transação.
+"""
+from app import painel, resumo, versoes
+
+
+def agendamento_alterado(agendamento, status_anterior=None):
+    """Propaga a criação (status_anterior=None) ou mudança de status de um agendamento"""
+    resumo.registrar(agendamento, status_anterior)
+    painel.registrar([(agendamento, status_anterior)])
+
+
+def agendamentos_alterados(alteracoes):
+    """Versão em lote de agendamento_alterado: alteracoes é uma lista de (agendamento, status_anterior)"""
+    resumo.registrar_lote(alteracoes)
+    painel.registrar(alteracoes)
+    # Agendamentos gravados em lote (INSERT direto) não passam pelo flush do ORM
+    versoes.marcar_docas({agendamento.doca_id for agendamento, _ in alteracoes})
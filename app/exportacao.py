@@ -0,0 +1,94 @@
+"""Exportação em streaming dos agendamentos (CSV e JSON por linha).
+
+As linhas são lidas com cursor no servidor (stream_results + yield_per) e
+enviadas em blocos à medida que chegam, de modo que o consumo de memória não
+depende do tamanho do período exportado e os primeiros bytes saem logo.
+"""
+import csv
+import io
+import json
+from app import db
+from app.models import Agendamento, Doca, Terminal, User
+
+# Linhas buscadas do banco (e enviadas ao cliente) por bloco
+TAMANHO_BLOCO = 1000
+
+COLUNAS = (
+    ('id', Agendamento.id),
+    ('data_agendamento', Agendamento.data_agendamento),
+    ('data_fim', Agendamento.data_fim),
+    ('duracao_estimada', Agendamento.duracao_estimada),
+    ('status', Agendamento.status),
+    ('tipo_operacao', Agendamento.tipo_operacao),
+    ('tipo_carga', Agendamento.tipo_carga),
+    ('terminal', Terminal.nome),
+    ('doca', Doca.numero),
+    ('usuario', User.nome),
+    ('email', User.email),
+    ('placa_veiculo', Agendamento.placa_veiculo),
+    ('nome_motorista', Agendamento.nome_motorista),
+    ('telefone_motorista', Agendamento.telefone_motorista),
+    ('data_criacao', Agendamento.data_criacao),
+    ('data_cancelamento', Agendamento.data_cancelamento),
+    ('motivo_cancelamento', Agendamento.motivo_cancelamento),
+)
+
+NOMES = [nome for nome, _ in COLUNAS]
+
+
+def consulta_exportacao(*filtros, agendamento=Agendamento):
+    """SELECT plano (sem entidades ORM) dos agendamentos filtrados.
+
+    `agendamento` pode ser app.arquivamento.historico() para incluir os
+    arquivados; os filtros devem usar a mesma entidade.
+    """
+    colunas = (
+        getattr(agendamento, coluna.key) if coluna.class_ is Agendamento else coluna
+        for _, coluna in COLUNAS
+    )
+    return db.select(*colunas).select_from(agendamento).join(
+        Doca, agendamento.doca_id == Doca.id
+    ).join(
+        Terminal, Doca.terminal_id == Terminal.id
+    ).join(
+        User, agendamento.user_id == User.id
+    ).filter(*filtros).order_by(
+        agendamento.data_agendamento.desc(), agendamento.id.desc()
+    )
+
+
+def _blocos(consulta):
+    """Itera sobre a consulta em blocos de TAMANHO_BLOCO linhas usando cursor no servidor"""
+    resultado = db.session.execute(
+        consulta.execution_options(stream_results=True, yield_per=TAMANHO_BLOCO)
+    )
+    try:
+        yield from resultado.partitions()
+    finally:
+        resultado.close()
+
+
+def _valor_json(valor):
+    return valor.isoformat() if hasattr(valor, 'isoformat') else valor
+
+
+def gerar_csv(consulta):
+    """Gera o CSV em pedaços de texto, começando pelo cabeçalho"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(NOMES)
+    yield buffer.getvalue()
+    for bloco in _blocos(consulta):
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows(bloco)
+        yield buffer.getvalue()
+
+
+def gerar_ndjson(consulta):
+    """Gera um objeto JSON por linha (newline-delimited JSON)"""
+    for bloco in _blocos(consulta):
+        yield ''.join(
+            json.dumps(dict(zip(NOMES, map(_valor_json, linha))), ensure_ascii=False) + '\n'
+            for linha in bloco
+        )
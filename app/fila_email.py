@@ -0,0 +1,254 @@
+"""Fila persistente de emails (outbox) e workers de envio.
+
+send_email apenas grava a mensagem em EmailSaida, na mesma transação da
+alteração que a originou (um INSERT em lote logo antes do commit): se a
+transação for desfeita nenhum email sai, e se o processo cair as mensagens
+continuam na tabela. Um número limitado de workers esvazia a fila, cada um
+reaproveitando a mesma conexão SMTP para várias mensagens. Falhas são reagendadas com espera exponencial até
+EMAIL_FILA_TENTATIVAS, e o resultado de cada envio fica registrado na tabela.
+"""
+import smtplib
+import threading
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from flask_mail import Message
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db, mail
+from app.models import EmailSaida
+
+# Por quanto tempo uma mensagem fica reservada para um worker; expirado esse
+# prazo (ex.: processo encerrado durante o envio) ela volta a ficar disponível
+TEMPO_RESERVA = timedelta(minutes=5)
+
+# Espera entre tentativas: 30s, 1min, 2min, 4min... limitada a 1 hora
+ESPERA_INICIAL = timedelta(seconds=30)
+ESPERA_MAXIMA = timedelta(hours=1)
+
+
+def enfileirar(assunto, remetente, destinatarios, corpo_texto, corpo_html):
+    """Adiciona um email à fila da transação atual (enviado após o commit).
+
+    As mensagens são acumuladas na sessão e gravadas com um único INSERT em
+    lote imediatamente antes do commit.
+    """
+    db.session.info.setdefault('emails_pendentes', []).append({
+        'assunto': assunto,
+        'remetente': remetente,
+        'destinatarios': ','.join(destinatarios),
+        'corpo_texto': corpo_texto,
+        'corpo_html': corpo_html
+    })
+
+
+def espera(tentativas):
+    """Intervalo até a próxima tentativa depois de `tentativas` falhas"""
+    return min(ESPERA_INICIAL * 2 ** (tentativas - 1), ESPERA_MAXIMA)
+
+
+def reservar(limite):
+    """Reserva até `limite` emails disponíveis para o worker atual.
+
+    A reserva é um único UPDATE condicional; no PostgreSQL as linhas já
+    travadas por outro worker são ignoradas (SKIP LOCKED).
+    """
+    agora = datetime.utcnow()
+    token = uuid.uuid4().hex
+    disponiveis = (
+        EmailSaida.status.in_(('pendente', 'enviando')),
+        EmailSaida.proxima_tentativa <= agora
+    )
+    candidatos = db.select(EmailSaida.id).filter(*disponiveis).order_by(
+        EmailSaida.proxima_tentativa
+    ).limit(limite).with_for_update(skip_locked=True)
+    db.session.execute(
+        db.update(EmailSaida).where(EmailSaida.id.in_(candidatos), *disponiveis).values(
+            status='enviando',
+            reservado_por=token,
+            proxima_tentativa=agora + TEMPO_RESERVA
+        ).execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return EmailSaida.query.filter_by(reservado_por=token, status='enviando').order_by(EmailSaida.id).all()
+
+
+def _mensagem(email):
+    msg = Message(email.assunto, sender=email.remetente, recipients=email.lista_destinatarios)
+    msg.body = email.corpo_texto
+    msg.html = email.corpo_html
+    return msg
+
+
+class ConexaoSMTP:
+    """Conexão SMTP de um worker, aberta sob demanda e reaproveitada entre mensagens"""
+
+    def __init__(self):
+        self._conexao = None
+
+    def enviar(self, msg):
+        if self._conexao is None:
+            conexao = mail.connect()
+            conexao.__enter__()
+            self._conexao = conexao
+        try:
+            self._conexao.send(msg)
+        except smtplib.SMTPResponseException:
+            # Recusa do servidor para esta mensagem; a conexão continua válida
+            raise
+        except Exception:
+            # Conexão em estado desconhecido: a próxima mensagem abre outra
+            self.fechar()
+            raise
+
+    def fechar(self):
+        if self._conexao is not None:
+            try:
+                self._conexao.__exit__(None, None, None)
+            except Exception:
+                pass
+            self._conexao = None
+
+
+def processar_lote(conexao, limite=None, maximo_tentativas=None):
+    """Reserva e envia um lote de emails. Retorna (enviados, falhas)"""
+    config = current_app.config
+    limite = limite or config['EMAIL_FILA_LOTE']
+    maximo_tentativas = maximo_tentativas or config['EMAIL_FILA_TENTATIVAS']
+
+    enviados = falhas = 0
+    for email in reservar(limite):
+        email.reservado_por = None
+        try:
+            conexao.enviar(_mensagem(email))
+        except Exception as erro:
+            falhas += 1
+            email.tentativas += 1
+            email.ultimo_erro = str(erro)[:1000]
+            if email.tentativas >= maximo_tentativas:
+                email.status = 'falhou'
+            else:
+                email.status = 'pendente'
+                email.proxima_tentativa = datetime.utcnow() + espera(email.tentativas)
+        else:
+            enviados += 1
+            email.status = 'enviado'
+            email.data_envio = datetime.utcnow()
+    db.session.commit()
+    return enviados, falhas
+
+
+def esvaziar_fila():
+    """Envia tudo o que estiver disponível na fila usando uma única conexão"""
+    conexao = ConexaoSMTP()
+    total_enviados = total_falhas = 0
+    try:
+        while True:
+            enviados, falhas = processar_lote(conexao)
+            if not enviados and not falhas:
+                break
+            total_enviados += enviados
+            total_falhas += falhas
+    finally:
+        conexao.fechar()
+    return total_enviados, total_falhas
+
+
+class DespachanteEmail:
+    """Conjunto limitado de threads que esvazia a fila de emails"""
+
+    def __init__(self, app):
+        self.app = app
+        self._sinal = threading.Event()
+        self._parar = threading.Event()
+        self._trava = threading.Lock()
+        self._threads = []
+
+    @property
+    def ativo(self):
+        return bool(self._threads)
+
+    def iniciar(self):
+        with self._trava:
+            if self._threads:
+                return
+            self._parar.clear()
+            for numero in range(self.app.config['EMAIL_FILA_WORKERS']):
+                thread = threading.Thread(
+                    target=self._trabalhar,
+                    name=f'fila-email-{numero + 1}',
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def despertar(self):
+        """Avisa os workers que há emails novos, sem esperar o intervalo"""
+        self._sinal.set()
+
+    def parar(self, timeout=None):
+        with self._trava:
+            self._parar.set()
+            self._sinal.set()
+            for thread in self._threads:
+                thread.join(timeout)
+            self._threads = []
+
+    def _trabalhar(self):
+        from app.email import processar_resumo_admin
+
+        intervalo = self.app.config['EMAIL_FILA_INTERVALO']
+        conexao = ConexaoSMTP()
+        with self.app.app_context():
+            try:
+                while not self._parar.is_set():
+                    try:
+                        processar_resumo_admin()
+                        enviados, falhas = processar_lote(conexao)
+                    except Exception:
+                        current_app.logger.exception('Erro ao processar a fila de emails')
+                        db.session.rollback()
+                        enviados = falhas = 0
+                    finally:
+                        db.session.remove()
+                    if not enviados and not falhas:
+                        # Fila vazia: libera a conexão SMTP e aguarda
+                        conexao.fechar()
+                        self._sinal.wait(intervalo)
+                        self._sinal.clear()
+            finally:
+                conexao.fechar()
+
+
+@event.listens_for(Session, 'before_commit')
+def _gravar_emails_pendentes(session):
+    emails = session.info.pop('emails_pendentes', None)
+    if emails:
+        session.execute(db.insert(EmailSaida), emails)
+        session.info['email_enfileirado'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _despertar_apos_commit(session):
+    if session.info.pop('email_enfileirado', False) and has_app_context():
+        despachante = current_app.extensions.get('fila_email')
+        if despachante is not None:
+            despachante.despertar()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_emails(session):
+    session.info.pop('emails_pendentes', None)
+    session.info.pop('email_enfileirado', None)
+
+
+def init_app(app):
+    """Registra o despachante; os workers sobem na primeira requisição"""
+    despachante = DespachanteEmail(app)
+    app.extensions['fila_email'] = despachante
+
+    if app.config['EMAIL_FILA_WORKERS'] > 0:
+        @app.before_request
+        def _iniciar_fila_email():
+            if not despachante.ativo:
+                despachante.iniciar()
@@ -1,7 +1,8 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField, SelectField, TextAreaField, DateTimeField, IntegerField, DateField
-from wtforms.validators import DataRequired, Email, Length, ValidationError, Optional
+from wtforms.validators import DataRequired, Email, Length, ValidationError, Optional, NumberRange
 from app.models import Doca, User
+from app.scheduling import DURACAO_MAXIMA_MINUTOS
 from datetime import datetime
 from wtforms.validators import DataRequired, Email, Length, ValidationError, EqualTo
 
@@ -18,7 +19,7 @@ class AgendamentoForm(FlaskForm):
                                    })
     duracao_estimada = IntegerField('Duração Estimada (minutos)', 
                                    default=60, 
-                                   validators=[DataRequired()],
+                                   validators=[DataRequired(), NumberRange(min=1, max=DURACAO_MAXIMA_MINUTOS)],
                                    render_kw={"placeholder": "60"})
     tipo_operacao = SelectField('Tipo de Operação', 
                                choices=[
@@ -0,0 +1,328 @@
+"""Importação em lote de agendamentos a partir de arquivos CSV ou JSON.
+
+Todas as linhas são validadas numa única passada: as docas vêm de uma consulta,
+as ocupações existentes de outra, e os conflitos (com o banco e entre linhas do
+próprio arquivo) são detectados ordenando os intervalos de cada doca e
+varrendo-os uma vez, sem consultas por linha. As linhas válidas são gravadas
+com um único INSERT em lote; as inválidas voltam com a lista de erros.
+"""
+import csv
+import io
+import json
+import re
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.orm import joinedload
+from app import db
+from app.email import marcar_notificados, send_resumo_admin
+from app.events import agendamentos_alterados
+from app.models import Agendamento, Doca
+from app.scheduling import STATUS_ATIVOS, DURACAO_MAXIMA_MINUTOS, calcular_fim, janelas_funcionamento, travar_docas
+
+# Maior quantidade de linhas aceita num arquivo
+LIMITE_LINHAS = 20000
+
+TIPOS_OPERACAO = ('carga', 'descarga', 'ambos')
+TIPOS_CARGA = ('geral', 'frigorifica', 'perigosa', 'granel')
+FORMATOS_DATA = ('%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%d/%m/%Y %H:%M')
+
+# Placas antigas (ABC1234) e Mercosul (ABC1D23), com ou sem hífen
+PADRAO_PLACA = re.compile(r'^[A-Z]{3}[0-9][A-Z0-9][0-9]{2}$')
+
+COLUNAS_MODELO = (
+    'terminal', 'doca', 'data_agendamento', 'duracao_estimada', 'tipo_operacao',
+    'tipo_carga', 'placa_veiculo', 'nome_motorista', 'telefone_motorista', 'observacoes'
+)
+
+
+class ErroImportacao(Exception):
+    """Arquivo que não pode ser lido (formato, codificação ou tamanho)"""
+
+
+class ResultadoImportacao:
+    """Resultado da validação/importação: linhas aceitas e erros por linha"""
+
+    def __init__(self, total):
+        self.total = total
+        self.validas = []
+        self.erros = {}
+        self.importados = 0
+
+    def adicionar_erro(self, linha, mensagem):
+        self.erros.setdefault(linha, []).append(mensagem)
+
+    @property
+    def lista_erros(self):
+        return [{'linha': linha, 'erros': mensagens} for linha, mensagens in sorted(self.erros.items())]
+
+    def como_dict(self):
+        return {
+            'total': self.total,
+            'validas': len(self.validas),
+            'importados': self.importados,
+            'erros': self.lista_erros
+        }
+
+
+def ler_arquivo(conteudo, nome_arquivo):
+    """Converte o conteúdo de um arquivo .csv, .json ou .ndjson em lista de dicionários"""
+    if isinstance(conteudo, bytes):
+        try:
+            conteudo = conteudo.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise ErroImportacao('O arquivo deve estar codificado em UTF-8.')
+
+    extensao = nome_arquivo.rsplit('.', 1)[-1].lower() if '.' in nome_arquivo else ''
+    try:
+        if extensao == 'csv':
+            amostra = conteudo[:4096]
+            delimitador = ';' if amostra.count(';') > amostra.count(',') else ','
+            linhas = list(csv.DictReader(io.StringIO(conteudo), delimiter=delimitador))
+        elif extensao == 'json':
+            linhas = json.loads(conteudo)
+            if isinstance(linhas, dict):
+                linhas = linhas.get('agendamentos', [])
+        elif extensao in ('ndjson', 'jsonl'):
+            linhas = [json.loads(linha) for linha in conteudo.splitlines() if linha.strip()]
+        else:
+            raise ErroImportacao('Formato não suportado. Use CSV, JSON ou NDJSON.')
+    except (ValueError, csv.Error) as erro:
+        raise ErroImportacao(f'Arquivo inválido: {erro}')
+
+    if not isinstance(linhas, list) or not all(isinstance(linha, dict) for linha in linhas):
+        raise ErroImportacao('O JSON deve ser uma lista de agendamentos.')
+    if len(linhas) > LIMITE_LINHAS:
+        raise ErroImportacao(f'O arquivo excede o limite de {LIMITE_LINHAS} linhas.')
+    return linhas
+
+
+def _texto(linha, campo):
+    valor = linha.get(campo)
+    return str(valor).strip() if valor is not None else ''
+
+
+def _converter_data(texto):
+    for formato in FORMATOS_DATA:
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            continue
+    return None
+
+
+def _mapa_docas():
+    """Docas indexadas por id e por (nome do terminal, número), numa única consulta"""
+    por_id = {}
+    por_nome = {}
+    for doca in Doca.query.options(joinedload(Doca.terminal)):
+        por_id[doca.id] = doca
+        por_nome[(doca.terminal.nome.strip().lower(), doca.numero.strip().lower())] = doca
+    return por_id, por_nome
+
+
+def _dentro_do_funcionamento(terminal, inicio, fim):
+    """O intervalo [inicio, fim) está inteiro dentro do funcionamento do terminal.
+
+    As janelas vêm separadas por dia e recortadas a [inicio, fim): o intervalo
+    está contido se elas o cobrem sem lacunas, numa janela só ou numa cadeia de
+    janelas emendadas (terminal 24 horas, agendamento que passa da meia-noite).
+    """
+    coberto_ate = inicio
+    for ini_janela, fim_janela in janelas_funcionamento(terminal, inicio, fim):
+        if ini_janela > coberto_ate:
+            return False
+        coberto_ate = max(coberto_ate, fim_janela)
+    return coberto_ate >= fim
+
+
+def _validar_campos(numero, linha, docas_por_id, docas_por_nome, agora, resultado):
+    """Valida uma linha isoladamente; retorna o dicionário do agendamento ou None"""
+    erros = []
+
+    doca = None
+    doca_id = _texto(linha, 'doca_id')
+    if doca_id:
+        doca = docas_por_id.get(int(doca_id)) if doca_id.isdigit() else None
+    elif _texto(linha, 'terminal') and _texto(linha, 'doca'):
+        doca = docas_por_nome.get((_texto(linha, 'terminal').lower(), _texto(linha, 'doca').lower()))
+    else:
+        erros.append('Informe doca_id ou terminal e doca.')
+    if (doca_id or _texto(linha, 'doca')) and doca is None:
+        erros.append('Doca não encontrada.')
+    elif doca is not None and doca.status != 'ativa':
+        erros.append(f'Doca {doca.numero} não está ativa.')
+
+    inicio = _converter_data(_texto(linha, 'data_agendamento'))
+    if inicio is None:
+        erros.append('data_agendamento inválida (use AAAA-MM-DD HH:MM).')
+    elif inicio < agora:
+        erros.append('data_agendamento está no passado.')
+
+    duracao_texto = _texto(linha, 'duracao_estimada') or '60'
+    duracao = int(duracao_texto) if duracao_texto.isdigit() else 0
+    if not 1 <= duracao <= DURACAO_MAXIMA_MINUTOS:
+        erros.append(f'duracao_estimada deve estar entre 1 e {DURACAO_MAXIMA_MINUTOS} minutos.')
+
+    tipo_operacao = _texto(linha, 'tipo_operacao').lower()
+    if tipo_operacao not in TIPOS_OPERACAO:
+        erros.append('tipo_operacao deve ser carga, descarga ou ambos.')
+
+    tipo_carga = _texto(linha, 'tipo_carga').lower() or (doca.tipo_carga if doca else '')
+    if (tipo_carga or doca is not None) and tipo_carga not in TIPOS_CARGA:
+        erros.append('tipo_carga deve ser geral, frigorifica, perigosa ou granel.')
+
+    placa = _texto(linha, 'placa_veiculo').upper().replace('-', '').replace(' ', '')
+    if not PADRAO_PLACA.match(placa):
+        erros.append('placa_veiculo inválida (ex.: ABC1234 ou ABC1D23).')
+
+    nome_motorista = _texto(linha, 'nome_motorista')
+    if not nome_motorista:
+        erros.append('nome_motorista é obrigatório.')
+
+    if not erros and not _dentro_do_funcionamento(doca.terminal, inicio, calcular_fim(inicio, duracao)):
+        erros.append(f'Fora do horário de funcionamento do terminal {doca.terminal.nome}.')
+
+    for erro in erros:
+        resultado.adicionar_erro(numero, erro)
+    if erros:
+        return None
+    return {
+        'linha': numero,
+        'doca_id': doca.id,
+        'terminal_id': doca.terminal_id,
+        'data_agendamento': inicio,
+        'data_fim': calcular_fim(inicio, duracao),
+        'duracao_estimada': duracao,
+        'tipo_operacao': tipo_operacao,
+        'tipo_carga': tipo_carga,
+        'placa_veiculo': placa,
+        'nome_motorista': nome_motorista[:100],
+        'telefone_motorista': _texto(linha, 'telefone_motorista')[:20] or None,
+        'observacoes': _texto(linha, 'observacoes') or None
+    }
+
+
+def _ocupacoes_existentes(candidatos):
+    """Ocupações ativas das docas envolvidas, por doca: (inícios ordenados, máximo acumulado dos fins)"""
+    inicio = min(c['data_agendamento'] for c in candidatos)
+    fim = max(c['data_fim'] for c in candidatos)
+    inicios = {}
+    fins = {}
+    linhas = db.session.query(
+        Agendamento.doca_id,
+        Agendamento.data_agendamento,
+        Agendamento.data_fim
+    ).filter(
+        Agendamento.doca_id.in_({c['doca_id'] for c in candidatos}),
+        Agendamento.data_agendamento >= inicio - timedelta(minutes=DURACAO_MAXIMA_MINUTOS),
+        Agendamento.data_agendamento < fim,
+        Agendamento.data_fim > inicio,
+        Agendamento.status.in_(STATUS_ATIVOS)
+    ).order_by(Agendamento.doca_id, Agendamento.data_agendamento)
+    for doca_id, ini_ocupacao, fim_ocupacao in linhas:
+        doca_fins = fins.setdefault(doca_id, [])
+        inicios.setdefault(doca_id, []).append(ini_ocupacao)
+        doca_fins.append(max(fim_ocupacao, doca_fins[-1]) if doca_fins else fim_ocupacao)
+    return inicios, fins
+
+
+def _varrer_conflitos(candidatos, resultado):
+    """Descarta candidatos que sobrepõem ocupações existentes ou outra linha do arquivo"""
+    if not candidatos:
+        return []
+    inicios, fins_acumulados = _ocupacoes_existentes(candidatos)
+
+    aceitos = []
+    ultimo_por_doca = {}
+    for candidato in sorted(candidatos, key=lambda c: (c['doca_id'], c['data_agendamento'], c['linha'])):
+        doca_id = candidato['doca_id']
+        # Ocupações existentes que começam antes do fim do candidato: basta
+        # o maior fim entre elas ultrapassar o início para haver sobreposição
+        doca_inicios = inicios.get(doca_id, [])
+        pos = bisect_left(doca_inicios, candidato['data_fim'])
+        if pos and fins_acumulados[doca_id][pos - 1] > candidato['data_agendamento']:
+            resultado.adicionar_erro(candidato['linha'], 'Conflita com um agendamento existente nesta doca.')
+            continue
+        # Linhas do próprio arquivo, varridas por ordem de início
+        anterior = ultimo_por_doca.get(doca_id)
+        if anterior is not None and anterior['data_fim'] > candidato['data_agendamento']:
+            resultado.adicionar_erro(candidato['linha'], f'Conflita com a linha {anterior["linha"]} do arquivo.')
+            continue
+        ultimo_por_doca[doca_id] = candidato
+        aceitos.append(candidato)
+    return sorted(aceitos, key=lambda c: c['linha'])
+
+
+def validar(linhas, agora=None, travar=False):
+    """Valida todas as linhas numa única passada e retorna o ResultadoImportacao.
+
+    Com travar=True as docas das linhas válidas ficam travadas até o fim da
+    transação antes da verificação de conflitos (ver travar_docas).
+    """
+    agora = agora or datetime.now()
+    resultado = ResultadoImportacao(len(linhas))
+    docas_por_id, docas_por_nome = _mapa_docas()
+    # Linha 1 é o cabeçalho no CSV; numeração a partir de 2 para bater com a planilha
+    candidatos = []
+    for numero, linha in enumerate(linhas, start=2):
+        candidato = _validar_campos(numero, linha, docas_por_id, docas_por_nome, agora, resultado)
+        if candidato is not None:
+            candidatos.append(candidato)
+    if travar:
+        travar_docas(candidato['doca_id'] for candidato in candidatos)
+    resultado.validas = _varrer_conflitos(candidatos, resultado)
+    return resultado
+
+
+def importar(linhas, usuario, somente_validar=False):
+    """Valida e grava as linhas válidas como agendamentos pendentes do usuário.
+
+    O INSERT é feito em lote; em seguida os agendamentos criados são lidos de
+    volta numa única consulta para atualizar o resumo e notificar os
+    administradores na mesma transação.
+    """
+    resultado = validar(linhas, travar=not somente_validar)
+    if somente_validar or not resultado.validas:
+        if not somente_validar:
+            # Libera as docas travadas na validação
+            db.session.rollback()
+        return resultado
+
+    criacao = datetime.utcnow()
+    db.session.execute(db.insert(Agendamento), [
+        {
+            'user_id': usuario.id,
+            'doca_id': valida['doca_id'],
+            'data_agendamento': valida['data_agendamento'],
+            'data_fim': valida['data_fim'],
+            'duracao_estimada': valida['duracao_estimada'],
+            'tipo_operacao': valida['tipo_operacao'],
+            'tipo_carga': valida['tipo_carga'],
+            'placa_veiculo': valida['placa_veiculo'],
+            'nome_motorista': valida['nome_motorista'],
+            'telefone_motorista': valida['telefone_motorista'],
+            'observacoes': valida['observacoes'],
+            'status': 'pendente',
+            'data_criacao': criacao,
+            'data_atualizacao': criacao
+        }
+        for valida in resultado.validas
+    ])
+
+    # Docas, terminais e o usuário já estão na sessão: os relacionamentos
+    # dos agendamentos lidos de volta não geram novas consultas
+    criados = Agendamento.query.filter(
+        Agendamento.data_criacao == criacao,
+        Agendamento.user_id == usuario.id
+    ).order_by(Agendamento.data_agendamento, Agendamento.id).all()
+    agendamentos_alterados([(agendamento, None) for agendamento in criados])
+
+    # No modo resumo os agendamentos entram no próximo email periódico
+    if current_app.config['EMAIL_ADMIN_MODO'] != 'resumo':
+        send_resumo_admin(criados, criacao, criacao)
+        marcar_notificados(criados)
+
+    db.session.commit()
+    resultado.importados = len(criados)
+    return resultado
@@ -0,0 +1,271 @@
+"""Métricas de requisições, SQL e fila de emails no formato texto do Prometheus.
+
+Cada requisição registra, por endpoint, a latência (histograma), o status e
+os comandos SQL emitidos durante ela (quantidade e tempo, medidos pelos
+eventos de cursor do SQLAlchemy). Comandos fora de requisições (workers da
+fila de email, comandos flask) são somados no endpoint 'sem_requisicao'.
+O estado da fila de emails é consultado no momento da leitura.
+
+Respostas em stream (exportações CSV/NDJSON, eventos do painel) são medidas
+quando o servidor termina de enviá-las (response.call_on_close): a latência
+inclui o envio do corpo (no painel, a duração da conexão) e os comandos SQL
+do gerador contam para o endpoint.
+
+Os valores ficam em memória, por processo: com vários workers do gunicorn
+cada processo expõe os seus e o Prometheus soma as séries. O custo por
+requisição é um perf_counter por comando SQL e uma atualização de contadores
+sob trava ao fim da requisição. Os listeners são instalados apenas no engine
+do app; com METRICAS_ATIVAS=0 nada é instalado.
+"""
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event, func
+from app import db
+from app.models import EmailSaida
+
+# Limites (em segundos) dos buckets do histograma de latência
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Limites dos buckets de comandos SQL por requisição (detecta consultas N+1)
+BUCKETS_COMANDOS_SQL = (1, 2, 5, 10, 20, 50, 100)
+
+SEM_REQUISICAO = 'sem_requisicao'
+# Medida da requisição no environ do WSGI, que continua acessível enquanto uma
+# resposta em stream é gerada (o g da requisição já terá sido descartado)
+CHAVE_MEDIDA = 'jit.metricas'
+STATUS_FILA_EMAIL = ('pendente', 'enviando', 'falhou')
+
+
+class Histograma:
+    """Contagens por bucket (não acumuladas), soma e total de observações"""
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)
+        self.soma = 0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+
+def _rotulos(**rotulos):
+    pares = []
+    for nome, valor in rotulos.items():
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pares.append(f'{nome}="{valor}"')
+    return '{' + ','.join(pares) + '}'
+
+
+def _numero(valor):
+    if isinstance(valor, float):
+        return repr(valor)
+    return str(valor)
+
+
+class Metricas:
+    """Registro das métricas de um processo"""
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self._latencia = {}  # (endpoint, método) -> Histograma
+        self._requisicoes = {}  # (endpoint, método, status) -> total
+        self._comandos_por_requisicao = {}  # endpoint -> Histograma
+        self._sql = {}  # endpoint -> [comandos, segundos]
+
+    def registrar_requisicao(self, endpoint, metodo, status, segundos, comandos, segundos_sql):
+        with self._trava:
+            chave = (endpoint, metodo)
+            histograma = self._latencia.get(chave)
+            if histograma is None:
+                histograma = self._latencia[chave] = Histograma(BUCKETS_LATENCIA)
+            histograma.observar(segundos)
+
+            chave_status = (endpoint, metodo, status)
+            self._requisicoes[chave_status] = self._requisicoes.get(chave_status, 0) + 1
+
+            histograma = self._comandos_por_requisicao.get(endpoint)
+            if histograma is None:
+                histograma = self._comandos_por_requisicao[endpoint] = Histograma(BUCKETS_COMANDOS_SQL)
+            histograma.observar(comandos)
+            self._somar_sql(endpoint, comandos, segundos_sql)
+
+    def registrar_sql(self, endpoint, comandos, segundos):
+        with self._trava:
+            self._somar_sql(endpoint, comandos, segundos)
+
+    def _somar_sql(self, endpoint, comandos, segundos):
+        total = self._sql.get(endpoint)
+        if total is None:
+            total = self._sql[endpoint] = [0, 0.0]
+        total[0] += comandos
+        total[1] += segundos
+
+    def exportar(self, medidores=()):
+        """Texto no formato de exposição do Prometheus (versão 0.0.4).
+
+        `medidores` são valores instantâneos adicionais, como tuplas
+        (nome, ajuda, [(rótulos, valor), ...]).
+        """
+        with self._trava:
+            latencia = {chave: (list(h.contagens), h.soma, h.total) for chave, h in self._latencia.items()}
+            requisicoes = dict(self._requisicoes)
+            comandos = {
+                endpoint: (list(h.contagens), h.soma, h.total)
+                for endpoint, h in self._comandos_por_requisicao.items()
+            }
+            sql = {endpoint: tuple(total) for endpoint, total in self._sql.items()}
+
+        linhas = []
+        linhas += self._histograma(
+            'jit_http_requisicao_segundos', 'Latência das requisições por endpoint',
+            BUCKETS_LATENCIA,
+            [({'endpoint': endpoint, 'metodo': metodo}, valores)
+             for (endpoint, metodo), valores in sorted(latencia.items())]
+        )
+        linhas += [
+            '# HELP jit_http_requisicoes_total Requisições atendidas por endpoint e status',
+            '# TYPE jit_http_requisicoes_total counter',
+        ]
+        for (endpoint, metodo, status), total in sorted(requisicoes.items()):
+            linhas.append(f'jit_http_requisicoes_total{_rotulos(endpoint=endpoint, metodo=metodo, status=status)} {total}')
+        linhas += self._histograma(
+            'jit_sql_comandos_por_requisicao', 'Comandos SQL emitidos por requisição',
+            BUCKETS_COMANDOS_SQL,
+            [({'endpoint': endpoint}, valores) for endpoint, valores in sorted(comandos.items())]
+        )
+        linhas += [
+            '# HELP jit_sql_comandos_total Comandos SQL executados por endpoint',
+            '# TYPE jit_sql_comandos_total counter',
+        ]
+        for endpoint, (total, _) in sorted(sql.items()):
+            linhas.append(f'jit_sql_comandos_total{_rotulos(endpoint=endpoint)} {total}')
+        linhas += [
+            '# HELP jit_sql_segundos_total Tempo gasto em comandos SQL por endpoint',
+            '# TYPE jit_sql_segundos_total counter',
+        ]
+        for endpoint, (_, segundos) in sorted(sql.items()):
+            linhas.append(f'jit_sql_segundos_total{_rotulos(endpoint=endpoint)} {_numero(segundos)}')
+
+        for nome, ajuda, valores in medidores:
+            linhas += [f'# HELP {nome} {ajuda}', f'# TYPE {nome} gauge']
+            for rotulos, valor in valores:
+                linhas.append(f'{nome}{_rotulos(**rotulos) if rotulos else ""} {_numero(valor)}')
+        return '\n'.join(linhas) + '\n'
+
+    @staticmethod
+    def _histograma(nome, ajuda, limites, series):
+        linhas = [f'# HELP {nome} {ajuda}', f'# TYPE {nome} histogram']
+        for rotulos, (contagens, soma, total) in series:
+            acumulado = 0
+            for limite, contagem in zip(limites + ('+Inf',), contagens):
+                acumulado += contagem
+                linhas.append(f'{nome}_bucket{_rotulos(**rotulos, le=limite)} {acumulado}')
+            linhas.append(f'{nome}_sum{_rotulos(**rotulos)} {_numero(soma)}')
+            linhas.append(f'{nome}_count{_rotulos(**rotulos)} {total}')
+        return linhas
+
+
+def medidores_fila_email():
+    """Tamanho da fila de emails por status e idade do email pendente mais antigo"""
+    linhas = db.session.query(
+        EmailSaida.status, func.count(EmailSaida.id), func.min(EmailSaida.data_criacao)
+    ).filter(EmailSaida.status.in_(STATUS_FILA_EMAIL)).group_by(EmailSaida.status).all()
+    por_status = {status: (total, mais_antigo) for status, total, mais_antigo in linhas}
+
+    mais_antigo = por_status.get('pendente', (0, None))[1]
+    idade = (datetime.utcnow() - mais_antigo).total_seconds() if mais_antigo else 0.0
+
+    despachante = current_app.extensions.get('fila_email')
+    return [
+        ('jit_fila_email_mensagens', 'Emails na fila por status',
+         [({'status': status}, por_status.get(status, (0, None))[0]) for status in STATUS_FILA_EMAIL]),
+        ('jit_fila_email_pendente_mais_antigo_segundos', 'Idade do email pendente mais antigo',
+         [({}, max(idade, 0.0))]),
+        ('jit_fila_email_workers_ativos', 'Workers da fila de emails em execução neste processo',
+         [({}, 1 if despachante is not None and despachante.ativo else 0)]),
+    ]
+
+
+def instalar(engine, metricas):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _antes_do_comando(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metricas_inicio', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _depois_do_comando(conn, cursor, statement, parameters, context, executemany):
+        inicios = conn.info.get('metricas_inicio')
+        if not inicios:
+            return
+        segundos = time.perf_counter() - inicios.pop()
+        if has_request_context():
+            medida = request.environ.get(CHAVE_MEDIDA)
+            if medida is not None:
+                medida[1] += 1
+                medida[2] += segundos
+                return
+        metricas.registrar_sql(SEM_REQUISICAO, 1, segundos)
+
+    @event.listens_for(engine, 'handle_error')
+    def _comando_falhou(contexto):
+        # after_cursor_execute não roda quando o comando falha (ex.: IntegrityError):
+        # sem isto o início ficaria para sempre na conexão do pool
+        if contexto.connection is not None:
+            contexto.connection.info.pop('metricas_inicio', None)
+
+
+def _endpoint():
+    # Rotas inexistentes ficam num único rótulo, para não criar uma série por URL
+    return request.endpoint or 'desconhecido'
+
+
+def init_app(app):
+    if not app.config['METRICAS_ATIVAS']:
+        return
+    metricas = Metricas()
+    app.extensions['metricas'] = metricas
+    with app.app_context():
+        instalar(db.engine, metricas)
+
+    def _registrar(medida, endpoint, metodo, status):
+        metricas.registrar_requisicao(
+            endpoint, metodo, status,
+            time.perf_counter() - medida[0], medida[1], medida[2]
+        )
+
+    @app.before_request
+    def _iniciar_medida():
+        # [início, comandos SQL, segundos em SQL]
+        g._metricas = request.environ[CHAVE_MEDIDA] = [time.perf_counter(), 0, 0.0]
+
+    @app.after_request
+    def _registrar_medida(response):
+        medida = g.pop('_metricas', None)
+        if medida is None:
+            return response
+        dados = (medida, _endpoint(), request.method, response.status_code)
+        if response.is_streamed:
+            # O corpo ainda não foi gerado: a medida termina quando o envio acabar
+            environ = request.environ
+
+            def _encerrar():
+                environ.pop(CHAVE_MEDIDA, None)
+                _registrar(*dados)
+
+            response.call_on_close(_encerrar)
+        else:
+            request.environ.pop(CHAVE_MEDIDA, None)
+            _registrar(*dados)
+        return response
+
+    @app.teardown_request
+    def _registrar_falha(erro):
+        # after_request não roda quando a view levanta uma exceção não tratada
+        medida = g.pop('_metricas', None)
+        if medida is not None:
+            request.environ.pop(CHAVE_MEDIDA, None)
+            _registrar(medida, _endpoint(), request.method, 500)
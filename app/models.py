@@ -1,13 +1,12 @@
-from app import db, login_manager
+from app import db, login_manager, senhas
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from datetime import datetime, timedelta
 import secrets
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(256))
     nome = db.Column(db.String(100), nullable=False)
     empresa = db.Column(db.String(100))
     tipo = db.Column(db.String(20), default='usuario')
@@ -15,7 +14,7 @@ class User(UserMixin, db.Model):
     
     # NOVOS CAMPOS PARA CONFIRMAÇÃO DE EMAIL
     email_confirmado = db.Column(db.Boolean, default=False)
-    token_confirmacao = db.Column(db.String(100))
+    token_confirmacao = db.Column(db.String(100), index=True)
     
     # NOVOS CAMPOS PARA PERFIL PROFISSIONAL (MOÇAMBIQUE)
     telefone = db.Column(db.String(20))
@@ -50,10 +49,10 @@ class User(UserMixin, db.Model):
     agendamentos = db.relationship('Agendamento', backref='usuario', lazy=True, cascade='all, delete-orphan')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = senhas.gerar_hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return senhas.verificar(self.password_hash, password)
 
     def is_admin(self):
         return self.tipo == 'admin'
@@ -85,9 +84,9 @@ class User(UserMixin, db.Model):
 
     # NOVO MÉTODO PARA ATUALIZAR DATA DE ÚLTIMO ACESSO
     def atualizar_ultimo_acesso(self):
-        """Atualiza a data do último acesso"""
-        self.data_ultimo_acesso = datetime.utcnow()
-        db.session.commit()
+        """Atualiza a data do último acesso (gravada em lote por app.usuarios)"""
+        from app import usuarios
+        usuarios.registrar_acesso(self)
 
     # NOVOS MÉTODOS PARA SISTEMA DE ACESSO POR ETAPAS
     def tem_acesso_completo(self):
@@ -183,7 +182,7 @@ class Terminal(db.Model):
 
 class Doca(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    terminal_id = db.Column(db.Integer, db.ForeignKey('terminal.id'), nullable=False)
+    terminal_id = db.Column(db.Integer, db.ForeignKey('terminal.id'), nullable=False, index=True)
     numero = db.Column(db.String(10), nullable=False)
     tipo_carga = db.Column(db.String(50), default='geral')
     status = db.Column(db.String(20), default='ativa')
@@ -199,6 +198,8 @@ class Agendamento(db.Model):
     doca_id = db.Column(db.Integer, db.ForeignKey('doca.id'), nullable=False)
     data_agendamento = db.Column(db.DateTime, nullable=False)
     duracao_estimada = db.Column(db.Integer, default=60)
+    # FIM DO INTERVALO [data_agendamento, data_fim) - MANTIDO PELOS EVENTOS ABAIXO
+    data_fim = db.Column(db.DateTime)
     tipo_operacao = db.Column(db.String(20), nullable=False)
     tipo_carga = db.Column(db.String(50))
     placa_veiculo = db.Column(db.String(10), nullable=False)
@@ -207,13 +208,40 @@ class Agendamento(db.Model):
     observacoes = db.Column(db.Text)
     status = db.Column(db.String(20), default='pendente')
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
+    # Última alteração - usada pela consolidação incremental (app.utilizacao)
+    data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # NOVOS CAMPOS PARA CANCELAMENTO
     data_cancelamento = db.Column(db.DateTime)
     motivo_cancelamento = db.Column(db.Text)
 
+    # Administradores já avisados do novo agendamento (email imediato ou resumo)
+    notificado_admin = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+
+    # No PostgreSQL a restrição ex_agendamento_doca_sem_sobreposicao (migração
+    # 0008) impede reservas ativas sobrepostas na mesma doca
+    __table_args__ = (
+        # Índice usado pela verificação de sobreposição (app.scheduling)
+        db.Index('ix_agendamento_doca_inicio', 'doca_id', 'data_agendamento', 'status'),
+        # Dashboard e listagem do usuário
+        db.Index('ix_agendamento_usuario_status', 'user_id', 'status'),
+        db.Index('ix_agendamento_usuario_inicio', 'user_id', 'data_agendamento'),
+        # Listagem do admin filtrada por status e contagem de pendentes
+        db.Index('ix_agendamento_status_inicio', 'status', 'data_agendamento'),
+        # Filtros por período (agendamentos de hoje, relatórios)
+        db.Index('ix_agendamento_inicio', 'data_agendamento'),
+        # Agendamentos recentes e do mês
+        db.Index('ix_agendamento_criacao', 'data_criacao'),
+    )
+
     def __repr__(self):
         return f'Agendamento({self.id}, {self.data_agendamento}, {self.status})'
+
+    def calcular_data_fim(self):
+        """Calcula o fim do agendamento a partir do início e da duração"""
+        if self.data_agendamento is None:
+            return None
+        return self.data_agendamento + timedelta(minutes=self.duracao_estimada or 60)
     
     # MÉTODO PARA VERIFICAR SE PODE SER CANCELADO
     def pode_ser_cancelado(self):
@@ -222,4 +250,144 @@ class Agendamento(db.Model):
         if self.data_agendamento <= agora:
             return False
         # Só pode cancelar agendamentos pendentes ou confirmados
-        return self.status in ['pendente', 'confirmado']
\ No newline at end of file
+        return self.status in ['pendente', 'confirmado']
+
+
+@db.event.listens_for(Agendamento, 'before_insert')
+@db.event.listens_for(Agendamento, 'before_update')
+def _atualizar_data_fim(mapper, connection, target):
+    """Mantém data_fim coerente com data_agendamento e duracao_estimada"""
+    target.data_fim = target.calcular_data_fim()
+
+
+class AgendamentoArquivo(db.Model):
+    """Agendamentos encerrados e antigos movidos para fora da tabela principal (app.arquivamento).
+
+    Mesmas colunas de Agendamento (e mesmos ids), mais a data do arquivamento.
+    """
+    __tablename__ = 'agendamento_arquivo'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    doca_id = db.Column(db.Integer, db.ForeignKey('doca.id', ondelete='CASCADE'), nullable=False)
+    data_agendamento = db.Column(db.DateTime, nullable=False)
+    duracao_estimada = db.Column(db.Integer)
+    data_fim = db.Column(db.DateTime)
+    tipo_operacao = db.Column(db.String(20), nullable=False)
+    tipo_carga = db.Column(db.String(50))
+    placa_veiculo = db.Column(db.String(10), nullable=False)
+    nome_motorista = db.Column(db.String(100), nullable=False)
+    telefone_motorista = db.Column(db.String(20))
+    observacoes = db.Column(db.Text)
+    status = db.Column(db.String(20))
+    data_criacao = db.Column(db.DateTime)
+    data_atualizacao = db.Column(db.DateTime)
+    data_cancelamento = db.Column(db.DateTime)
+    motivo_cancelamento = db.Column(db.Text)
+    notificado_admin = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    data_arquivamento = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Relatórios por período e histórico do usuário
+        db.Index('ix_agendamento_arquivo_inicio', 'data_agendamento'),
+        db.Index('ix_agendamento_arquivo_usuario_inicio', 'user_id', 'data_agendamento'),
+        db.Index('ix_agendamento_arquivo_doca_inicio', 'doca_id', 'data_agendamento'),
+    )
+
+    def __repr__(self):
+        return f'AgendamentoArquivo({self.id}, {self.data_agendamento}, {self.status})'
+
+
+class ResumoAgendamento(db.Model):
+    """Totais de agendamentos por dia, terminal e status (mantidos incrementalmente)"""
+    id = db.Column(db.Integer, primary_key=True)
+    dia = db.Column(db.Date, nullable=False)
+    terminal_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    minutos = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('dia', 'terminal_id', 'status', name='uq_resumo_agendamento'),
+        db.Index('ix_resumo_agendamento_status', 'status'),
+    )
+
+    def __repr__(self):
+        return f'ResumoAgendamento({self.dia}, {self.terminal_id}, {self.status}, {self.total})'
+
+
+class UtilizacaoDiaria(db.Model):
+    """Consolidação diária da ocupação de cada doca (preenchida por app.utilizacao)"""
+    id = db.Column(db.Integer, primary_key=True)
+    doca_id = db.Column(db.Integer, nullable=False)
+    dia = db.Column(db.Date, nullable=False, index=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    minutos = db.Column(db.Integer, nullable=False, default=0)
+    confirmados = db.Column(db.Integer, nullable=False, default=0)
+    pendentes = db.Column(db.Integer, nullable=False, default=0)
+    cancelados = db.Column(db.Integer, nullable=False, default=0)
+    rejeitados = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('doca_id', 'dia', name='uq_utilizacao_diaria'),
+    )
+
+    def __repr__(self):
+        return f'UtilizacaoDiaria({self.doca_id}, {self.dia}, {self.total})'
+
+
+class UtilizacaoPendente(db.Model):
+    """Dias a reconsolidar que a data de atualização dos agendamentos não indica
+    (agendamentos excluídos e dias anteriores de agendamentos remarcados)"""
+    dia = db.Column(db.Date, primary_key=True)
+    data_registro = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'UtilizacaoPendente({self.dia})'
+
+
+class MarcaProcessamento(db.Model):
+    """Marca d'água de tarefas incrementais (até onde os dados já foram processados)"""
+    nome = db.Column(db.String(50), primary_key=True)
+    valor = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'MarcaProcessamento({self.nome}, {self.valor})'
+
+
+class EmailSaida(db.Model):
+    """Fila persistente de emails (gravada na mesma transação que os originou)"""
+    id = db.Column(db.Integer, primary_key=True)
+    assunto = db.Column(db.String(200), nullable=False)
+    remetente = db.Column(db.String(120))
+    destinatarios = db.Column(db.Text, nullable=False)  # separados por vírgula
+    corpo_texto = db.Column(db.Text)
+    corpo_html = db.Column(db.Text)
+    status = db.Column(db.String(20), nullable=False, default='pendente')  # pendente, enviando, enviado, falhou
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    proxima_tentativa = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    reservado_por = db.Column(db.String(32), index=True)
+    ultimo_erro = db.Column(db.Text)
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
+    data_envio = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # Busca dos próximos emails a enviar
+        db.Index('ix_email_saida_status_tentativa', 'status', 'proxima_tentativa'),
+    )
+
+    @property
+    def lista_destinatarios(self):
+        return [email for email in self.destinatarios.split(',') if email]
+
+    def __repr__(self):
+        return f'EmailSaida({self.id}, {self.status}, {self.assunto})'
+
+
+class VersaoDados(db.Model):
+    """Contador de versão de um conjunto de dados (usado nos ETags da API)"""
+    nome = db.Column(db.String(50), primary_key=True)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'VersaoDados({self.nome}, {self.versao})'
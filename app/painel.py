@@ -0,0 +1,175 @@
+"""Painel ao vivo das docas: eventos de agendamento enviados por SSE.
+
+As rotas registram os eventos na transação (via app.events); cada evento é
+serializado uma única vez e publicado somente depois do commit, num
+transmissor em memória que repassa o mesmo texto a todas as conexões abertas.
+Telas conectadas não consultam o banco: recebem apenas o que mudou.
+
+O transmissor vive no processo; com vários processos (workers do gunicorn)
+cada um atende apenas as conexões e os eventos que passaram por ele. Cada
+conexão SSE ocupa uma thread (ou greenlet) enquanto estiver aberta.
+"""
+import json
+import queue
+import threading
+from collections import deque
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+
+# Eventos mantidos para reenvio a quem reconecta com Last-Event-ID
+TAMANHO_HISTORICO = 500
+# Eventos aguardando envio por conexão; uma tela que não acompanha é desconectada
+TAMANHO_FILA_ASSINANTE = 200
+# Intervalo do comentário de keep-alive enviado às conexões ociosas (segundos)
+INTERVALO_KEEPALIVE = 15
+# Acima disso, uma alteração em lote vira um único aviso para recarregar a tela
+LIMITE_EVENTOS_LOTE = 50
+
+TIPO_POR_STATUS = {
+    'confirmado': 'aprovado',
+    'rejeitado': 'rejeitado',
+    'cancelado': 'cancelado',
+}
+
+
+class Assinatura:
+    """Uma conexão SSE aberta"""
+
+    def __init__(self):
+        self.fila = queue.Queue(TAMANHO_FILA_ASSINANTE)
+        self.ativa = True
+
+
+class Transmissor:
+    """Distribui cada evento publicado a todas as assinaturas abertas"""
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self._assinaturas = set()
+        self._historico = deque(maxlen=TAMANHO_HISTORICO)
+        self._ultimo_id = 0
+
+    @property
+    def conexoes(self):
+        return len(self._assinaturas)
+
+    def publicar(self, eventos):
+        """Publica uma lista de eventos (dicts com 'tipo' e 'dados')"""
+        with self._trava:
+            mensagens = []
+            for evento in eventos:
+                self._ultimo_id += 1
+                mensagem = (
+                    f"id: {self._ultimo_id}\n"
+                    f"event: {evento['tipo']}\n"
+                    f"data: {json.dumps(evento['dados'], ensure_ascii=False)}\n\n"
+                )
+                self._historico.append((self._ultimo_id, mensagem))
+                mensagens.append(mensagem)
+            assinaturas = list(self._assinaturas)
+
+        for assinatura in assinaturas:
+            try:
+                for mensagem in mensagens:
+                    assinatura.fila.put_nowait(mensagem)
+            except queue.Full:
+                # O cliente reconecta e recupera o que perdeu pelo Last-Event-ID
+                self.cancelar(assinatura)
+
+    def assinar(self, ultimo_id=None):
+        """Abre uma assinatura, já com os eventos posteriores a `ultimo_id`"""
+        assinatura = Assinatura()
+        with self._trava:
+            if ultimo_id is not None:
+                pendentes = [mensagem for id, mensagem in self._historico if id > ultimo_id]
+                for mensagem in pendentes[-TAMANHO_FILA_ASSINANTE:]:
+                    assinatura.fila.put_nowait(mensagem)
+            self._assinaturas.add(assinatura)
+        return assinatura
+
+    def cancelar(self, assinatura):
+        with self._trava:
+            self._assinaturas.discard(assinatura)
+        assinatura.ativa = False
+
+    def transmitir(self, assinatura):
+        """Gerador com o corpo da resposta text/event-stream da assinatura"""
+        try:
+            yield "retry: 3000\n\n"
+            while assinatura.ativa:
+                try:
+                    yield assinatura.fila.get(timeout=INTERVALO_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            self.cancelar(assinatura)
+
+
+def _dados_agendamento(agendamento):
+    doca = agendamento.doca
+    return {
+        'id': agendamento.id,
+        'status': agendamento.status,
+        'data_agendamento': agendamento.data_agendamento.strftime('%Y-%m-%dT%H:%M'),
+        'data_fim': agendamento.calcular_data_fim().strftime('%Y-%m-%dT%H:%M'),
+        'doca_id': agendamento.doca_id,
+        'doca': doca.numero,
+        'terminal': doca.terminal.nome,
+        'tipo_operacao': agendamento.tipo_operacao,
+        'placa_veiculo': agendamento.placa_veiculo,
+        'usuario': agendamento.usuario.nome,
+        'empresa': agendamento.usuario.empresa,
+    }
+
+
+def registrar(alteracoes, session=None):
+    """Registra as alterações [(agendamento, status_anterior)] para publicar após o commit"""
+    session = session or db.session()
+    pendentes = session.info.setdefault('eventos_painel', [])
+    pendentes.extend(alteracoes)
+
+
+def recarregar(session=None):
+    """Pede às telas que recarreguem (alterações em massa, ex.: realocação de docas)"""
+    session = session or db.session()
+    session.info['painel_recarregar'] = True
+
+
+@event.listens_for(Session, 'before_commit')
+def _serializar_eventos(session):
+    alteracoes = session.info.pop('eventos_painel', None)
+    if not alteracoes:
+        return
+    if len(alteracoes) > LIMITE_EVENTOS_LOTE:
+        session.info['painel_recarregar'] = True
+        return
+    if any(agendamento.id is None for agendamento, _ in alteracoes):
+        session.flush()
+    # Serializa ainda na transação, com os objetos carregados
+    session.info['painel_publicar'] = [{
+        'tipo': 'criado' if status_anterior is None else TIPO_POR_STATUS.get(agendamento.status, 'alterado'),
+        'dados': _dados_agendamento(agendamento)
+    } for agendamento, status_anterior in alteracoes]
+
+
+@event.listens_for(Session, 'after_commit')
+def _publicar_apos_commit(session):
+    eventos = session.info.pop('painel_publicar', [])
+    if session.info.pop('painel_recarregar', False):
+        eventos = [{'tipo': 'recarregar', 'dados': {}}]
+    if eventos and has_app_context():
+        transmissor = current_app.extensions.get('painel')
+        if transmissor is not None:
+            transmissor.publicar(eventos)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_eventos(session):
+    for chave in ('eventos_painel', 'painel_publicar', 'painel_recarregar'):
+        session.info.pop(chave, None)
+
+
+def init_app(app):
+    app.extensions['painel'] = Transmissor()
@@ -0,0 +1,189 @@
+"""Perfil por amostragem de requisições isoladas, sob demanda de um administrador.
+
+Uma requisição de administrador com ?perfilar=1 (ou o cabeçalho
+X-Perfilar: 1) é acompanhada por uma thread que, a cada
+PERFILADOR_INTERVALO_MS, lê a pilha da thread que atende a requisição. O
+resultado fica em "folded stacks" (uma linha 'quadro;quadro;quadro N' por
+pilha distinta), o formato aceito pelo flamegraph.pl e pelo speedscope, num
+armazenamento em memória com os últimos PERFIS_TAMANHO perfis do processo,
+listados em /admin/perfis. A resposta perfilada traz o cabeçalho X-Perfil-Id.
+Em respostas em stream (exportações) a amostragem segue até o fim do envio do
+corpo (response.call_on_close), onde está a maior parte do trabalho.
+
+Requisições sem o pedido não pagam nada além de conferir o parâmetro.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from functools import lru_cache
+from flask import current_app, g, request
+from flask_login import current_user
+
+CABECALHO = 'X-Perfilar'
+PARAMETRO = 'perfilar'
+
+_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@lru_cache(maxsize=4096)
+def _nome_arquivo(caminho):
+    # Caminhos curtos: relativo ao projeto ou ao site-packages
+    if caminho.startswith(_RAIZ):
+        return os.path.relpath(caminho, _RAIZ)
+    if 'site-packages' + os.sep in caminho:
+        return caminho.split('site-packages' + os.sep, 1)[1]
+    return os.path.basename(caminho)
+
+
+def _quadro(frame):
+    codigo = frame.f_code
+    return f'{codigo.co_name} ({_nome_arquivo(codigo.co_filename)}:{codigo.co_firstlineno})'
+
+
+class Amostrador(threading.Thread):
+    """Amostra periodicamente a pilha de outra thread"""
+
+    def __init__(self, alvo, intervalo):
+        super().__init__(name='perfilador', daemon=True)
+        self.alvo = alvo
+        self.intervalo = intervalo
+        self.pilhas = Counter()
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.alvo)
+            pilha = []
+            while frame is not None:
+                pilha.append(_quadro(frame))
+                frame = frame.f_back
+            if pilha:
+                self.pilhas[';'.join(reversed(pilha))] += 1
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+
+
+class Perfil:
+    def __init__(self, id, endpoint, url, status, duracao_ms, intervalo_ms, pilhas):
+        self.id = id
+        self.data = datetime.now()
+        self.endpoint = endpoint
+        self.url = url
+        self.status = status
+        self.duracao_ms = duracao_ms
+        self.intervalo_ms = intervalo_ms
+        self.pilhas = pilhas
+
+    @property
+    def amostras(self):
+        return sum(self.pilhas.values())
+
+    def folded(self):
+        """Texto no formato folded stacks (entrada do flamegraph.pl/speedscope)"""
+        return ''.join(f'{pilha} {total}\n' for pilha, total in self.pilhas.most_common())
+
+    def funcoes(self, limite=30):
+        """Funções com mais amostras: (função, próprias, inclusivas), pelas inclusivas"""
+        proprias = Counter()
+        inclusivas = Counter()
+        for pilha, total in self.pilhas.items():
+            quadros = pilha.split(';')
+            proprias[quadros[-1]] += total
+            for quadro in set(quadros):
+                inclusivas[quadro] += total
+        return [(quadro, proprias[quadro], total) for quadro, total in inclusivas.most_common(limite)]
+
+
+class ArmazenamentoPerfis:
+    """Últimos perfis gravados no processo"""
+
+    def __init__(self, tamanho):
+        self._trava = threading.Lock()
+        self._perfis = deque(maxlen=tamanho)
+        self._proximo_id = 1
+
+    def reservar_id(self):
+        # O id vai no cabeçalho da resposta antes de o perfil terminar (respostas em stream)
+        with self._trava:
+            id = self._proximo_id
+            self._proximo_id += 1
+            return id
+
+    def adicionar(self, id, **dados):
+        perfil = Perfil(id, **dados)
+        with self._trava:
+            self._perfis.append(perfil)
+        return perfil
+
+    def listar(self):
+        with self._trava:
+            return list(reversed(self._perfis))
+
+    def obter(self, id):
+        with self._trava:
+            for perfil in self._perfis:
+                if perfil.id == id:
+                    return perfil
+        return None
+
+
+def _pedido():
+    return request.args.get(PARAMETRO) == '1' or request.headers.get(CABECALHO) == '1'
+
+
+def init_app(app):
+    armazenamento = ArmazenamentoPerfis(app.config['PERFIS_TAMANHO'])
+    app.extensions['perfis'] = armazenamento
+
+    @app.before_request
+    def _iniciar_perfil():
+        if not _pedido() or not current_user.is_authenticated or not current_user.is_admin():
+            return
+        intervalo = current_app.config['PERFILADOR_INTERVALO_MS'] / 1000
+        amostrador = Amostrador(threading.get_ident(), intervalo)
+        g._perfil = (amostrador, time.perf_counter())
+        amostrador.start()
+
+    def _encerrar(dados, id, endpoint, url, status):
+        amostrador, inicio = dados
+        duracao_ms = round((time.perf_counter() - inicio) * 1000, 1)
+        amostrador.parar()
+        armazenamento.adicionar(
+            id,
+            endpoint=endpoint,
+            url=url,
+            status=status,
+            duracao_ms=duracao_ms,
+            intervalo_ms=app.config['PERFILADOR_INTERVALO_MS'],
+            pilhas=amostrador.pilhas
+        )
+
+    def _descricao():
+        return request.endpoint or 'desconhecido', request.full_path.rstrip('?')
+
+    @app.after_request
+    def _gravar_perfil(response):
+        dados = g.pop('_perfil', None)
+        if dados is None:
+            return response
+        id = armazenamento.reservar_id()
+        argumentos = (dados, id, *_descricao(), response.status_code)
+        if response.is_streamed:
+            # O corpo ainda não foi gerado: a amostragem continua até o fim do envio
+            response.call_on_close(lambda: _encerrar(*argumentos))
+        else:
+            _encerrar(*argumentos)
+        response.headers['X-Perfil-Id'] = str(id)
+        return response
+
+    @app.teardown_request
+    def _gravar_perfil_falha(erro):
+        # after_request não roda quando a view levanta uma exceção não tratada
+        dados = g.pop('_perfil', None)
+        if dados is not None:
+            _encerrar(dados, armazenamento.reservar_id(), *_descricao(), 500)
@@ -0,0 +1,144 @@
+"""Resumo de agendamentos por dia, terminal e status.
+
+Os dashboards leem a tabela ResumoAgendamento em vez de agregar a tabela de
+agendamentos inteira. Cada criação ou mudança de status ajusta as linhas
+afetadas na mesma transação da alteração; reconstruir() recalcula tudo a
+partir dos agendamentos (inclusive os arquivados) para corrigir eventuais
+divergências.
+"""
+from operator import itemgetter
+from sqlalchemy import func
+from app import db
+from app.arquivamento import historico
+from app.models import Doca, ResumoAgendamento
+from app.utils import como_data, insert_com_conflito
+
+# Linhas por comando (5 parâmetros cada, dentro do limite do SQLite)
+LINHAS_POR_COMANDO = 1000
+
+
+def _ajustar_linhas(linhas):
+    """Soma (ou subtrai) total e minutos nas linhas do resumo, criando as que faltarem.
+
+    linhas: lista de dicts com dia, terminal_id, status, total e minutos.
+    Um único INSERT ... ON CONFLICT DO UPDATE (SQLite e PostgreSQL): sem
+    leitura prévia (nem autoflush), e transações que criam a mesma linha ao
+    mesmo tempo não colidem em uq_resumo_agendamento. As linhas vão em ordem
+    de chave para que transações concorrentes as travem na mesma ordem.
+    """
+    linhas = sorted(linhas, key=itemgetter('dia', 'terminal_id', 'status'))
+    for inicio in range(0, len(linhas), LINHAS_POR_COMANDO):
+        comando = insert_com_conflito(ResumoAgendamento).values(linhas[inicio:inicio + LINHAS_POR_COMANDO])
+        db.session.execute(comando.on_conflict_do_update(
+            index_elements=['dia', 'terminal_id', 'status'],
+            set_={
+                'total': ResumoAgendamento.total + comando.excluded.total,
+                'minutos': ResumoAgendamento.minutos + comando.excluded.minutos,
+            }
+        ))
+
+
+def ajustar_lote(deltas):
+    """Aplica vários ajustes de uma vez.
+
+    deltas: {(dia, terminal_id, status): (total, minutos)}
+    """
+    _ajustar_linhas([
+        dict(dia=dia, terminal_id=terminal_id, status=status, total=total, minutos=minutos)
+        for (dia, terminal_id, status), (total, minutos) in deltas.items()
+        if total or minutos
+    ])
+
+
+def registrar(agendamento, status_anterior=None):
+    """Atualiza o resumo após criar um agendamento ou mudar seu status"""
+    if status_anterior == agendamento.status:
+        return
+    dia = agendamento.data_agendamento.date()
+    terminal_id = db.session.get(Doca, agendamento.doca_id).terminal_id
+    minutos = agendamento.duracao_estimada or 0
+    deltas = {(dia, terminal_id, agendamento.status): (1, minutos)}
+    if status_anterior is not None:
+        deltas[(dia, terminal_id, status_anterior)] = (-1, -minutos)
+    ajustar_lote(deltas)
+
+
+def registrar_lote(alteracoes):
+    """Atualiza o resumo para vários agendamentos de uma vez.
+
+    alteracoes: lista de (agendamento, status_anterior). Os ajustes são
+    somados por (dia, terminal, status) antes de gravar.
+    """
+    deltas = {}
+    for agendamento, status_anterior in alteracoes:
+        if status_anterior == agendamento.status:
+            continue
+        dia = agendamento.data_agendamento.date()
+        terminal_id = db.session.get(Doca, agendamento.doca_id).terminal_id
+        minutos = agendamento.duracao_estimada or 0
+        ajustes = [(agendamento.status, 1, minutos)]
+        if status_anterior is not None:
+            ajustes.append((status_anterior, -1, -minutos))
+        for status, total, minutos_ajuste in ajustes:
+            chave = (dia, terminal_id, status)
+            total_atual, minutos_atual = deltas.get(chave, (0, 0))
+            deltas[chave] = (total_atual + total, minutos_atual + minutos_ajuste)
+    ajustar_lote(deltas)
+
+
+def _totais_por_doca(doca_id):
+    """Totais dos agendamentos de uma doca (inclusive arquivados) agrupados por dia e status"""
+    agendamento = historico()
+    dia = func.date(agendamento.data_agendamento)
+    return db.session.query(
+        dia,
+        agendamento.status,
+        func.count(agendamento.id),
+        func.coalesce(func.sum(agendamento.duracao_estimada), 0)
+    ).filter(agendamento.doca_id == doca_id).group_by(
+        dia, agendamento.status
+    ).all()
+
+
+def mover_doca(doca_id, terminal_origem, terminal_destino):
+    """Transfere os totais de uma doca entre terminais (ou os remove, se destino for None)"""
+    if terminal_origem == terminal_destino:
+        return
+    deltas = {}
+    for dia, status, total, minutos in _totais_por_doca(doca_id):
+        dia = como_data(dia)
+        if terminal_origem is not None:
+            deltas[(dia, terminal_origem, status)] = (-total, -minutos)
+        if terminal_destino is not None:
+            deltas[(dia, terminal_destino, status)] = (total, minutos)
+    ajustar_lote(deltas)
+
+
+def remover_terminal(terminal_id):
+    """Remove as linhas do resumo de um terminal excluído"""
+    ResumoAgendamento.query.filter_by(terminal_id=terminal_id).delete()
+
+
+def reconstruir():
+    """Recalcula o resumo inteiro a partir dos agendamentos, inclusive os arquivados"""
+    ResumoAgendamento.query.delete()
+    agendamento = historico()
+    dia = func.date(agendamento.data_agendamento)
+    origem = db.select(
+        dia,
+        Doca.terminal_id,
+        agendamento.status,
+        func.count(agendamento.id),
+        func.coalesce(func.sum(agendamento.duracao_estimada), 0)
+    ).select_from(agendamento).join(Doca, agendamento.doca_id == Doca.id).filter(
+        agendamento.status.isnot(None)
+    ).group_by(
+        dia, Doca.terminal_id, agendamento.status
+    )
+    db.session.execute(
+        db.insert(ResumoAgendamento).from_select(
+            ['dia', 'terminal_id', 'status', 'total', 'minutos'], origem
+        )
+    )
+    db.session.commit()
+    return ResumoAgendamento.query.count()
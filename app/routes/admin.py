@@ -1,23 +1,41 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
+from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, abort, Response, stream_with_context, jsonify
 from flask_login import login_required, current_user
-from app.models import Agendamento, Terminal, Doca, User
+from app.models import Agendamento, Terminal, Doca, User, ResumoAgendamento, UtilizacaoDiaria
 from app import db
 from datetime import datetime, date, timedelta
-from sqlalchemy import func
+from functools import wraps
+from sqlalchemy import and_, case, func
+from sqlalchemy.orm import contains_eager
+from app import arquivamento, metricas, resumo, topologia
+from app.events import agendamento_alterado, agendamentos_alterados
+from app.scheduling import alocar_pendentes, conflitos_aprovacao, STATUS_ATIVOS, DURACAO_MAXIMA_MINUTOS
+from app.utils import intervalo_dias, opcoes_detalhes_agendamento, paginar_keyset
+from app.utilizacao import ultima_atualizacao
+from app.exportacao import consulta_exportacao, gerar_csv, gerar_ndjson
 from app.email import send_agendamento_confirmacao, send_agendamento_cancelamento, send_novo_agendamento_admin, send_agendamento_rejeitado  # ← ADICIONE ESTA LINHA
 
 admin_bp = Blueprint('admin', __name__)
 
+def admin_required(view):
+    """Restringe a view a administradores (403 para os demais); usar abaixo de @login_required"""
+    @wraps(view)
+    def decorada(*args, **kwargs):
+        if not current_user.is_admin():
+            abort(403)
+        return view(*args, **kwargs)
+    return decorada
+
 @admin_bp.route('/dashboard')
 @login_required
 def dashboard():
-    total_agendamentos = Agendamento.query.count()
-    agendamentos_hoje = Agendamento.query.filter(
-        db.func.date(Agendamento.data_agendamento) == datetime.today().date()
-    ).count()
-    agendamentos_pendentes = Agendamento.query.filter_by(status='pendente').count()
+    # Totais lidos do resumo incremental (app.resumo), sem varrer os agendamentos
+    total_agendamentos, agendamentos_hoje, agendamentos_pendentes = db.session.query(
+        func.coalesce(func.sum(ResumoAgendamento.total), 0),
+        func.coalesce(func.sum(case((ResumoAgendamento.dia == date.today(), ResumoAgendamento.total), else_=0)), 0),
+        func.coalesce(func.sum(case((ResumoAgendamento.status == 'pendente', ResumoAgendamento.total), else_=0)), 0)
+    ).one()
     total_usuarios = User.query.filter_by(tipo='usuario').count()
-    agendamentos_recentes = Agendamento.query.order_by(
+    agendamentos_recentes = Agendamento.query.options(*opcoes_detalhes_agendamento()).order_by(
         Agendamento.data_criacao.desc()
     ).limit(5).all()
     return render_template('admin/dashboard.html',
@@ -31,12 +49,18 @@ def dashboard():
 @login_required
 def agendamentos():
     status_filter = request.args.get('status', 'todos')
-    query = Agendamento.query
+    query = Agendamento.query.options(*opcoes_detalhes_agendamento())
     if status_filter != 'todos':
         query = query.filter_by(status=status_filter)
-    agendamentos_lista = query.order_by(Agendamento.data_agendamento.asc()).all()
+    pagina = paginar_keyset(
+        query, Agendamento.data_agendamento, Agendamento.id,
+        cursor=request.args.get('cursor'),
+        direcao=request.args.get('direcao', 'proxima'),
+        tamanho=current_app.config['ITENS_POR_PAGINA']
+    )
     return render_template('admin/agendamentos.html',
-                           agendamentos=agendamentos_lista,
+                           agendamentos=pagina.itens,
+                           pagina=pagina,
                            status_filter=status_filter)
 
 # CORREÇÃO: Adicionar decorador de rota para aprovar agendamento
@@ -44,15 +68,14 @@ def agendamentos():
 @login_required
 def aprovar_agendamento(id):
     agendamento = Agendamento.query.get_or_404(id)
+    status_anterior = agendamento.status
     agendamento.status = 'confirmado'
+    agendamento_alterado(agendamento, status_anterior)
+    # EMAIL DE CONFIRMAÇÃO (enfileirado na mesma transação)
+    send_agendamento_confirmacao(agendamento)
     db.session.commit()
     
-    # ENVIAR EMAIL DE CONFIRMAÇÃO
-    try:
-        send_agendamento_confirmacao(agendamento)
-        flash('Agendamento aprovado e email de confirmação enviado!', 'success')
-    except Exception as e:
-        flash(f'Agendamento aprovado, mas erro ao enviar email: {str(e)}', 'warning')
+    flash('Agendamento aprovado! O email de confirmação será enviado em instantes.', 'success')
     
     return redirect(url_for('admin.agendamentos'))
 
@@ -61,18 +84,80 @@ def aprovar_agendamento(id):
 @login_required
 def rejeitar_agendamento(id):
     agendamento = Agendamento.query.get_or_404(id)
+    status_anterior = agendamento.status
     agendamento.status = 'rejeitado'  # ← CORRIGIDO: mudar para 'rejeitado' em vez de 'cancelado'
+    agendamento_alterado(agendamento, status_anterior)
+    # EMAIL DE REJEIÇÃO (enfileirado na mesma transação)
+    send_agendamento_rejeitado(agendamento)
     db.session.commit()
     
-    # ENVIAR EMAIL DE REJEIÇÃO
-    try:
-        send_agendamento_rejeitado(agendamento)
-        flash('Agendamento rejeitado e email enviado!', 'success')
-    except Exception as e:
-        flash(f'Agendamento rejeitado, mas erro ao enviar email: {str(e)}', 'warning')
+    flash('Agendamento rejeitado! O email ao usuário será enviado em instantes.', 'success')
     
     return redirect(url_for('admin.agendamentos'))
 
+# APROVAÇÃO / REJEIÇÃO EM LOTE
+@admin_bp.route('/agendamentos/lote', methods=['POST'])
+@login_required
+@admin_required
+def agendamentos_em_lote():
+    acao = request.form.get('acao')
+    ids = request.form.getlist('ids', type=int)
+    destino = url_for('admin.agendamentos', status=request.form.get('status', 'pendente'))
+    if acao not in ('aprovar', 'rejeitar') or not ids:
+        flash('Selecione ao menos um agendamento e a ação desejada.', 'warning')
+        return redirect(destino)
+    
+    # Uma consulta para todos os agendamentos (com usuário e doca para os emails)
+    agendamentos = Agendamento.query.options(*opcoes_detalhes_agendamento()).filter(
+        Agendamento.id.in_(ids),
+        Agendamento.status == 'pendente'
+    ).order_by(Agendamento.data_agendamento, Agendamento.id).all()
+    
+    if acao == 'aprovar':
+        conflitantes = conflitos_aprovacao(agendamentos)
+        novo_status, enviar_email = 'confirmado', send_agendamento_confirmacao
+    else:
+        conflitantes = set()
+        novo_status, enviar_email = 'rejeitado', send_agendamento_rejeitado
+    
+    # Tudo numa única transação: status, resumo e emails enfileirados
+    alteracoes = []
+    for agendamento in agendamentos:
+        if agendamento.id in conflitantes:
+            continue
+        alteracoes.append((agendamento, agendamento.status))
+        agendamento.status = novo_status
+        enviar_email(agendamento)
+    agendamentos_alterados(alteracoes)
+    db.session.commit()
+    
+    verbo = 'aprovado(s)' if acao == 'aprovar' else 'rejeitado(s)'
+    flash(f'{len(alteracoes)} agendamento(s) {verbo}! Os emails serão enviados em instantes.', 'success')
+    if conflitantes:
+        flash(f'{len(conflitantes)} agendamento(s) não aprovado(s) por conflito de horário com agendamentos confirmados: '
+              + ', '.join(f'#{id}' for id in sorted(conflitantes)), 'warning')
+    ignorados = len(set(ids)) - len(agendamentos)
+    if ignorados:
+        flash(f'{ignorados} agendamento(s) ignorado(s) por não estarem mais pendentes.', 'info')
+    
+    return redirect(destino)
+
+# ALOCAÇÃO AUTOMÁTICA DOS AGENDAMENTOS PENDENTES NAS DOCAS
+@admin_bp.route('/agendamentos/alocar', methods=['POST'])
+@login_required
+@admin_required
+def alocar_agendamentos():
+    dias = request.form.get('dias', 7, type=int)
+    inicio = datetime.now()
+    alocados, nao_alocados = alocar_pendentes(inicio, inicio + timedelta(days=dias))
+    
+    if nao_alocados:
+        flash(f'{alocados} agendamento(s) pendente(s) alocado(s); {nao_alocados} sem doca compatível livre.', 'warning')
+    else:
+        flash(f'{alocados} agendamento(s) pendente(s) alocado(s) nas docas.', 'success')
+    
+    return redirect(url_for('admin.agendamentos', status='pendente'))
+
 # ========== TERMINAIS ==========
 @admin_bp.route('/terminais')
 @login_required
@@ -126,6 +211,7 @@ def editar_terminal(id):
 @login_required
 def excluir_terminal(id):
     terminal = Terminal.query.get_or_404(id)
+    resumo.remover_terminal(terminal.id)
     db.session.delete(terminal)
     db.session.commit()
     flash('Terminal excluído com sucesso!', 'success')
@@ -138,7 +224,7 @@ def docas():
     terminal_id = request.args.get('terminal', type=int)
     status_filter = request.args.get('status')
     
-    query = Doca.query.join(Terminal)
+    query = Doca.query.join(Terminal).options(contains_eager(Doca.terminal))
     
     if terminal_id:
         query = query.filter(Doca.terminal_id == terminal_id)
@@ -146,8 +232,18 @@ def docas():
         query = query.filter(Doca.status == status_filter)
     
     docas_lista = query.all()
-    terminais = Terminal.query.all()
-    return render_template('admin/docas.html', docas=docas_lista, terminais=terminais)
+    terminais = topologia.obter().terminais
+    
+    # Total de agendamentos por doca numa única consulta agrupada
+    agendamentos_por_doca = dict(db.session.query(
+        Agendamento.doca_id,
+        func.count(Agendamento.id)
+    ).filter(
+        Agendamento.doca_id.in_([d.id for d in docas_lista])
+    ).group_by(Agendamento.doca_id).all()) if docas_lista else {}
+    
+    return render_template('admin/docas.html', docas=docas_lista, terminais=terminais,
+                           agendamentos_por_doca=agendamentos_por_doca)
 
 @admin_bp.route('/docas/novo', methods=['GET', 'POST'])
 @login_required
@@ -169,7 +265,7 @@ def nova_doca():
         flash('Doca criada com sucesso!', 'success')
         return redirect(url_for('admin.docas'))
     
-    terminais = Terminal.query.all()
+    terminais = topologia.obter().terminais
     return render_template('admin/nova_doca.html', terminais=terminais)
 
 @admin_bp.route('/docas/<int:id>/editar', methods=['GET', 'POST'])
@@ -178,7 +274,9 @@ def editar_doca(id):
     doca = Doca.query.get_or_404(id)
     
     if request.method == 'POST':
-        doca.terminal_id = request.form.get('terminal_id')
+        terminal_anterior = doca.terminal_id
+        doca.terminal_id = request.form.get('terminal_id', type=int)
+        resumo.mover_doca(doca.id, terminal_anterior, doca.terminal_id)
         doca.numero = request.form.get('numero')
         doca.tipo_carga = request.form.get('tipo_carga')
         doca.status = request.form.get('status')
@@ -187,13 +285,14 @@ def editar_doca(id):
         flash('Doca atualizada com sucesso!', 'success')
         return redirect(url_for('admin.docas'))
     
-    terminais = Terminal.query.all()
+    terminais = topologia.obter().terminais
     return render_template('admin/editar_doca.html', doca=doca, terminais=terminais)
 
 @admin_bp.route('/docas/<int:id>/excluir', methods=['POST'])
 @login_required
 def excluir_doca(id):
     doca = Doca.query.get_or_404(id)
+    resumo.mover_doca(doca.id, doca.terminal_id, None)
     db.session.delete(doca)
     db.session.commit()
     flash('Doca excluída com sucesso!', 'success')
@@ -203,8 +302,10 @@ def excluir_doca(id):
 @admin_bp.route('/relatorios')
 @login_required
 def relatorios():
-    # Estatísticas básicas para o dashboard de relatórios
-    total_agendamentos = Agendamento.query.count()
+    # Estatísticas básicas para o dashboard de relatórios (lidas do resumo incremental)
+    total_agendamentos = db.session.query(
+        func.coalesce(func.sum(ResumoAgendamento.total), 0)
+    ).scalar()
     
     # Agendamentos deste mês - CORREÇÃO
     primeiro_dia_mes = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
@@ -213,21 +314,23 @@ def relatorios():
     ).count()
     
     # Taxa de ocupação simplificada - CORREÇÃO
-    total_minutos = db.session.query(func.sum(Agendamento.duracao_estimada)).scalar() or 0
+    total_minutos = db.session.query(func.sum(ResumoAgendamento.minutos)).scalar() or 0
     horas_totais = 30 * 12 * 60  # 30 dias × 12 horas × 60 minutos
     taxa_ocupacao = (total_minutos / horas_totais) * 100 if horas_totais > 0 else 0
     
     # Agendamentos por status
     agendamentos_por_status = db.session.query(
-        Agendamento.status,
-        func.count(Agendamento.id)
-    ).group_by(Agendamento.status).all()
+        ResumoAgendamento.status,
+        func.sum(ResumoAgendamento.total)
+    ).group_by(ResumoAgendamento.status).having(func.sum(ResumoAgendamento.total) > 0).all()
     
     # Agendamentos por terminal - CORREÇÃO
     agendamentos_por_terminal = db.session.query(
         Terminal.nome,
-        func.count(Agendamento.id)
-    ).select_from(Terminal).join(Doca).join(Agendamento).group_by(Terminal.id, Terminal.nome).all()
+        func.sum(ResumoAgendamento.total)
+    ).select_from(Terminal).join(
+        ResumoAgendamento, ResumoAgendamento.terminal_id == Terminal.id
+    ).group_by(Terminal.id, Terminal.nome).having(func.sum(ResumoAgendamento.total) > 0).all()
     
     return render_template('admin/relatorios.html',
                          total_agendamentos=total_agendamentos,
@@ -236,41 +339,231 @@ def relatorios():
                          agendamentos_por_status=agendamentos_por_status,
                          agendamentos_por_terminal=agendamentos_por_terminal)
 
-@admin_bp.route('/relatorios/agendamentos')
-@login_required
-def relatorio_agendamentos():
+def _periodo_relatorio(dias_padrao):
+    """Lê data_inicio/data_fim da query string (padrão: últimos dias_padrao dias)"""
     data_inicio_str = request.args.get('data_inicio')
     data_fim_str = request.args.get('data_fim')
     
     if data_inicio_str:
         data_inicio = datetime.strptime(data_inicio_str, '%Y-%m-%d').date()
     else:
-        data_inicio = date.today() - timedelta(days=30)
+        data_inicio = date.today() - timedelta(days=dias_padrao)
     
     if data_fim_str:
         data_fim = datetime.strptime(data_fim_str, '%Y-%m-%d').date()
     else:
         data_fim = date.today()
     
-    agendamentos = Agendamento.query.filter(
-        Agendamento.data_agendamento.between(data_inicio, data_fim)
-    ).order_by(Agendamento.data_agendamento.desc()).all()
+    return data_inicio, data_fim
+
+def _filtro_periodo(data_inicio, data_fim, agendamento=Agendamento):
+    # Faixa [data_inicio, data_fim + 1 dia) inclui todo o último dia e usa o índice
+    inicio, fim = intervalo_dias(data_inicio, data_fim)
+    return (
+        agendamento.data_agendamento >= inicio,
+        agendamento.data_agendamento < fim
+    )
+
+def _incluir_arquivo():
+    # Agendamentos arquivados (app.arquivamento) só entram nos relatórios sob pedido
+    return request.args.get('incluir_arquivo') == '1'
+
+@admin_bp.route('/relatorios/agendamentos')
+@login_required
+def relatorio_agendamentos():
+    data_inicio, data_fim = _periodo_relatorio(dias_padrao=30)
+    incluir_arquivo = _incluir_arquivo()
+    agendamento = arquivamento.entidade(incluir_arquivo)
+    periodo = _filtro_periodo(data_inicio, data_fim, agendamento)
+    pagina = paginar_keyset(
+        db.session.query(agendamento).options(*opcoes_detalhes_agendamento(agendamento)).filter(*periodo),
+        agendamento.data_agendamento, agendamento.id,
+        cursor=request.args.get('cursor'),
+        direcao=request.args.get('direcao', 'proxima'),
+        tamanho=current_app.config['ITENS_POR_PAGINA'],
+        descendente=True
+    )
+    
+    # Resumo do período inteiro (não apenas da página exibida)
+    resumo_status = dict(db.session.query(
+        agendamento.status,
+        func.count(agendamento.id)
+    ).filter(*periodo).group_by(agendamento.status).all())
     
     return render_template('admin/relatorio_agendamentos.html',
-                         agendamentos=agendamentos,
+                         agendamentos=pagina.itens,
+                         pagina=pagina,
+                         resumo_status=resumo_status,
+                         total_periodo=sum(resumo_status.values()),
                          data_inicio=data_inicio,
-                         data_fim=data_fim)
+                         data_fim=data_fim,
+                         incluir_arquivo=incluir_arquivo)
+
+@admin_bp.route('/relatorios/agendamentos/exportar')
+@login_required
+@admin_required
+def exportar_agendamentos():
+    data_inicio, data_fim = _periodo_relatorio(dias_padrao=30)
+    formato = request.args.get('formato', 'csv')
+    if formato not in ('csv', 'ndjson'):
+        abort(400)
+    
+    agendamento = arquivamento.entidade(_incluir_arquivo())
+    consulta = consulta_exportacao(*_filtro_periodo(data_inicio, data_fim, agendamento), agendamento=agendamento)
+    if formato == 'csv':
+        gerador, mimetype = gerar_csv(consulta), 'text/csv'
+    else:
+        gerador, mimetype = gerar_ndjson(consulta), 'application/x-ndjson'
+    
+    nome_arquivo = f'agendamentos_{data_inicio:%Y%m%d}_{data_fim:%Y%m%d}.{formato}'
+    return Response(
+        stream_with_context(gerador),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename={nome_arquivo}',
+            # Evita que proxies acumulem a resposta inteira antes de repassar
+            'X-Accel-Buffering': 'no'
+        }
+    )
 
 @admin_bp.route('/relatorios/utilizacao')
 @login_required
 def relatorio_utilizacao():
-    # Relatório de utilização das docas - CORREÇÃO
+    data_inicio, data_fim = _periodo_relatorio(dias_padrao=29)
+    
+    # Lê a consolidação diária (flask atualizar-utilizacao) em vez do histórico completo
     utilizacao_docas = db.session.query(
         Doca.numero,
-        Terminal.nome,
-        func.count(Agendamento.id).label('total_agendamentos'),
-        func.sum(Agendamento.duracao_estimada).label('total_minutos')
-    ).select_from(Doca).join(Terminal).outerjoin(Agendamento).group_by(Doca.id, Doca.numero, Terminal.nome).all()
+        Terminal.nome.label('terminal_nome'),
+        func.coalesce(func.sum(UtilizacaoDiaria.total), 0).label('total_agendamentos'),
+        func.coalesce(func.sum(UtilizacaoDiaria.minutos), 0).label('total_minutos')
+    ).select_from(Doca).join(Terminal).outerjoin(
+        UtilizacaoDiaria,
+        and_(
+            UtilizacaoDiaria.doca_id == Doca.id,
+            UtilizacaoDiaria.dia >= data_inicio,
+            UtilizacaoDiaria.dia <= data_fim
+        )
+    ).group_by(Doca.id, Doca.numero, Terminal.nome).all()
+    
+    # Capacidade do período: 12 horas por dia
+    horas_periodo = max((data_fim - data_inicio).days + 1, 0) * 12
     
     return render_template('admin/relatorio_utilizacao.html',
-                         utilizacao_docas=utilizacao_docas)
\ No newline at end of file
+                         utilizacao_docas=utilizacao_docas,
+                         data_inicio=data_inicio,
+                         data_fim=data_fim,
+                         horas_periodo=horas_periodo,
+                         atualizado_em=ultima_atualizacao())
+
+# PAINEL AO VIVO DAS DOCAS
+@admin_bp.route('/painel')
+@login_required
+@admin_required
+def painel():
+    # Carga inicial: agendamentos em andamento ou nas próximas 24 horas;
+    # depois disso a tela é atualizada pelos eventos de /admin/painel/eventos
+    agora = datetime.now()
+    agendamentos = Agendamento.query.options(*opcoes_detalhes_agendamento()).filter(
+        Agendamento.data_agendamento >= agora - timedelta(minutes=DURACAO_MAXIMA_MINUTOS),
+        Agendamento.data_agendamento < agora + timedelta(days=1),
+        Agendamento.data_fim > agora,
+        Agendamento.status.in_(STATUS_ATIVOS)
+    ).order_by(Agendamento.data_agendamento, Agendamento.id).all()
+    return render_template('admin/painel.html', agendamentos=agendamentos)
+
+@admin_bp.route('/painel/eventos')
+@login_required
+@admin_required
+def painel_eventos():
+    transmissor = current_app.extensions['painel']
+    ultimo_id = request.headers.get('Last-Event-ID', type=int)
+    assinatura = transmissor.assinar(ultimo_id)
+    # Sem stream_with_context: a sessão do banco é liberada ao fim da requisição
+    # e a conexão aberta só espera eventos em memória
+    return Response(
+        transmissor.transmitir(assinatura),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+# MÉTRICAS (formato texto do Prometheus)
+@admin_bp.route('/metrics')
+@login_required
+@admin_required
+def metrics():
+    registro = current_app.extensions.get('metricas')
+    if registro is None:
+        abort(404)
+    medidores = metricas.medidores_fila_email()
+    medidores.append(('jit_painel_conexoes', 'Conexões abertas no painel ao vivo',
+                      [({}, current_app.extensions['painel'].conexoes)]))
+    return Response(registro.exportar(medidores), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+# CONSULTAS LENTAS (app.consultas_lentas)
+def _registro_consultas_lentas():
+    registro = current_app.extensions.get('consultas_lentas')
+    if registro is None:
+        abort(404)
+    return registro
+
+@admin_bp.route('/consultas-lentas')
+@login_required
+@admin_required
+def consultas_lentas():
+    registro = _registro_consultas_lentas()
+    return render_template('admin/consultas_lentas.html',
+                           entradas=registro.entradas(),
+                           capacidade=registro.capacidade,
+                           limite_ms=current_app.config['CONSULTAS_LENTAS_LIMITE_MS'])
+
+@admin_bp.route('/consultas-lentas.json')
+@login_required
+@admin_required
+def consultas_lentas_json():
+    registro = _registro_consultas_lentas()
+    resposta = jsonify(registro.entradas())
+    resposta.headers['Content-Disposition'] = 'attachment; filename=consultas_lentas.json'
+    return resposta
+
+@admin_bp.route('/consultas-lentas/limpar', methods=['POST'])
+@login_required
+@admin_required
+def limpar_consultas_lentas():
+    _registro_consultas_lentas().limpar()
+    flash('Registro de consultas lentas limpo.', 'success')
+    return redirect(url_for('admin.consultas_lentas'))
+
+# PERFIS SOB DEMANDA (app.perfilador)
+@admin_bp.route('/perfis')
+@login_required
+@admin_required
+def perfis():
+    return render_template('admin/perfis.html', perfis=current_app.extensions['perfis'].listar())
+
+def _perfil_ou_404(id):
+    perfil = current_app.extensions['perfis'].obter(id)
+    if perfil is None:
+        abort(404)
+    return perfil
+
+@admin_bp.route('/perfis/<int:id>')
+@login_required
+@admin_required
+def perfil(id):
+    perfil = _perfil_ou_404(id)
+    return render_template('admin/perfil.html', perfil=perfil, funcoes=perfil.funcoes())
+
+@admin_bp.route('/perfis/<int:id>.folded')
+@login_required
+@admin_required
+def perfil_folded(id):
+    perfil = _perfil_ou_404(id)
+    return Response(
+        perfil.folded(),
+        mimetype='text/plain',
+        headers={'Content-Disposition': f'attachment; filename=perfil_{perfil.id}_{perfil.endpoint}.folded'}
+    )
@@ -0,0 +1,127 @@
+from flask import Blueprint, jsonify, request, Response
+from flask_login import current_user
+from datetime import datetime, timedelta
+from sqlalchemy.orm import selectinload
+import hashlib
+from app import db, versoes
+from app.models import Agendamento, Doca, Terminal
+from app.scheduling import STATUS_ATIVOS, DURACAO_MAXIMA_MINUTOS
+
+api_bp = Blueprint('api', __name__)
+
+# Maior janela aceita na consulta de ocupação
+JANELA_MAXIMA = timedelta(days=31)
+
+FORMATO_DATA = '%Y-%m-%dT%H:%M'
+
+@api_bp.before_request
+def exigir_login():
+    # Sem redirecionar para a tela de login: clientes da API esperam JSON
+    if not current_user.is_authenticated:
+        return jsonify({'erro': 'Autenticação necessária'}), 401
+
+def _responder(conjuntos, gerar):
+    """Responde com ETag derivado das versões dos dados; 304 se o cliente já tem esta versão.
+
+    conjuntos são os nomes (app.versoes) dos dados que a resposta inclui.
+    Quando o ETag confere, gerar() não é chamado e nenhuma tabela de
+    agendamentos é consultada (apenas a tabela de versões).
+    """
+    atuais = versoes.obter(conjuntos)
+    chave = '|'.join(f'{nome}:{atuais[nome]}' for nome in conjuntos) + '|' + request.full_path
+    etag = hashlib.sha1(chave.encode()).hexdigest()[:24]
+
+    if request.if_none_match.contains(etag):
+        resposta = Response(status=304)
+    else:
+        resposta = jsonify(gerar())
+    resposta.set_etag(etag)
+    # Sempre revalidar; a revalidação é barata
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta
+
+def _hora(valor):
+    return valor.strftime('%H:%M') if valor else None
+
+def _doca_json(doca):
+    return {
+        'id': doca.id,
+        'numero': doca.numero,
+        'tipo_carga': doca.tipo_carga,
+        'status': doca.status
+    }
+
+@api_bp.route('/terminais')
+def terminais():
+    """Terminais com horário de funcionamento e docas"""
+    def gerar():
+        lista = Terminal.query.options(selectinload(Terminal.docas)).order_by(Terminal.id).all()
+        return {'terminais': [{
+            'id': terminal.id,
+            'nome': terminal.nome,
+            'endereco': terminal.endereco,
+            'horario_abertura': _hora(terminal.horario_abertura),
+            'horario_fechamento': _hora(terminal.horario_fechamento),
+            'docas': [_doca_json(doca) for doca in sorted(terminal.docas, key=lambda d: d.id)]
+        } for terminal in lista]}
+
+    return _responder([versoes.TOPOLOGIA], gerar)
+
+@api_bp.route('/terminais/<int:id>/ocupacao')
+def ocupacao(id):
+    """Intervalos ocupados [inicio, fim) de cada doca do terminal no período"""
+    try:
+        inicio_str = request.args.get('inicio')
+        inicio = datetime.fromisoformat(inicio_str) if inicio_str else datetime.now().replace(second=0, microsecond=0)
+        fim_str = request.args.get('fim')
+        fim = datetime.fromisoformat(fim_str) if fim_str else inicio + timedelta(days=1)
+    except ValueError:
+        return jsonify({'erro': 'Datas devem estar no formato AAAA-MM-DDTHH:MM'}), 400
+    if fim <= inicio or fim - inicio > JANELA_MAXIMA:
+        return jsonify({'erro': 'O período deve ter entre 1 minuto e 31 dias'}), 400
+    terminal = db.session.get(Terminal, id)
+    if terminal is None:
+        return jsonify({'erro': 'Terminal não encontrado'}), 404
+    tipo_carga = request.args.get('tipo_carga')
+    doca_id = request.args.get('doca', type=int)
+    consulta_docas = Doca.query.filter_by(terminal_id=terminal.id)
+    if tipo_carga:
+        consulta_docas = consulta_docas.filter_by(tipo_carga=tipo_carga)
+    if doca_id:
+        consulta_docas = consulta_docas.filter_by(id=doca_id)
+    docas = consulta_docas.order_by(Doca.id).all()
+
+    def gerar():
+        ocupacoes = {doca.id: [] for doca in docas}
+        if docas:
+            # Uma consulta limitada pelo índice (doca_id, data_agendamento)
+            linhas = db.session.query(
+                Agendamento.doca_id,
+                Agendamento.data_agendamento,
+                Agendamento.data_fim,
+                Agendamento.status
+            ).filter(
+                Agendamento.doca_id.in_(list(ocupacoes)),
+                Agendamento.data_agendamento >= inicio - timedelta(minutes=DURACAO_MAXIMA_MINUTOS),
+                Agendamento.data_agendamento < fim,
+                Agendamento.data_fim > inicio,
+                Agendamento.status.in_(STATUS_ATIVOS)
+            ).order_by(Agendamento.doca_id, Agendamento.data_agendamento)
+            for linha_doca, ini_ocupacao, fim_ocupacao, status in linhas:
+                ocupacoes[linha_doca].append({
+                    'inicio': ini_ocupacao.strftime(FORMATO_DATA),
+                    'fim': fim_ocupacao.strftime(FORMATO_DATA),
+                    'status': status
+                })
+
+        return {
+            'terminal_id': terminal.id,
+            'inicio': inicio.strftime(FORMATO_DATA),
+            'fim': fim.strftime(FORMATO_DATA),
+            'horario_abertura': _hora(terminal.horario_abertura),
+            'horario_fechamento': _hora(terminal.horario_fechamento),
+            'docas': [dict(_doca_json(doca), ocupacoes=ocupacoes[doca.id]) for doca in docas]
+        }
+
+    # Só as docas da resposta: reservas em outras docas não invalidam o ETag
+    return _responder([versoes.TOPOLOGIA] + [versoes.nome_doca(doca.id) for doca in docas], gerar)
@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
-from app import db
+from app import db, senhas
 from app.models import User
 from app.forms import RegistrationForm, RecuperacaoSenhaForm, RedefinirSenhaForm, CompletarPerfilForm  # ADICIONE CompletarPerfilForm
 from app.email import send_email_confirmacao, send_email_recuperacao_senha
@@ -48,6 +48,11 @@ def login():
         # Verificar usuários do banco de dados
         user = User.query.filter_by(email=email).first()
         if user and user.check_password(password):
+            # Senha gravada com parâmetros antigos: regrava com os atuais
+            if senhas.precisa_rehash(user.password_hash):
+                user.set_password(password)
+                db.session.commit()
+
             # VERIFICAR SE EMAIL ESTÁ CONFIRMADO
             if not user.email_confirmado:
                 flash('Por favor, confirme seu email antes de fazer login. Verifique sua caixa de entrada.', 'warning')
@@ -96,15 +101,11 @@ def register():
         user.gerar_token_confirmacao()
 
         db.session.add(user)
+        # EMAIL DE CONFIRMAÇÃO (enfileirado na mesma transação)
+        send_email_confirmacao(user)
         db.session.commit()
         
-        # ENVIAR EMAIL DE CONFIRMAÇÃO
-        try:
-            send_email_confirmacao(user)
-            flash('Conta criada com sucesso! Enviamos um email de confirmação para você.', 'success')
-        except Exception as e:
-            flash('Conta criada, mas houve um erro ao enviar o email de confirmação. Entre em contato com o suporte.', 'warning')
-            print(f"Erro ao enviar email: {e}")
+        flash('Conta criada com sucesso! Enviamos um email de confirmação para você.', 'success')
 
         return redirect(url_for('auth.login'))
     
@@ -136,8 +137,8 @@ def reenviar_confirmacao():
     
     try:
         current_user.gerar_token_confirmacao()
-        db.session.commit()
         send_email_confirmacao(current_user)
+        db.session.commit()
         flash('Email de confirmação reenviado! Verifique sua caixa de entrada.', 'success')
     except Exception as e:
         flash('Erro ao reenviar email de confirmação. Tente novamente.', 'danger')
@@ -159,8 +160,8 @@ def recuperar_senha():
             # Gerar token e enviar email
             try:
                 user.gerar_token_recuperacao()
-                db.session.commit()
                 send_email_recuperacao_senha(user)
+                db.session.commit()
                 flash('Enviamos um email com instruções para redefinir sua senha.', 'info')
             except Exception as e:
                 flash('Erro ao enviar email de recuperação. Tente novamente.', 'danger')
@@ -1,10 +1,16 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, current_app, abort
 from flask_login import login_required, current_user
 from app.models import Agendamento, Doca, User
 from app.forms import AgendamentoForm, CancelamentoForm, EditarPerfilForm, AlterarSenhaForm, CompletarPerfilForm
-from app import db
+from app import db, topologia
 from datetime import datetime, timedelta
+from sqlalchemy import and_, case, func
+from sqlalchemy.exc import IntegrityError
 from app.email import send_agendamento_cancelamento, send_novo_agendamento_admin
+from app.utils import intervalo_dia, opcoes_detalhes_agendamento, paginar_keyset
+from app.events import agendamento_alterado
+from app.scheduling import buscar_conflito, buscar_horarios_livres, travar_docas, DURACAO_MAXIMA_MINUTOS
+from app.importacao import ErroImportacao, COLUNAS_MODELO, LIMITE_LINHAS, importar, ler_arquivo
 
 usuario_bp = Blueprint('usuario', __name__)
 
@@ -62,51 +68,32 @@ def dashboard():
         flash('Complete seu perfil para ter acesso total ao sistema.', 'warning')
         return redirect(url_for('usuario.completar_perfil'))
     
-    # Calcular estatísticas reais - VERSÃO CORRIGIDA E OTIMIZADA
-    hoje = datetime.now().date()
+    # Calcular estatísticas reais - UMA ÚNICA CONSULTA COM AGREGAÇÃO CONDICIONAL
+    inicio_hoje, fim_hoje = intervalo_dia(datetime.now().date())
     
     try:
-        # Agendamentos de HOJE (data_agendamento é hoje)
-        agendamentos_hoje = Agendamento.query.filter(
-            db.func.date(Agendamento.data_agendamento) == hoje,
-            Agendamento.user_id == current_user.id
-        ).count()
-        
-        # Agendamentos CONFIRMADOS (qualquer data)
-        agendamentos_confirmados = Agendamento.query.filter_by(
-            user_id=current_user.id, 
-            status='confirmado'
-        ).count()
-        
-        # Agendamentos PENDENTES (qualquer data)
-        agendamentos_pendentes = Agendamento.query.filter_by(
-            user_id=current_user.id, 
-            status='pendente'
-        ).count()
-        
-        # TOTAL de agendamentos
-        total_agendamentos = Agendamento.query.filter_by(
-            user_id=current_user.id
-        ).count()
+        (total_agendamentos,
+         agendamentos_confirmados,
+         agendamentos_pendentes,
+         agendamentos_hoje) = db.session.query(
+            func.count(Agendamento.id),
+            func.coalesce(func.sum(case((Agendamento.status == 'confirmado', 1), else_=0)), 0),
+            func.coalesce(func.sum(case((Agendamento.status == 'pendente', 1), else_=0)), 0),
+            func.coalesce(func.sum(case((and_(
+                Agendamento.data_agendamento >= inicio_hoje,
+                Agendamento.data_agendamento < fim_hoje
+            ), 1), else_=0)), 0)
+        ).filter(Agendamento.user_id == current_user.id).one()
         
         # PRÓXIMOS agendamentos (futuros + pendentes/confirmados)
-        proximos_agendamentos = Agendamento.query.filter(
+        proximos_agendamentos = Agendamento.query.options(*opcoes_detalhes_agendamento()).filter(
             Agendamento.user_id == current_user.id,
             Agendamento.data_agendamento >= datetime.now(),
             Agendamento.status.in_(['pendente', 'confirmado'])
         ).order_by(Agendamento.data_agendamento.asc()).limit(5).all()
 
-        # DEBUG no console
-        print(f"=== DASHBOARD DEBUG - Usuário: {current_user.nome} ===")
-        print(f"Agendamentos hoje: {agendamentos_hoje}")
-        print(f"Agendamentos confirmados: {agendamentos_confirmados}")
-        print(f"Agendamentos pendentes: {agendamentos_pendentes}")
-        print(f"Total agendamentos: {total_agendamentos}")
-        print(f"Próximos agendamentos: {len(proximos_agendamentos)}")
-        print("=" * 50)
-
-    except Exception as e:
-        print(f"ERRO no dashboard: {e}")
+    except Exception:
+        current_app.logger.exception('Erro ao calcular estatísticas do dashboard')
         # Valores padrão em caso de erro
         agendamentos_hoje = 0
         agendamentos_confirmados = 0
@@ -129,7 +116,15 @@ def agendamentos():
         flash('Complete seu perfil para visualizar seus agendamentos.', 'warning')
         return redirect(url_for('usuario.completar_perfil'))
     
-    agendamentos_lista = Agendamento.query.filter_by(user_id=current_user.id).order_by(Agendamento.data_agendamento.desc()).all()
+    pagina = paginar_keyset(
+        Agendamento.query.options(*opcoes_detalhes_agendamento()).filter_by(user_id=current_user.id),
+        Agendamento.data_agendamento, Agendamento.id,
+        cursor=request.args.get('cursor'),
+        direcao=request.args.get('direcao', 'proxima'),
+        tamanho=current_app.config['ITENS_POR_PAGINA'],
+        descendente=True
+    )
+    agendamentos_lista = pagina.itens
     
     # Adicionar informação se pode cancelar para cada agendamento
     for agendamento in agendamentos_lista:
@@ -137,6 +132,7 @@ def agendamentos():
     
     return render_template('usuario/agendamentos.html', 
                          agendamentos=agendamentos_lista,
+                         pagina=pagina,
                          datetime=datetime)
 
 @usuario_bp.route('/novo-agendamento', methods=['GET', 'POST'])
@@ -149,9 +145,8 @@ def novo_agendamento():
     
     form = AgendamentoForm()
 
-    # Carregar docas disponíveis
-    docas = Doca.query.filter_by(status='ativa').all()
-    form.doca_id.choices = [(d.id, f'{d.terminal.nome} - Doca {d.numero} ({d.tipo_carga})') for d in docas]
+    # Docas disponíveis (retrato em memória, sem consultar o banco)
+    form.doca_id.choices = list(topologia.obter().escolhas_docas)
     
     # CORREÇÃO: Usar -1 em vez de string vazia para evitar erro de conversão
     if form.doca_id.choices:
@@ -165,17 +160,19 @@ def novo_agendamento():
         
         print("Formulário validado! Processando...")
         
-        # Verificar conflito de horário
-        conflito = Agendamento.query.filter(
-            Agendamento.doca_id == form.doca_id.data,
-            Agendamento.data_agendamento.between(
-                form.data_agendamento.data - timedelta(minutes=form.duracao_estimada.data),
-                form.data_agendamento.data + timedelta(minutes=form.duracao_estimada.data)
-            ),
-            Agendamento.status.in_(['pendente', 'confirmado'])
-        ).first()
+        # Trava a doca até o commit: reservas simultâneas na mesma doca fazem a
+        # verificação e a gravação uma de cada vez (sem agendamento duplicado)
+        travar_docas([form.doca_id.data])
+
+        # Verificar conflito de horário (sobreposição real de intervalos)
+        conflito = buscar_conflito(
+            form.doca_id.data,
+            form.data_agendamento.data,
+            form.duracao_estimada.data
+        )
 
         if conflito:
+            db.session.rollback()
             flash('Já existe um agendamento para esta doca neste horário!', 'danger')
             return render_template('usuario/novo_agendamento.html', form=form)
 
@@ -195,14 +192,20 @@ def novo_agendamento():
         )
 
         db.session.add(agendamento)
-        db.session.commit()
-
-        # ENVIAR EMAIL PARA ADMINISTRADORES SOBRE NOVO AGENDAMENTO
+        # Grava o INSERT antes de qualquer outra consulta (que faria o autoflush
+        # fora do try) e para que usuario/doca estejam disponíveis no corpo do email
         try:
-            send_novo_agendamento_admin(agendamento)
-            print("Email de notificação enviado para administradores")
-        except Exception as e:
-            print(f"Erro ao enviar email para admin: {e}")
+            db.session.flush()
+        except IntegrityError:
+            # No PostgreSQL a restrição de exclusão (migração 0008) barra a sobreposição
+            db.session.rollback()
+            flash('Já existe um agendamento para esta doca neste horário!', 'danger')
+            return render_template('usuario/novo_agendamento.html', form=form)
+        agendamento_alterado(agendamento)
+
+        # EMAIL PARA ADMINISTRADORES SOBRE NOVO AGENDAMENTO (mesma transação)
+        send_novo_agendamento_admin(agendamento)
+        db.session.commit()
 
         flash('Agendamento solicitado com sucesso! Aguarde a confirmação.', 'success')
         return redirect(url_for('usuario.agendamentos'))
@@ -216,6 +219,88 @@ def novo_agendamento():
 
     return render_template('usuario/novo_agendamento.html', form=form)
 
+# BUSCA DE HORÁRIOS LIVRES (JSON) - EVITA TENTATIVA E ERRO NO NOVO AGENDAMENTO
+@usuario_bp.route('/horarios-livres')
+@login_required
+def horarios_livres():
+    """Retorna os próximos horários livres nas docas compatíveis de um terminal"""
+    terminal = topologia.obter().terminal(request.args.get('terminal', type=int))
+    if terminal is None:
+        abort(404)
+    tipo_carga = request.args.get('tipo_carga', 'geral')
+    duracao = request.args.get('duracao', 60, type=int)
+    limite = max(1, min(request.args.get('limite', 10, type=int), 100))
+
+    try:
+        inicio_str = request.args.get('inicio')
+        inicio = datetime.fromisoformat(inicio_str) if inicio_str else datetime.now()
+        fim_str = request.args.get('fim')
+        fim = datetime.fromisoformat(fim_str) if fim_str else inicio + timedelta(days=7)
+    except ValueError:
+        return jsonify({'erro': 'Datas devem estar no formato AAAA-MM-DDTHH:MM'}), 400
+
+    if not 1 <= duracao <= DURACAO_MAXIMA_MINUTOS:
+        return jsonify({'erro': f'Duração deve estar entre 1 e {DURACAO_MAXIMA_MINUTOS} minutos'}), 400
+    if fim <= inicio or fim - inicio > timedelta(days=31):
+        return jsonify({'erro': 'A janela de busca deve ter entre 1 minuto e 31 dias'}), 400
+
+    horarios = buscar_horarios_livres(terminal, tipo_carga, duracao, inicio, fim, limite=limite)
+
+    return jsonify({
+        'terminal_id': terminal.id,
+        'tipo_carga': tipo_carga,
+        'duracao_estimada': duracao,
+        'horarios': [{
+            'doca_id': doca.id,
+            'doca': doca.numero,
+            'inicio': horario.strftime('%Y-%m-%d %H:%M'),
+            'fim': (horario + timedelta(minutes=duracao)).strftime('%Y-%m-%d %H:%M')
+        } for horario, doca in horarios]
+    })
+
+# IMPORTAÇÃO EM LOTE (CSV/JSON) PARA TRANSPORTADORAS
+@usuario_bp.route('/importar-agendamentos', methods=['GET', 'POST'])
+@login_required
+def importar_agendamentos():
+    if not current_user.pode_agendar():
+        flash('Complete seu perfil para poder fazer agendamentos.', 'warning')
+        return redirect(url_for('usuario.completar_perfil'))
+    
+    quer_json = request.accept_mimetypes.best == 'application/json'
+    resultado = None
+    
+    if request.method == 'POST':
+        arquivo = request.files.get('arquivo')
+        if not arquivo or not arquivo.filename:
+            if quer_json:
+                return jsonify({'erro': 'Envie um arquivo CSV ou JSON no campo "arquivo"'}), 400
+            flash('Selecione um arquivo CSV ou JSON.', 'danger')
+            return redirect(url_for('usuario.importar_agendamentos'))
+        
+        try:
+            linhas = ler_arquivo(arquivo.read(), arquivo.filename)
+        except ErroImportacao as erro:
+            if quer_json:
+                return jsonify({'erro': str(erro)}), 400
+            flash(str(erro), 'danger')
+            return redirect(url_for('usuario.importar_agendamentos'))
+        
+        resultado = importar(linhas, current_user, somente_validar=bool(request.form.get('somente_validar')))
+        if quer_json:
+            return jsonify(resultado.como_dict())
+        
+        if resultado.importados:
+            flash(f'{resultado.importados} agendamento(s) importado(s) com sucesso! Aguarde a confirmação.', 'success')
+        elif resultado.validas:
+            flash(f'{len(resultado.validas)} linha(s) válida(s). Nenhum agendamento foi gravado (apenas validação).', 'info')
+        if resultado.erros:
+            flash(f'{len(resultado.erros)} linha(s) com erro não foram importadas.', 'warning')
+    
+    return render_template('usuario/importar_agendamentos.html',
+                         resultado=resultado,
+                         colunas=COLUNAS_MODELO,
+                         limite_linhas=LIMITE_LINHAS)
+
 # NOVA ROTA PARA CANCELAMENTO DE AGENDAMENTO
 @usuario_bp.route('/agendamentos/<int:id>/cancelar', methods=['GET', 'POST'])
 @login_required
@@ -241,18 +326,17 @@ def cancelar_agendamento(id):
     
     if form.validate_on_submit():
         # Atualizar status e dados de cancelamento
+        status_anterior = agendamento.status
         agendamento.status = 'cancelado'
         agendamento.motivo_cancelamento = form.motivo_cancelamento.data
         agendamento.data_cancelamento = datetime.utcnow()
+        agendamento_alterado(agendamento, status_anterior)
         
+        # EMAIL DE CANCELAMENTO (enfileirado na mesma transação)
+        send_agendamento_cancelamento(agendamento)
         db.session.commit()
         
-        # ENVIAR EMAIL DE CANCELAMENTO
-        try:
-            send_agendamento_cancelamento(agendamento)
-            flash('Agendamento cancelado e email enviado!', 'success')
-        except Exception as e:
-            flash(f'Agendamento cancelado, mas erro ao enviar email: {str(e)}', 'warning')
+        flash('Agendamento cancelado! O email de aviso será enviado em instantes.', 'success')
         
         return redirect(url_for('usuario.agendamentos'))
     
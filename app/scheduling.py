@@ -0,0 +1,379 @@
+"""Núcleo de agendamento: conflitos entre intervalos, horários livres e alocação.
+
+Cada agendamento ocupa a doca no intervalo semiaberto [data_agendamento, data_fim).
+Dois intervalos [a, b) e [c, d) se sobrepõem quando a < d e c < b.
+
+Como a duração de um agendamento é limitada a DURACAO_MAXIMA_MINUTOS, qualquer
+agendamento que sobreponha [inicio, fim) começa necessariamente dentro de
+[inicio - DURACAO_MAXIMA_MINUTOS, fim). Isso transforma a verificação numa única
+varredura limitada do índice (doca_id, data_agendamento), cujo custo depende
+apenas do número de agendamentos daquela doca na janela, e não do tamanho da
+tabela.
+"""
+from datetime import datetime, timedelta
+from itertools import islice
+from bisect import bisect_left, bisect_right
+import heapq
+from app import db, painel, topologia, versoes
+from app.models import Agendamento, Doca
+
+# Status que efetivamente ocupam a doca
+STATUS_ATIVOS = ('pendente', 'confirmado')
+
+# Limite de duração de um agendamento (24 horas)
+DURACAO_MAXIMA_MINUTOS = 24 * 60
+
+
+def calcular_fim(inicio, duracao):
+    """Retorna o fim do intervalo [inicio, inicio + duracao minutos)"""
+    return inicio + timedelta(minutes=duracao)
+
+
+def filtro_sobreposicao(doca_id, inicio, fim):
+    """Critérios SQL para agendamentos ativos da doca que sobrepõem [inicio, fim)"""
+    return (
+        Agendamento.doca_id == doca_id,
+        # Faixa limitada do índice (doca_id, data_agendamento)
+        Agendamento.data_agendamento >= inicio - timedelta(minutes=DURACAO_MAXIMA_MINUTOS),
+        Agendamento.data_agendamento < fim,
+        # Condição exata de sobreposição, avaliada apenas nas linhas da faixa
+        Agendamento.data_fim > inicio,
+        Agendamento.status.in_(STATUS_ATIVOS),
+    )
+
+
+def buscar_conflito(doca_id, inicio, duracao, ignorar_id=None):
+    """Retorna um agendamento ativo que conflita com o intervalo pedido, ou None"""
+    fim = calcular_fim(inicio, duracao)
+    query = Agendamento.query.filter(*filtro_sobreposicao(doca_id, inicio, fim))
+    if ignorar_id is not None:
+        query = query.filter(Agendamento.id != ignorar_id)
+    return query.order_by(Agendamento.data_agendamento.asc()).first()
+
+
+def travar_docas(doca_ids):
+    """Serializa, até o fim da transação atual, as reservas nas docas informadas.
+
+    Deve ser chamada antes de verificar conflitos e gravar agendamentos: duas
+    transações que reservam a mesma doca passam a fazer verificação e INSERT
+    uma depois da outra; docas diferentes não se bloqueiam.
+
+    No PostgreSQL as linhas das docas são travadas (FOR NO KEY UPDATE, em
+    ordem de id para evitar deadlock). O SQLite só admite um escritor por vez:
+    um UPDATE sem efeito obtém o bloqueio de escrita do banco já no início da
+    reserva, e as demais esperam o commit (timeout em SQLALCHEMY_ENGINE_OPTIONS).
+    """
+    ids = sorted(set(doca_ids))
+    if not ids:
+        return
+    if db.session.get_bind().dialect.name == 'sqlite':
+        db.session.execute(
+            db.update(Doca).where(Doca.id.in_(ids)).values(status=Doca.status)
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        db.session.execute(
+            db.select(Doca.id).where(Doca.id.in_(ids)).order_by(Doca.id)
+            .with_for_update(key_share=True)
+        ).all()
+
+
+def existe_conflito(doca_id, inicio, duracao, ignorar_id=None):
+    """Indica se o intervalo pedido sobrepõe algum agendamento ativo da doca"""
+    return buscar_conflito(doca_id, inicio, duracao, ignorar_id) is not None
+
+
+def sobrepoe(inicio_a, fim_a, inicio_b, fim_b):
+    """Verifica em memória se [inicio_a, fim_a) e [inicio_b, fim_b) se sobrepõem"""
+    return inicio_a < fim_b and inicio_b < fim_a
+
+
+def _alinhar(momento, passo):
+    """Arredonda o momento para cima até o próximo múltiplo de passo minutos"""
+    base = momento.replace(hour=0, minute=0, second=0, microsecond=0)
+    minutos = (momento - base).total_seconds() / 60
+    resto = minutos % passo
+    if resto:
+        momento = momento + timedelta(minutes=passo - resto)
+    return momento.replace(second=0, microsecond=0)
+
+
+def janelas_funcionamento(terminal, inicio, fim):
+    """Intervalos de funcionamento do terminal dentro de [inicio, fim), em ordem"""
+    abertura = terminal.horario_abertura
+    fechamento = terminal.horario_fechamento
+    janelas = []
+    dia = inicio.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    while dia < fim:
+        if abertura is None or fechamento is None:
+            ini_janela, fim_janela = dia, dia + timedelta(days=1)
+        else:
+            ini_janela = datetime.combine(dia.date(), abertura)
+            fim_janela = datetime.combine(dia.date(), fechamento)
+            # Terminal que atravessa a meia-noite
+            if fim_janela <= ini_janela:
+                fim_janela += timedelta(days=1)
+        ini_janela, fim_janela = max(ini_janela, inicio), min(fim_janela, fim)
+        if ini_janela < fim_janela:
+            janelas.append((ini_janela, fim_janela))
+        dia += timedelta(days=1)
+    return janelas
+
+
+def _horarios_da_doca(doca_id, ocupados, janelas, duracao, passo):
+    """Gera, em ordem, os inícios livres de uma doca varrendo suas ocupações uma vez"""
+    delta = timedelta(minutes=duracao)
+    avanco = timedelta(minutes=passo)
+    i = 0
+    for ini_janela, fim_janela in janelas:
+        cursor = _alinhar(ini_janela, passo)
+        while cursor + delta <= fim_janela:
+            # Descartar ocupações que terminam antes do cursor
+            while i < len(ocupados) and ocupados[i][1] <= cursor:
+                i += 1
+            if i < len(ocupados) and ocupados[i][0] < cursor + delta:
+                cursor = _alinhar(ocupados[i][1], passo)
+                continue
+            yield cursor, doca_id
+            cursor += avanco
+
+
+def buscar_horarios_livres(terminal, tipo_carga, duracao, inicio, fim, limite=10, passo=30):
+    """Retorna os próximos horários livres nas docas compatíveis de um terminal.
+
+    Cada item é uma tupla (inicio, doca). As ocupações de todas as docas são
+    lidas numa única consulta ordenada e cada doca é varrida uma só vez; as
+    sequências de cada doca são intercaladas por horário até atingir o limite.
+    """
+    docas = topologia.obter().docas_do_terminal(terminal.id, tipo_carga=tipo_carga, status='ativa')
+    if not docas:
+        return []
+
+    ocupacoes = {doca.id: [] for doca in docas}
+    linhas = db.session.query(
+        Agendamento.doca_id,
+        Agendamento.data_agendamento,
+        Agendamento.data_fim
+    ).filter(
+        Agendamento.doca_id.in_(list(ocupacoes)),
+        Agendamento.data_agendamento >= inicio - timedelta(minutes=DURACAO_MAXIMA_MINUTOS),
+        Agendamento.data_agendamento < fim,
+        Agendamento.data_fim > inicio,
+        Agendamento.status.in_(STATUS_ATIVOS)
+    ).order_by(Agendamento.doca_id, Agendamento.data_agendamento)
+    for doca_id, ini_ocupacao, fim_ocupacao in linhas:
+        ocupacoes[doca_id].append((ini_ocupacao, fim_ocupacao))
+
+    janelas = janelas_funcionamento(terminal, inicio, fim)
+    geradores = [
+        _horarios_da_doca(doca.id, ocupacoes[doca.id], janelas, duracao, passo)
+        for doca in docas
+    ]
+    docas_por_id = {doca.id: doca for doca in docas}
+    return [
+        (horario, docas_por_id[doca_id])
+        for horario, doca_id in islice(heapq.merge(*geradores), limite)
+    ]
+
+
+def _cabe(inicios, fins, inicio, fim):
+    """Verifica se [inicio, fim) cabe na agenda ordenada e sem sobreposições de uma doca"""
+    pos = bisect_right(inicios, inicio)
+    if pos > 0 and fins[pos - 1] > inicio:
+        return False
+    if pos < len(inicios) and inicios[pos] < fim:
+        return False
+    return True
+
+
+def conflitos_aprovacao(agendamentos):
+    """Ids dos agendamentos de um lote que não podem ser confirmados.
+
+    Um agendamento conflita quando sobrepõe outro já confirmado na mesma doca
+    ou um aceito antes dele no próprio lote (processados por horário de
+    início). As ocupações confirmadas de todas as docas envolvidas são lidas
+    numa única consulta.
+    """
+    if not agendamentos:
+        return set()
+    ids = {a.id for a in agendamentos}
+    inicio = min(a.data_agendamento for a in agendamentos)
+    fim = max(a.data_fim for a in agendamentos)
+
+    inicios = {}
+    fins = {}
+    confirmados = db.session.query(
+        Agendamento.id,
+        Agendamento.doca_id,
+        Agendamento.data_agendamento,
+        Agendamento.data_fim
+    ).filter(
+        Agendamento.doca_id.in_({a.doca_id for a in agendamentos}),
+        Agendamento.data_agendamento >= inicio - timedelta(minutes=DURACAO_MAXIMA_MINUTOS),
+        Agendamento.data_agendamento < fim,
+        Agendamento.data_fim > inicio,
+        Agendamento.status == 'confirmado'
+    ).order_by(Agendamento.doca_id, Agendamento.data_agendamento)
+    for agendamento_id, doca_id, ini_ocupacao, fim_ocupacao in confirmados:
+        if agendamento_id not in ids:
+            inicios.setdefault(doca_id, []).append(ini_ocupacao)
+            fins.setdefault(doca_id, []).append(fim_ocupacao)
+
+    conflitantes = set()
+    for agendamento in sorted(agendamentos, key=lambda a: (a.data_agendamento, a.id)):
+        doca_inicios = inicios.setdefault(agendamento.doca_id, [])
+        doca_fins = fins.setdefault(agendamento.doca_id, [])
+        if not _cabe(doca_inicios, doca_fins, agendamento.data_agendamento, agendamento.data_fim):
+            conflitantes.add(agendamento.id)
+            continue
+        pos = bisect_right(doca_inicios, agendamento.data_agendamento)
+        doca_inicios.insert(pos, agendamento.data_agendamento)
+        doca_fins.insert(pos, agendamento.data_fim)
+    return conflitantes
+
+
+def _reservar(inicios, fins, inicio, fim):
+    pos = bisect_right(inicios, inicio)
+    inicios.insert(pos, inicio)
+    fins.insert(pos, fim)
+
+
+def _liberar(inicios, fins, inicio, fim):
+    pos = bisect_left(inicios, inicio)
+    while fins[pos] != fim:
+        pos += 1
+    del inicios[pos], fins[pos]
+
+
+def planejar_alocacao(pedidos, agendas, compativeis):
+    """Distribui pedidos entre docas sem sobreposição, maximizando os alocados.
+
+    pedidos: lista de (id, inicio, fim, doca_atual)
+    agendas: {doca_id: lista ordenada de (inicio, fim) já ocupados}
+    compativeis: função que recebe um pedido e devolve os ids de docas aceitáveis
+
+    Enquanto não é processado, cada pedido continua ocupando seu horário na
+    doca atual, e só o libera quando chega a sua vez: assim nenhum outro
+    pedido é colocado sobre um que acabe ficando onde está.
+    Os pedidos são processados por ordem de término (estratégia gulosa ótima
+    para escalonamento de intervalos) e cada um vai para a doca compatível
+    onde deixa a menor folga desde a ocupação anterior (best fit), preferindo
+    a doca atual em caso de empate.
+    Retorna ({pedido_id: doca_id}, [ids não alocados]).
+    """
+    inicios = {doca_id: [i for i, _ in agenda] for doca_id, agenda in agendas.items()}
+    fins = {doca_id: [f for _, f in agenda] for doca_id, agenda in agendas.items()}
+    for _, inicio, fim, atual in pedidos:
+        _reservar(inicios.setdefault(atual, []), fins.setdefault(atual, []), inicio, fim)
+    alocados = {}
+    nao_alocados = []
+
+    for pedido in sorted(pedidos, key=lambda p: (p[2], p[1], p[0])):
+        pedido_id, inicio, fim, atual = pedido
+        _liberar(inicios[atual], fins[atual], inicio, fim)
+        melhor = None
+        melhor_chave = None
+        for doca_id in compativeis(pedido):
+            if doca_id not in inicios:
+                inicios[doca_id], fins[doca_id] = [], []
+            if not _cabe(inicios[doca_id], fins[doca_id], inicio, fim):
+                continue
+            pos = bisect_right(inicios[doca_id], inicio)
+            fim_anterior = fins[doca_id][pos - 1] if pos > 0 else datetime.min
+            chave = (fim_anterior, doca_id == atual)
+            if melhor_chave is None or chave > melhor_chave:
+                melhor, melhor_chave = doca_id, chave
+        if melhor is None:
+            # Permanece onde está, ocupando a doca atual
+            _reservar(inicios[atual], fins[atual], inicio, fim)
+            nao_alocados.append(pedido_id)
+            continue
+        _reservar(inicios[melhor], fins[melhor], inicio, fim)
+        alocados[pedido_id] = melhor
+
+    return alocados, nao_alocados
+
+
+def alocar_pendentes(inicio, fim):
+    """Realoca os agendamentos pendentes do horizonte nas docas compatíveis.
+
+    Lê todos os pendentes que começam em [inicio, fim), considera como fixos
+    os demais agendamentos ativos das docas e grava as novas docas numa
+    única transação. Pedidos que não cabem em nenhuma doca permanecem como
+    estavam para decisão do administrador.
+    Retorna (quantidade alocada, quantidade não alocada).
+    """
+    pendentes = db.session.query(
+        Agendamento.id,
+        Agendamento.data_agendamento,
+        Agendamento.data_fim,
+        Agendamento.doca_id,
+        Agendamento.tipo_carga.label('tipo_carga_pedido'),
+        Doca.terminal_id,
+        Doca.tipo_carga.label('tipo_carga_doca')
+    ).join(Doca, Agendamento.doca_id == Doca.id).filter(
+        Agendamento.status == 'pendente',
+        Agendamento.data_agendamento >= inicio,
+        Agendamento.data_agendamento < fim
+    ).all()
+    if not pendentes:
+        return 0, 0
+
+    # Docas ativas agrupadas por (terminal, tipo de carga)
+    grupos = {}
+    for doca_id, terminal_id, tipo_carga in db.session.query(
+            Doca.id, Doca.terminal_id, Doca.tipo_carga).filter(Doca.status == 'ativa'):
+        grupos.setdefault((terminal_id, tipo_carga), []).append(doca_id)
+    # Nenhuma reserva nova nessas docas até o fim da realocação
+    travar_docas([doca_id for docas in grupos.values() for doca_id in docas])
+
+    # Ocupações fixas: agendamentos ativos que não estão sendo replanejados
+    # (os pendentes reservam o próprio horário dentro de planejar_alocacao)
+    ids_pendentes = {p.id for p in pendentes}
+    fim_horizonte = max(p.data_fim for p in pendentes)
+    agendas = {}
+    fixos = db.session.query(
+        Agendamento.id,
+        Agendamento.doca_id,
+        Agendamento.data_agendamento,
+        Agendamento.data_fim
+    ).filter(
+        Agendamento.data_agendamento >= inicio - timedelta(minutes=DURACAO_MAXIMA_MINUTOS),
+        Agendamento.data_agendamento < fim_horizonte,
+        Agendamento.data_fim > inicio,
+        Agendamento.status.in_(STATUS_ATIVOS)
+    ).order_by(Agendamento.data_agendamento)
+    for agendamento_id, doca_id, ini_fixo, fim_fixo in fixos:
+        if agendamento_id not in ids_pendentes:
+            agendas.setdefault(doca_id, []).append((ini_fixo, fim_fixo))
+
+    compatibilidade = {
+        p.id: grupos.get((p.terminal_id, p.tipo_carga_pedido or p.tipo_carga_doca), [])
+        for p in pendentes
+    }
+    pedidos = [(p.id, p.data_agendamento, p.data_fim, p.doca_id) for p in pendentes]
+    alocados, nao_alocados = planejar_alocacao(
+        pedidos, agendas, lambda pedido: compatibilidade[pedido[0]]
+    )
+
+    doca_atual = {p.id: p.doca_id for p in pendentes}
+    agora = datetime.utcnow()
+    alteracoes = [
+        {'id': agendamento_id, 'doca_id': doca_id, 'data_atualizacao': agora}
+        for agendamento_id, doca_id in alocados.items()
+        if doca_atual[agendamento_id] != doca_id
+    ]
+    if alteracoes:
+        if db.session.get_bind().dialect.name == 'postgresql':
+            # Os UPDATEs são aplicados um a um e um pedido pode ocupar o horário
+            # que outro deixou: a restrição da migração 0008 é verificada só no
+            # commit, sobre o estado final, sem depender da ordem dos UPDATEs
+            db.session.execute(db.text('SET CONSTRAINTS ALL DEFERRED'))
+        db.session.bulk_update_mappings(Agendamento, alteracoes)
+        versoes.marcar_docas(
+            {doca_atual[alteracao['id']] for alteracao in alteracoes}
+            | {alteracao['doca_id'] for alteracao in alteracoes}
+        )
+        painel.recarregar()
+    db.session.commit()
+    return len(alocados), len(nao_alocados)
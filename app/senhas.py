@@ -0,0 +1,61 @@
+"""Hash e verificação de senhas com parâmetros configuráveis.
+
+PASSWORD_HASH_METHOD define o método e o custo (formato do werkzeug, ex.:
+'pbkdf2:sha256:600000' ou 'scrypt:32768:8:1'). Senhas gravadas com outros
+parâmetros continuam válidas e são regravadas com os atuais no próximo login
+bem-sucedido (precisa_rehash).
+
+A verificação é a parte cara do login; ela roda num pool limitado a
+SENHA_WORKERS threads, de modo que um pico de logins não ocupe todas as
+threads do servidor calculando hashes ao mesmo tempo. pbkdf2 e scrypt liberam
+o GIL, então o pool aproveita um núcleo por worker.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash
+
+_trava = threading.Lock()
+_pool = None
+
+
+def metodo_atual():
+    if has_app_context():
+        return current_app.config['PASSWORD_HASH_METHOD']
+    return 'pbkdf2'
+
+
+def _executor():
+    global _pool
+    if _pool is None:
+        with _trava:
+            if _pool is None:
+                workers = current_app.config['SENHA_WORKERS'] if has_app_context() else 1
+                _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='senhas')
+    return _pool
+
+
+def gerar_hash(senha, metodo=None):
+    return generate_password_hash(senha, method=metodo or metodo_atual())
+
+
+def verificar(hash_senha, senha):
+    """Confere a senha no pool de verificação (bloqueia até o resultado)"""
+    if not hash_senha or senha is None:
+        return False
+    return _executor().submit(check_password_hash, hash_senha, senha).result()
+
+
+@lru_cache(maxsize=16)
+def _prefixo(metodo):
+    # O werkzeug completa os parâmetros omitidos (ex.: 'pbkdf2' -> 'pbkdf2:sha256:600000');
+    # o prefixo de um hash gerado agora é a forma canônica do método
+    return generate_password_hash('', method=metodo).split('$', 1)[0]
+
+
+def precisa_rehash(hash_senha, metodo=None):
+    """Indica se o hash foi gerado com parâmetros diferentes dos configurados"""
+    if not hash_senha:
+        return False
+    return hash_senha.split('$', 1)[0] != _prefixo(metodo or metodo_atual())
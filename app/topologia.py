@@ -0,0 +1,135 @@
+"""Retrato em memória dos terminais e docas.
+
+Terminais, docas, tipos de carga e horários mudam pouco e são lidos em quase
+toda página (opções do formulário de agendamento, filtros do admin, busca de
+horários livres). O retrato é imutável (tuplas e namedtuples) e compartilhado
+entre as requisições do processo; as listas de opções já ficam montadas.
+
+Validade: o retrato é usado sem consultar o banco por TOPOLOGIA_TTL segundos;
+depois disso uma consulta à versão 'topologia' (app.versoes) decide se ele
+precisa ser recarregado. Alterações feitas pelo próprio processo descartam o
+retrato logo após o commit; os demais processos as veem em até TOPOLOGIA_TTL.
+"""
+import threading
+import time
+from collections import namedtuple
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db, versoes
+from app.models import Doca, Terminal, VersaoDados
+
+TerminalInfo = namedtuple('TerminalInfo', [
+    'id', 'nome', 'endereco', 'telefone', 'horario_abertura', 'horario_fechamento'
+])
+# terminal é o TerminalInfo correspondente (mesmo acesso de doca.terminal.nome)
+DocaInfo = namedtuple('DocaInfo', ['id', 'numero', 'tipo_carga', 'status', 'terminal_id', 'terminal'])
+
+
+class Topologia:
+    """Retrato imutável de terminais e docas numa versão"""
+
+    def __init__(self, versao, terminais, docas):
+        self.versao = versao
+        self.terminais = tuple(sorted(terminais, key=lambda t: t.nome))
+        self.docas = tuple(sorted(docas, key=lambda d: (d.terminal.nome, d.numero, d.id)))
+        self._terminais_por_id = {t.id: t for t in self.terminais}
+        self._docas_por_id = {d.id: d for d in self.docas}
+        self.docas_ativas = tuple(d for d in self.docas if d.status == 'ativa')
+        self.tipos_carga = tuple(sorted({d.tipo_carga for d in self.docas if d.tipo_carga}))
+        # Opções do campo doca_id do formulário de agendamento
+        self.escolhas_docas = tuple(
+            (d.id, f'{d.terminal.nome} - Doca {d.numero} ({d.tipo_carga})') for d in self.docas_ativas
+        )
+
+    def terminal(self, id):
+        return self._terminais_por_id.get(id)
+
+    def doca(self, id):
+        return self._docas_por_id.get(id)
+
+    def docas_do_terminal(self, terminal_id, tipo_carga=None, status=None):
+        """Docas de um terminal em ordem de id, opcionalmente por tipo de carga e status"""
+        return sorted(
+            (d for d in self.docas
+             if d.terminal_id == terminal_id
+             and (tipo_carga is None or d.tipo_carga == tipo_carga)
+             and (status is None or d.status == status)),
+            key=lambda d: d.id
+        )
+
+
+def carregar():
+    """Lê terminais e docas do banco (duas consultas) e monta um retrato novo"""
+    versao = db.session.query(VersaoDados.versao).filter_by(nome=versoes.TOPOLOGIA).scalar() or 0
+    terminais = {
+        linha.id: TerminalInfo(
+            linha.id, linha.nome, linha.endereco, linha.telefone,
+            linha.horario_abertura, linha.horario_fechamento
+        )
+        for linha in db.session.query(
+            Terminal.id, Terminal.nome, Terminal.endereco, Terminal.telefone,
+            Terminal.horario_abertura, Terminal.horario_fechamento
+        )
+    }
+    docas = [
+        DocaInfo(linha.id, linha.numero, linha.tipo_carga, linha.status,
+                 linha.terminal_id, terminais[linha.terminal_id])
+        for linha in db.session.query(
+            Doca.id, Doca.numero, Doca.tipo_carga, Doca.status, Doca.terminal_id
+        )
+        if linha.terminal_id in terminais
+    ]
+    return Topologia(versao, terminais.values(), docas)
+
+
+_trava = threading.Lock()
+_retrato = None
+_verificado_em = 0.0
+
+
+def obter():
+    """Retrato atual; consulta o banco no máximo uma vez a cada TOPOLOGIA_TTL segundos"""
+    global _retrato, _verificado_em
+    agora = time.monotonic()
+    retrato = _retrato
+    if retrato is not None and agora - _verificado_em < current_app.config['TOPOLOGIA_TTL']:
+        return retrato
+
+    with _trava:
+        if _retrato is not None and agora - _verificado_em < current_app.config['TOPOLOGIA_TTL']:
+            return _retrato
+        if _retrato is not None:
+            versao = db.session.query(VersaoDados.versao).filter_by(nome=versoes.TOPOLOGIA).scalar() or 0
+            if versao == _retrato.versao:
+                _verificado_em = agora
+                return _retrato
+        _retrato = carregar()
+        _verificado_em = agora
+        return _retrato
+
+
+def invalidar():
+    """Descarta o retrato deste processo (recarregado no próximo obter())"""
+    global _retrato
+    with _trava:
+        _retrato = None
+
+
+@event.listens_for(Session, 'before_flush')
+def _detectar_alteracoes(session, flush_context, instances):
+    for objeto in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(objeto, (Doca, Terminal)):
+            session.info['topologia_alterada'] = True
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_apos_commit(session):
+    if session.info.pop('topologia_alterada', False):
+        invalidar()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_alteracoes(session):
+    session.info.pop('topologia_alterada', None)
@@ -0,0 +1,137 @@
+"""Carregamento do usuário autenticado e registro do último acesso.
+
+load_user roda em toda requisição autenticada. Os usuários carregados ficam
+num cache do processo por USUARIOS_CACHE_TTL segundos, como instâncias
+destacadas da sessão; cada requisição recebe uma cópia ligada à sua sessão via
+merge(load=False), sem SELECT. Qualquer alteração de usuário gravada pelo
+próprio processo (perfil, senha, confirmação de email...) remove a entrada
+no commit; alterações feitas por outros processos valem em até
+USUARIOS_CACHE_TTL segundos.
+
+data_ultimo_acesso não é mais gravada a cada visualização: os acessos ficam
+num buffer e são gravados num único UPDATE em lote a cada
+ULTIMO_ACESSO_INTERVALO segundos (e na saída do processo).
+"""
+import atexit
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import bindparam, event, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from app import db
+from app.models import User
+
+# Limite de usuários mantidos no cache (os menos usados saem primeiro)
+TAMANHO_MAXIMO_CACHE = 5000
+
+_trava = threading.Lock()
+_cache = OrderedDict()  # id -> (expira_em, usuário destacado)
+
+_trava_acessos = threading.Lock()
+_acessos = {}  # id -> datetime do último acesso ainda não gravado
+_acessos_gravados_em = time.monotonic()
+
+
+def carregar(user_id):
+    """Usuário `user_id` ligado à sessão atual, lido do cache quando possível"""
+    agora = time.monotonic()
+    with _trava:
+        item = _cache.get(user_id)
+        if item is not None and item[0] > agora:
+            _cache.move_to_end(user_id)
+            return db.session.merge(item[1], load=False)
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    # A instância carregada vai para o cache e a requisição usa uma cópia
+    db.session.expunge(user)
+    with _trava:
+        _cache[user_id] = (agora + current_app.config['USUARIOS_CACHE_TTL'], user)
+        _cache.move_to_end(user_id)
+        while len(_cache) > TAMANHO_MAXIMO_CACHE:
+            _cache.popitem(last=False)
+    return db.session.merge(user, load=False)
+
+
+def invalidar(ids=None):
+    """Remove usuários do cache (todos, se ids for None)"""
+    with _trava:
+        if ids is None:
+            _cache.clear()
+        else:
+            for user_id in ids:
+                _cache.pop(user_id, None)
+
+
+def registrar_acesso(user):
+    """Registra o acesso agora; a gravação no banco é feita em lote"""
+    agora = datetime.utcnow()
+    # Atualiza o objeto sem marcá-lo como alterado (não gera UPDATE no commit)
+    set_committed_value(user, 'data_ultimo_acesso', agora)
+    with _trava:
+        item = _cache.get(user.id)
+        if item is not None:
+            set_committed_value(item[1], 'data_ultimo_acesso', agora)
+
+    global _acessos_gravados_em
+    with _trava_acessos:
+        _acessos[user.id] = agora
+        vencido = time.monotonic() - _acessos_gravados_em >= current_app.config['ULTIMO_ACESSO_INTERVALO']
+        if vencido:
+            _acessos_gravados_em = time.monotonic()
+    if vencido:
+        gravar_acessos()
+
+
+def gravar_acessos():
+    """Grava os acessos pendentes num único UPDATE em lote, em transação própria"""
+    with _trava_acessos:
+        pendentes = [{'b_id': user_id, 'b_acesso': acesso} for user_id, acesso in _acessos.items()]
+        _acessos.clear()
+    if not pendentes:
+        return 0
+    tabela = User.__table__
+    comando = tabela.update().where(tabela.c.id == bindparam('b_id')).values(
+        data_ultimo_acesso=bindparam('b_acesso')
+    )
+    with db.engine.begin() as conexao:
+        conexao.execute(comando, pendentes)
+    return len(pendentes)
+
+
+def _marcar_usuario_alterado(mapper, connection, target):
+    sessao = inspect(target).session
+    if sessao is not None:
+        sessao.info.setdefault('usuarios_alterados', set()).add(target.id)
+
+
+event.listen(User, 'after_update', _marcar_usuario_alterado)
+event.listen(User, 'after_delete', _marcar_usuario_alterado)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_apos_commit(session):
+    ids = session.info.pop('usuarios_alterados', None)
+    if ids:
+        invalidar(ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_alterados(session):
+    session.info.pop('usuarios_alterados', None)
+
+
+def init_app(app):
+    # Acessos ainda no buffer são gravados quando o processo termina
+    def _gravar_na_saida():
+        with app.app_context():
+            try:
+                gravar_acessos()
+            except Exception:
+                app.logger.exception('Erro ao gravar os últimos acessos')
+
+    atexit.register(_gravar_na_saida)
@@ -0,0 +1,153 @@
+"""Consolidação diária da utilização das docas.
+
+O relatório de utilização lê a tabela UtilizacaoDiaria em vez de agregar todo o
+histórico de agendamentos. atualizar() é executada periodicamente (por exemplo
+via cron com `flask atualizar-utilizacao`) e recalcula apenas os dias que
+tiveram agendamentos alterados desde a execução anterior. Os agendamentos
+arquivados (app.arquivamento) continuam contando nos dias recalculados.
+
+Exclusões e remarcações não deixam data de atualização no dia que perdeu o
+agendamento: antes de cada flush do ORM esses dias são gravados em
+UtilizacaoPendente (inclusive nas exclusões em cascata de docas, terminais e
+usuários), e as linhas de uma doca excluída saem da consolidação na hora.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import case, event, func, inspect
+from sqlalchemy.orm import Session
+from app import db
+from app.arquivamento import historico
+from app.models import (Agendamento, AgendamentoArquivo, Doca, MarcaProcessamento, User,
+                        UtilizacaoDiaria, UtilizacaoPendente)
+from app.utils import como_data, insert_com_conflito, intervalo_dia
+
+MARCA = 'utilizacao_diaria'
+
+# Reprocessa uma pequena sobreposição para não perder transações que estavam
+# em andamento durante a execução anterior
+MARGEM_SEGURANCA = timedelta(minutes=5)
+
+
+def _contar_status(agendamento, status):
+    return func.coalesce(func.sum(case((agendamento.status == status, 1), else_=0)), 0)
+
+
+def recalcular_dia(dia):
+    """Recalcula a consolidação de todas as docas num dia"""
+    inicio, fim = intervalo_dia(dia)
+    UtilizacaoDiaria.query.filter_by(dia=dia).delete()
+    agendamento = historico()
+    origem = db.select(
+        agendamento.doca_id,
+        db.literal(dia, db.Date),
+        func.count(agendamento.id),
+        func.coalesce(func.sum(agendamento.duracao_estimada), 0),
+        _contar_status(agendamento, 'confirmado'),
+        _contar_status(agendamento, 'pendente'),
+        _contar_status(agendamento, 'cancelado'),
+        _contar_status(agendamento, 'rejeitado')
+    ).filter(
+        agendamento.data_agendamento >= inicio,
+        agendamento.data_agendamento < fim
+    ).group_by(agendamento.doca_id)
+    db.session.execute(
+        db.insert(UtilizacaoDiaria).from_select(
+            ['doca_id', 'dia', 'total', 'minutos',
+             'confirmados', 'pendentes', 'cancelados', 'rejeitados'],
+            origem
+        )
+    )
+
+
+def ultima_atualizacao():
+    """Momento até o qual a consolidação está em dia (None se nunca executada)"""
+    marca = db.session.get(MarcaProcessamento, MARCA)
+    return marca.valor if marca else None
+
+
+def atualizar(completo=False):
+    """Consolida os dias com agendamentos alterados desde a última execução.
+
+    Com completo=True (ou na primeira execução) reprocessa todo o histórico.
+    Retorna a quantidade de dias recalculados.
+    """
+    inicio_execucao = datetime.utcnow()
+    marca = db.session.get(MarcaProcessamento, MARCA)
+    if marca is None:
+        marca = MarcaProcessamento(nome=MARCA)
+        db.session.add(marca)
+
+    if completo or marca.valor is None:
+        UtilizacaoDiaria.query.delete()
+        agendamento = historico()
+        consulta = db.session.query(func.date(agendamento.data_agendamento)).distinct()
+        dias = {como_data(valor) for valor, in consulta}
+    else:
+        # Arquivados não mudam: basta a tabela principal
+        consulta = db.session.query(func.date(Agendamento.data_agendamento)).distinct().filter(
+            Agendamento.data_atualizacao >= marca.valor - MARGEM_SEGURANCA
+        )
+        dias = {como_data(valor) for valor, in consulta}
+        dias.update(dia for dia, in db.session.query(UtilizacaoPendente.dia))
+
+    dias = sorted(dias)
+    for dia_alterado in dias:
+        recalcular_dia(dia_alterado)
+
+    # Os registrados há pouco ficam para a próxima execução, como na margem acima
+    UtilizacaoPendente.query.filter(
+        UtilizacaoPendente.data_registro < inicio_execucao - MARGEM_SEGURANCA
+    ).delete()
+    marca.valor = inicio_execucao
+    db.session.commit()
+    return len(dias)
+
+
+def _dias_arquivados(coluna, valor):
+    # Lido antes do flush: depois dele app.arquivamento já excluiu os arquivados do usuário
+    consulta = db.session.query(func.date(AgendamentoArquivo.data_agendamento)).distinct().filter(
+        coluna == valor
+    )
+    return {como_data(dia) for dia, in consulta}
+
+
+@event.listens_for(Session, 'before_flush')
+def _detectar_dias_afetados(session, flush_context, instances):
+    dias = set()
+    docas = set()
+    for objeto in session.deleted:
+        if isinstance(objeto, Agendamento):
+            dias.add(objeto.data_agendamento.date())
+        elif isinstance(objeto, Doca):
+            docas.add(objeto.id)
+        elif isinstance(objeto, User):
+            dias.update(_dias_arquivados(AgendamentoArquivo.user_id, objeto.id))
+    for objeto in session.dirty:
+        if isinstance(objeto, Agendamento):
+            # Remarcação: o dia novo é coberto pela data de atualização
+            anteriores = inspect(objeto).attrs.data_agendamento.history.deleted
+            dias.update(anterior.date() for anterior in anteriores if anterior is not None)
+    if dias:
+        session.info.setdefault('utilizacao_dias', set()).update(dias)
+    if docas:
+        session.info.setdefault('utilizacao_docas', set()).update(docas)
+
+
+@event.listens_for(Session, 'after_flush')
+def _gravar_dias_afetados(session, flush_context):
+    dias = session.info.pop('utilizacao_dias', None)
+    if dias:
+        comando = insert_com_conflito(UtilizacaoPendente, session).values(
+            [{'dia': dia, 'data_registro': datetime.utcnow()} for dia in sorted(dias)]
+        )
+        session.execute(comando.on_conflict_do_update(
+            index_elements=['dia'], set_={'data_registro': comando.excluded.data_registro}
+        ))
+    docas = session.info.pop('utilizacao_docas', None)
+    if docas:
+        session.execute(db.delete(UtilizacaoDiaria).where(UtilizacaoDiaria.doca_id.in_(docas)))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_dias_afetados(session):
+    session.info.pop('utilizacao_dias', None)
+    session.info.pop('utilizacao_docas', None)
@@ -0,0 +1,209 @@
+import base64
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import and_, event, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import joinedload
+from app import db
+
+_INSERT_POR_DIALETO = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+def intervalo_dia(dia):
+    """Retorna o intervalo [início, fim) que cobre o dia inteiro.
+
+    Filtrar por faixa em vez de func.date(coluna) permite usar o índice da coluna.
+    """
+    inicio = datetime.combine(dia, time.min)
+    return inicio, inicio + timedelta(days=1)
+
+
+def intervalo_dias(data_inicio, data_fim):
+    """Retorna o intervalo [início, fim) que cobre de data_inicio até data_fim inclusive"""
+    return datetime.combine(data_inicio, time.min), datetime.combine(data_fim, time.min) + timedelta(days=1)
+
+
+def como_data(valor):
+    """Converte o resultado de func.date (texto no SQLite, date no PostgreSQL) em date"""
+    if isinstance(valor, str):
+        return date.fromisoformat(valor)
+    return valor
+
+
+def insert_com_conflito(modelo, session=None):
+    """INSERT do dialeto em uso (SQLite ou PostgreSQL), com on_conflict_do_update/do_nothing"""
+    session = session or db.session()
+    return _INSERT_POR_DIALETO[session.get_bind().dialect.name](modelo)
+
+
+def prefixo_explain(dialeto):
+    """Prefixo que transforma um comando SQL no pedido do seu plano de execução"""
+    return 'EXPLAIN QUERY PLAN ' if dialeto.name == 'sqlite' else 'EXPLAIN '
+
+
+def linhas_do_plano(dialeto, linhas):
+    """Texto de cada linha retornada pelo EXPLAIN"""
+    if dialeto.name == 'sqlite':
+        return [linha[-1] for linha in linhas]
+    return [linha[0] for linha in linhas]
+
+
+def explicar_consulta(consulta):
+    """Executa EXPLAIN para uma consulta (Query ou Select) e retorna as linhas do plano"""
+    statement = getattr(consulta, 'statement', consulta)
+    conexao = db.session.connection()
+    dialeto = conexao.dialect
+    compilado = statement.compile(dialect=dialeto, compile_kwargs={'render_postcompile': True})
+    if compilado.positional:
+        parametros = tuple(compilado.params[nome] for nome in compilado.positiontup)
+    else:
+        parametros = compilado.params
+    linhas = conexao.exec_driver_sql(prefixo_explain(dialeto) + str(compilado), parametros).fetchall()
+    return linhas_do_plano(dialeto, linhas)
+
+
+def varreduras_completas(plano):
+    """Filtra as linhas do plano que indicam leitura completa de uma tabela"""
+    return [
+        linha for linha in plano
+        if linha.strip().startswith('Seq Scan')
+        or (linha.startswith('SCAN ') and ' INDEX ' not in linha)
+    ]
+
+
+def opcoes_detalhes_agendamento(agendamento=None):
+    """Carrega usuário, doca e terminal junto com os agendamentos (evita N+1 nos templates).
+
+    `agendamento` é a entidade consultada quando não for Agendamento (ex.: app.arquivamento.historico()).
+    """
+    from app.models import Agendamento, Doca
+    agendamento = agendamento or Agendamento
+    return (
+        joinedload(agendamento.usuario),
+        joinedload(agendamento.doca).joinedload(Doca.terminal),
+    )
+
+
+class ContadorConsultas:
+    """Registra os comandos SQL emitidos enquanto está ativo"""
+
+    def __init__(self):
+        self.comandos = []
+
+    @property
+    def total(self):
+        return len(self.comandos)
+
+    def _registrar(self, conn, cursor, statement, parameters, context, executemany):
+        self.comandos.append(statement)
+
+
+@contextmanager
+def contar_consultas():
+    """Conta os comandos SQL executados dentro do bloco"""
+    contador = ContadorConsultas()
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', contador._registrar)
+    try:
+        yield contador
+    finally:
+        event.remove(engine, 'before_cursor_execute', contador._registrar)
+
+
+@contextmanager
+def limite_consultas(maximo):
+    """Garante que o bloco não execute mais do que `maximo` comandos SQL.
+
+    Uso típico em testes de rotas, para detectar consultas N+1:
+
+        with limite_consultas(6):
+            client.get('/admin/agendamentos')
+    """
+    with contar_consultas() as contador:
+        yield contador
+    if contador.total > maximo:
+        raise AssertionError(
+            f'{contador.total} comandos SQL executados (limite: {maximo}):\n'
+            + '\n'.join(contador.comandos)
+        )
+
+
+class PaginaKeyset:
+    """Página de resultados com cursores para a página anterior e a próxima"""
+
+    def __init__(self, itens, cursor_anterior=None, cursor_proximo=None):
+        self.itens = itens
+        self.cursor_anterior = cursor_anterior
+        self.cursor_proximo = cursor_proximo
+
+    @property
+    def tem_anterior(self):
+        return self.cursor_anterior is not None
+
+    @property
+    def tem_proxima(self):
+        return self.cursor_proximo is not None
+
+
+def codificar_cursor(valor, id):
+    """Codifica a chave (valor, id) de um registro num cursor opaco para URLs"""
+    bruto = f'{valor.isoformat()}|{id}'.encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Decodifica um cursor gerado por codificar_cursor; retorna None se inválido"""
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        valor, id = bruto.rsplit('|', 1)
+        return datetime.fromisoformat(valor), int(id)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+
+
+def paginar_keyset(query, coluna, coluna_id, cursor=None, direcao='proxima',
+                   tamanho=50, descendente=False):
+    """Pagina uma consulta pela chave (coluna, id) sem OFFSET.
+
+    Cada página é uma busca por faixa no índice a partir da chave do último
+    (ou primeiro) registro exibido, então o custo não cresce com a posição da
+    página nem com o tamanho da tabela.
+    """
+    chave = decodificar_cursor(cursor) if cursor else None
+    voltando = chave is not None and direcao == 'anterior'
+    # Ordem em que os registros são lidos do banco nesta requisição
+    ordem_desc = descendente != voltando
+
+    if chave is not None:
+        valor, id = chave
+        if ordem_desc:
+            query = query.filter(or_(coluna < valor, and_(coluna == valor, coluna_id < id)))
+        else:
+            query = query.filter(or_(coluna > valor, and_(coluna == valor, coluna_id > id)))
+
+    if ordem_desc:
+        query = query.order_by(coluna.desc(), coluna_id.desc())
+    else:
+        query = query.order_by(coluna.asc(), coluna_id.asc())
+
+    itens = query.limit(tamanho + 1).all()
+    ha_mais = len(itens) > tamanho
+    itens = itens[:tamanho]
+    if voltando:
+        itens.reverse()
+    if not itens:
+        return PaginaKeyset(itens)
+
+    def cursor_de(item):
+        return codificar_cursor(getattr(item, coluna.key), getattr(item, coluna_id.key))
+
+    if voltando:
+        anterior = cursor_de(itens[0]) if ha_mais else None
+        proximo = cursor_de(itens[-1])
+    else:
+        anterior = cursor_de(itens[0]) if chave is not None else None
+        proximo = cursor_de(itens[-1]) if ha_mais else None
+    return PaginaKeyset(itens, anterior, proximo)
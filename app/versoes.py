@@ -0,0 +1,86 @@
+"""Versões dos dados publicados pela API.
+
+Cada transação que altera agendamentos de uma doca ('agendamentos:<doca_id>')
+ou terminais e docas ('topologia') incrementa o contador correspondente uma
+única vez, na própria transação. A API deriva os ETags desses contadores e
+responde 304 sem consultar as tabelas de agendamentos quando nada mudou.
+
+Os agendamentos têm um contador por doca: transações em docas diferentes não
+disputam a mesma linha (as reservas de uma mesma doca já são serializadas por
+app.scheduling.travar_docas).
+
+Alterações feitas pelo ORM são detectadas automaticamente antes de cada flush;
+operações em lote que não passam pelo ORM (INSERT/UPDATE diretos) devem chamar
+marcar() ou marcar_docas().
+"""
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Agendamento, Doca, Terminal, VersaoDados
+from app.utils import insert_com_conflito
+
+AGENDAMENTOS = 'agendamentos'
+TOPOLOGIA = 'topologia'
+
+
+def nome_doca(doca_id):
+    """Nome do conjunto com os agendamentos de uma doca"""
+    return f'{AGENDAMENTOS}:{doca_id}'
+
+
+def marcar(nome, session=None):
+    """Registra que o conjunto `nome` foi alterado na transação atual"""
+    session = session or db.session()
+    session.info.setdefault('versoes_alteradas', set()).add(nome)
+
+
+def marcar_docas(doca_ids, session=None):
+    """Registra que os agendamentos das docas foram alterados na transação atual"""
+    for doca_id in doca_ids:
+        marcar(nome_doca(doca_id), session)
+
+
+def obter(nomes):
+    """Versões atuais dos conjuntos pedidos: {nome: versao}, 0 se nunca alterado"""
+    atuais = dict(db.session.query(VersaoDados.nome, VersaoDados.versao).filter(
+        VersaoDados.nome.in_(nomes)
+    ))
+    return {nome: atuais.get(nome, 0) for nome in nomes}
+
+
+def _incrementar(session, nomes):
+    # Em ordem de nome, para que transações concorrentes travem as linhas na mesma ordem
+    comando = insert_com_conflito(VersaoDados, session).values(
+        [{'nome': nome, 'versao': 1} for nome in sorted(nomes)]
+    )
+    session.execute(comando.on_conflict_do_update(
+        index_elements=['nome'], set_={'versao': VersaoDados.versao + 1}
+    ))
+
+
+@event.listens_for(Session, 'before_flush')
+def _detectar_alteracoes(session, flush_context, instances):
+    for objeto in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(objeto, Agendamento):
+            marcar(nome_doca(objeto.doca_id), session)
+            # Agendamento movido de doca: a doca anterior também mudou
+            marcar_docas(
+                (anterior for anterior in inspect(objeto).attrs.doca_id.history.deleted
+                 if anterior is not None),
+                session
+            )
+        elif isinstance(objeto, (Doca, Terminal)):
+            marcar(TOPOLOGIA, session)
+
+
+@event.listens_for(Session, 'after_flush')
+@event.listens_for(Session, 'before_commit')
+def _gravar_versoes(session, *args):
+    nomes = session.info.pop('versoes_alteradas', None)
+    if nomes:
+        _incrementar(session, nomes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_versoes(session):
+    session.info.pop('versoes_alteradas', None)
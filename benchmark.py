@@ -0,0 +1,297 @@
+"""Benchmarks do agendamento e das páginas mais acessadas.
+
+Uso:
+    python benchmark.py [--tamanhos 1000,10000,100000] [--repeticoes 30] [--saida resultado.json]
+    python benchmark.py --comparar antes.json depois.json [--tolerancia 0.15]
+
+Para cada tamanho o banco (SQLite temporário, ou DATABASE_URL se definido:
+as tabelas são recriadas) é populado com o gerador de populate_db.py, de
+forma determinística (--seed), e são medidos:
+
+- micro: funções do núcleo chamadas diretamente (verificação de conflito,
+  horários livres, conflitos de aprovação em lote, página da listagem,
+  consulta do relatório/exportação, renderização de emails e retrato das docas);
+- rotas: latência das páginas pelo cliente de teste (dashboards, listagens,
+  relatórios, novo agendamento e API), com o número de comandos SQL.
+
+Cada medida guarda mediana, p95, média e mínimo em milissegundos. O JSON de
+saída pode ser comparado com outra execução (--comparar), que aponta as
+medidas com variação da mediana acima da tolerância.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+_arquivo_db = None
+if not os.environ.get('DATABASE_URL'):
+    _arquivo_db = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + _arquivo_db.name
+
+from app import create_app, db, topologia
+from app.email import send_agendamento_confirmacao, send_novo_agendamento_admin
+from app.exportacao import consulta_exportacao, gerar_csv
+from app.models import Agendamento, Doca, Terminal, User
+from app.resumo import reconstruir as reconstruir_resumo
+from app.scheduling import buscar_conflito, buscar_horarios_livres, conflitos_aprovacao
+from app.utils import contar_consultas, opcoes_detalhes_agendamento, paginar_keyset
+from app import usuarios, utilizacao
+import populate_db
+
+SENHA = 'senha-de-teste'
+
+
+def popular(app, tamanho, seed):
+    """Recria o banco com `tamanho` agendamentos sintéticos e dois usuários de teste"""
+    # Os caches do processo guardam dados do banco anterior
+    topologia.invalidar()
+    usuarios.invalidar()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for email, tipo in (('admin@bench.teste', 'admin'), ('usuario@bench.teste', 'usuario')):
+            user = User(email=email, nome=tipo.title(), empresa='Bench', tipo=tipo,
+                        email_confirmado=True, perfil_completo=True, nivel_acesso='completo')
+            user.set_password(SENHA)
+            db.session.add(user)
+        db.session.commit()
+        dias = max(tamanho // 400, 30)
+        args = argparse.Namespace(
+            agendamentos=tamanho, terminais=4, docas=10, usuarios=max(tamanho // 200, 10),
+            inicio=date.today() - timedelta(days=dias // 2), hoje=date.today(),
+            ocupacao=0.6, seed=seed, lote=20000
+        )
+        populate_db.gerar_volume(args)
+        # Parte dos agendamentos pertence ao usuário de teste (listagem e dashboard dele)
+        usuario_id = User.query.filter_by(email='usuario@bench.teste').one().id
+        db.session.execute(
+            db.update(Agendamento).where(Agendamento.id % 50 == 0).values(user_id=usuario_id)
+        )
+        db.session.commit()
+        reconstruir_resumo()
+        utilizacao.atualizar(completo=True)
+
+
+def medir(funcao, repeticoes, aquecimento=2):
+    """Executa funcao() e devolve estatísticas em ms, com os comandos SQL da última execução"""
+    for _ in range(aquecimento):
+        funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        with contar_consultas() as consultas:
+            inicio = time.perf_counter()
+            funcao()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    return {
+        'mediana_ms': round(statistics.median(tempos), 3),
+        'p95_ms': round(tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))], 3),
+        'media_ms': round(statistics.fmean(tempos), 3),
+        'min_ms': round(tempos[0], 3),
+        'consultas': consultas.total,
+        'repeticoes': repeticoes
+    }
+
+
+def micro_benchmarks(app, repeticoes):
+    resultados = {}
+    with app.test_request_context():
+        terminal = Terminal.query.order_by(Terminal.id).first()
+        doca = Doca.query.filter_by(terminal_id=terminal.id, status='ativa').order_by(Doca.id).first()
+        amanha = datetime.combine(date.today() + timedelta(days=1), datetime.min.time()).replace(hour=10)
+        pendentes = Agendamento.query.options(*opcoes_detalhes_agendamento()).filter(
+            Agendamento.status == 'pendente'
+        ).order_by(Agendamento.data_agendamento).limit(200).all()
+        agendamento = Agendamento.query.options(*opcoes_detalhes_agendamento()).first()
+        consulta_listagem = Agendamento.query.options(*opcoes_detalhes_agendamento())
+
+        def conflito():
+            buscar_conflito(doca.id, amanha, 60)
+
+        def horarios_livres():
+            buscar_horarios_livres(terminal, doca.tipo_carga, 60, amanha, amanha + timedelta(days=7))
+
+        def aprovacao_em_lote():
+            conflitos_aprovacao(pendentes)
+
+        def pagina_listagem():
+            paginar_keyset(consulta_listagem, Agendamento.data_agendamento, Agendamento.id, tamanho=50)
+
+        def relatorio_exportacao():
+            # CSV completo da última semana (consulta + serialização)
+            consulta = consulta_exportacao(
+                Agendamento.data_agendamento >= amanha - timedelta(days=7),
+                Agendamento.data_agendamento < amanha
+            )
+            for _ in gerar_csv(consulta):
+                pass
+
+        def emails():
+            send_agendamento_confirmacao(agendamento)
+            send_novo_agendamento_admin(agendamento)
+            db.session.info.pop('emails_pendentes', None)
+
+        def retrato_docas():
+            topologia.invalidar()
+            topologia.obter()
+
+        for nome, funcao in (
+            ('conflito', conflito),
+            ('horarios_livres', horarios_livres),
+            ('aprovacao_em_lote_200', aprovacao_em_lote),
+            ('pagina_listagem', pagina_listagem),
+            ('exportacao_semana', relatorio_exportacao),
+            ('renderizar_emails', emails),
+            ('retrato_docas', retrato_docas),
+        ):
+            resultados[nome] = medir(funcao, repeticoes)
+        db.session.rollback()
+    return resultados
+
+
+def rotas_benchmarks(app, repeticoes):
+    admin = app.test_client()
+    admin.post('/login', data={'email': 'admin@bench.teste', 'password': SENHA})
+    usuario = app.test_client()
+    usuario.post('/login', data={'email': 'usuario@bench.teste', 'password': SENHA})
+
+    with app.app_context():
+        terminal_id = Terminal.query.order_by(Terminal.id).first().id
+    hoje = date.today()
+    inicio_periodo = (hoje - timedelta(days=30)).isoformat()
+    # Rótulo explícito por rota: a mesma página com outros parâmetros é outra medida,
+    # e as datas da query string não entram na chave usada em --comparar
+    rotas = [
+        ('GET /admin/dashboard', admin, '/admin/dashboard'),
+        ('GET /admin/agendamentos', admin, '/admin/agendamentos'),
+        ('GET /admin/agendamentos (pendentes)', admin, '/admin/agendamentos?status=pendente'),
+        ('GET /admin/docas', admin, '/admin/docas'),
+        ('GET /admin/relatorios', admin, '/admin/relatorios'),
+        ('GET /admin/relatorios/agendamentos (30 dias)', admin,
+         f'/admin/relatorios/agendamentos?data_inicio={inicio_periodo}&data_fim={hoje}'),
+        ('GET /admin/relatorios/utilizacao (30 dias)', admin,
+         f'/admin/relatorios/utilizacao?data_inicio={inicio_periodo}&data_fim={hoje}'),
+        ('GET /admin/painel', admin, '/admin/painel'),
+        ('GET /usuario/dashboard', usuario, '/usuario/dashboard'),
+        ('GET /usuario/agendamentos', usuario, '/usuario/agendamentos'),
+        ('GET /usuario/novo-agendamento', usuario, '/usuario/novo-agendamento'),
+        ('GET /usuario/horarios-livres', usuario, f'/usuario/horarios-livres?terminal={terminal_id}&tipo_carga=geral'),
+        ('GET /api/terminais/<id>/ocupacao', usuario, f'/api/terminais/{terminal_id}/ocupacao'),
+    ]
+
+    resultados = {}
+    with app.app_context():
+        for nome, cliente, url in rotas:
+            def requisicao():
+                resposta = cliente.get(url)
+                assert resposta.status_code == 200, (url, resposta.status_code)
+            resultados[nome] = medir(requisicao, repeticoes)
+    return resultados
+
+
+def executar(args):
+    app = create_app()
+    app.config.update(
+        WTF_CSRF_ENABLED=False,
+        EMAIL_FILA_WORKERS=0,
+        PASSWORD_HASH_METHOD='pbkdf2:sha256:1000',
+        MAIL_DEFAULT_SENDER='bench@bench.teste'
+    )
+    try:
+        versao = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        versao = None
+
+    relatorio = {
+        'meta': {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'commit': versao or None,
+            'python': platform.python_version(),
+            'banco': app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+            'seed': args.seed,
+            'repeticoes': args.repeticoes
+        },
+        'tamanhos': {}
+    }
+    for tamanho in args.tamanhos:
+        print(f'Populando {tamanho} agendamentos...')
+        popular(app, tamanho, args.seed)
+        resultados = {}
+        resultados.update({'micro: ' + nome: valor for nome, valor in micro_benchmarks(app, args.repeticoes).items()})
+        resultados.update({'rota: ' + nome: valor for nome, valor in rotas_benchmarks(app, args.repeticoes).items()})
+        relatorio['tamanhos'][str(tamanho)] = resultados
+        for nome, valor in resultados.items():
+            print(f'  {nome:<52}{valor["mediana_ms"]:>10.2f} ms  p95 {valor["p95_ms"]:>8.2f} ms  {valor["consultas"]:>3} SQL')
+
+    with open(args.saida, 'w') as arquivo:
+        json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+    print(f'Resultados gravados em {args.saida}')
+
+
+def comparar(caminho_antes, caminho_depois, tolerancia):
+    """Compara as medianas de duas execuções; retorna o número de regressões"""
+    with open(caminho_antes) as arquivo:
+        antes = json.load(arquivo)
+    with open(caminho_depois) as arquivo:
+        depois = json.load(arquivo)
+    print(f'antes: {antes["meta"].get("commit")} ({antes["meta"]["data"]})  '
+          f'depois: {depois["meta"].get("commit")} ({depois["meta"]["data"]})')
+
+    regressoes = 0
+    for tamanho, medidas in depois['tamanhos'].items():
+        anteriores = antes['tamanhos'].get(tamanho)
+        if anteriores is None:
+            continue
+        print(f'\n{tamanho} agendamentos')
+        for nome, valor in medidas.items():
+            if nome not in anteriores:
+                continue
+            mediana_antes = anteriores[nome]['mediana_ms']
+            mediana_depois = valor['mediana_ms']
+            variacao = (mediana_depois - mediana_antes) / mediana_antes if mediana_antes else 0.0
+            marca = ''
+            if variacao > tolerancia:
+                marca = '  PIOROU'
+                regressoes += 1
+            elif variacao < -tolerancia:
+                marca = '  melhorou'
+            consultas = ''
+            if valor['consultas'] != anteriores[nome]['consultas']:
+                consultas = f'  SQL {anteriores[nome]["consultas"]} -> {valor["consultas"]}'
+            print(f'  {nome:<52}{mediana_antes:>9.2f} -> {mediana_depois:>9.2f} ms '
+                  f'({variacao:+.0%}){marca}{consultas}')
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tamanhos', default='1000,10000,100000',
+                        type=lambda valor: [int(parte) for parte in valor.split(',')])
+    parser.add_argument('--repeticoes', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--saida', default='benchmark.json')
+    parser.add_argument('--comparar', nargs=2, metavar=('ANTES', 'DEPOIS'))
+    parser.add_argument('--tolerancia', type=float, default=0.15,
+                        help='variação da mediana considerada relevante (0.15 = 15%%)')
+    args = parser.parse_args()
+
+    try:
+        if args.comparar:
+            regressoes = comparar(*args.comparar, args.tolerancia)
+            if regressoes:
+                raise SystemExit(f'{regressoes} medida(s) pioraram mais que {args.tolerancia:.0%}')
+        else:
+            executar(args)
+    finally:
+        if _arquivo_db is not None:
+            os.unlink(_arquivo_db.name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""Confere a realocação de pendentes (app.scheduling) sem sobreposição de docas.
+
+Uso: python check_alocacao.py [--sorteios 2000]
+
+1. Casos fixos de planejar_alocacao, como o de um pendente que ficaria
+   sob outro movido para a sua doca.
+2. Sorteios de agendas e pedidos: o estado final (fixos, pedidos alocados na
+   nova doca e não alocados na doca atual) não pode ter sobreposições.
+3. alocar_pendentes num banco: SQLite temporário, ou o de DATABASE_URL se
+   definido (as tabelas são recriadas: não use num banco com dados). No
+   PostgreSQL a restrição de exclusão da migração 0008 também é criada, e a
+   realocação precisa gravar uma cadeia de mudanças de doca sem violá-la.
+"""
+import argparse
+import os
+import random
+import tempfile
+from datetime import datetime, time as hora, timedelta
+
+_arquivo_db = None
+if not os.environ.get('DATABASE_URL'):
+    _arquivo_db = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + _arquivo_db.name
+
+from app import create_app, db
+from app.models import Agendamento, Doca, Terminal, User
+from app.scheduling import alocar_pendentes, planejar_alocacao, sobrepoe
+from check_concorrencia import RESTRICAO_POSTGRESQL
+
+DIA = datetime(2030, 1, 7)
+
+
+def h(horas, minutos=0):
+    return DIA + timedelta(hours=horas, minutes=minutos)
+
+
+def sobreposicoes(ocupacoes):
+    """Pares sobrepostos em {doca_id: [(id, inicio, fim)]}"""
+    pares = []
+    for doca_id, lista in ocupacoes.items():
+        lista = sorted(lista, key=lambda o: o[1])
+        for anterior, atual in zip(lista, lista[1:]):
+            if sobrepoe(anterior[1], anterior[2], atual[1], atual[2]):
+                pares.append((doca_id, anterior[0], atual[0]))
+    return pares
+
+
+def estado_final(pedidos, agendas, alocados):
+    ocupacoes = {}
+    for doca_id, agenda in agendas.items():
+        for inicio, fim in agenda:
+            ocupacoes.setdefault(doca_id, []).append(('fixo', inicio, fim))
+    for pedido_id, inicio, fim, atual in pedidos:
+        ocupacoes.setdefault(alocados.get(pedido_id, atual), []).append((pedido_id, inicio, fim))
+    return ocupacoes
+
+
+def casos_fixos():
+    todas = lambda pedido: ['D1', 'D2']
+
+    # P fica na D1; Q não pode ser movido para cima dele
+    pedidos = [('P', h(10), h(12), 'D1'), ('Q', h(9), h(11), 'D2')]
+    agendas = {'D1': [(h(6), h(8))], 'D2': [(h(11, 30), h(15))]}
+    alocados, nao_alocados = planejar_alocacao(pedidos, agendas, todas)
+    assert alocados == {'Q': 'D2', 'P': 'D1'} and not nao_alocados, (alocados, nao_alocados)
+    assert not sobreposicoes(estado_final(pedidos, agendas, alocados))
+
+    # O horário liberado por um pedido movido pode ser usado por outro
+    pedidos = [('A', h(8), h(9), 'D2'), ('B', h(8, 30), h(10), 'D3')]
+    agendas = {'D1': [(h(6), h(8))], 'D2': [(h(5), h(7))]}
+    alocados, _ = planejar_alocacao(pedidos, agendas, lambda pedido: ['D1', 'D2', 'D3'])
+    assert alocados == {'A': 'D1', 'B': 'D2'}, alocados
+    assert not sobreposicoes(estado_final(pedidos, agendas, alocados))
+
+    # R não tem doca compatível e continua ocupando a D1: S não pode ir para cima dele
+    pedidos = [('R', h(9), h(10), 'D1'), ('S', h(9, 30), h(11), 'D2')]
+    compativeis = {'R': [], 'S': ['D1']}
+    alocados, nao_alocados = planejar_alocacao(pedidos, {}, lambda pedido: compativeis[pedido[0]])
+    assert alocados == {} and nao_alocados == ['R', 'S'], (alocados, nao_alocados)
+    print('Casos fixos: ok')
+
+
+def sorteios(quantidade, semente=42):
+    aleatorio = random.Random(semente)
+    for _ in range(quantidade):
+        docas = [f'D{i}' for i in range(aleatorio.randint(1, 4))]
+        # Ocupações iniciais sem sobreposição: fixos e pedidos em cada doca
+        agendas = {}
+        pedidos = []
+        for doca_id in docas:
+            momento = h(aleatorio.randint(0, 3))
+            for _ in range(aleatorio.randint(0, 6)):
+                inicio = momento + timedelta(minutes=aleatorio.choice([0, 15, 30, 60]))
+                fim = inicio + timedelta(minutes=aleatorio.choice([30, 60, 90, 120]))
+                if aleatorio.random() < 0.4:
+                    agendas.setdefault(doca_id, []).append((inicio, fim))
+                else:
+                    pedidos.append((len(pedidos), inicio, fim, doca_id))
+                momento = fim
+        compativeis = {
+            pedido[0]: aleatorio.sample(docas, aleatorio.randint(0, len(docas)))
+            for pedido in pedidos
+        }
+        alocados, nao_alocados = planejar_alocacao(
+            pedidos, agendas, lambda pedido: compativeis[pedido[0]]
+        )
+        assert len(alocados) + len(nao_alocados) == len(pedidos)
+        pares = sobreposicoes(estado_final(pedidos, agendas, alocados))
+        assert not pares, (pedidos, agendas, alocados, pares)
+    print(f'Sorteios: {quantidade} ok')
+
+
+def banco():
+    app = create_app()
+    app.config.update(EMAIL_FILA_WORKERS=0)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(db.text('CREATE EXTENSION IF NOT EXISTS btree_gist'))
+            db.session.execute(db.text(RESTRICAO_POSTGRESQL))
+        terminal = Terminal(nome='Terminal Teste', endereco='Teste',
+                            horario_abertura=hora(0, 0), horario_fechamento=hora(23, 59))
+        d1, d2, d3 = (Doca(terminal=terminal, numero=f'D0{i}', tipo_carga='geral', status='ativa')
+                      for i in range(1, 4))
+        user = User(email='motorista@teste.com', nome='Motorista', empresa='Teste',
+                    tipo='usuario', email_confirmado=True, perfil_completo=True, nivel_acesso='completo')
+        user.set_password('senha-de-teste')
+        db.session.add_all([terminal, d1, d2, d3, user])
+        db.session.flush()
+
+        def agendamento(doca, inicio, fim, status):
+            return Agendamento(user_id=user.id, doca_id=doca.id, data_agendamento=inicio,
+                               duracao_estimada=int((fim - inicio).total_seconds() // 60),
+                               data_fim=fim, tipo_operacao='carga', placa_veiculo='ABC1234',
+                               nome_motorista='Motorista', status=status)
+
+        # B (id menor) vai para o horário de A na D2, que antes precisa ir para a D1
+        b = agendamento(d3, h(8, 30), h(10), 'pendente')
+        db.session.add(b)
+        db.session.flush()
+        a = agendamento(d2, h(8), h(9), 'pendente')
+        db.session.add_all([
+            a,
+            agendamento(d1, h(6), h(8), 'confirmado'),
+            agendamento(d2, h(5), h(7), 'confirmado'),
+        ])
+        db.session.commit()
+        ids = {a.id: 'A', b.id: 'B'}
+        docas = {d1.id: 'D1', d2.id: 'D2', d3.id: 'D3'}
+
+        alocados, nao_alocados = alocar_pendentes(DIA, DIA + timedelta(days=1))
+        assert (alocados, nao_alocados) == (2, 0), (alocados, nao_alocados)
+        db.session.expire_all()
+        finais = {ids[p.id]: docas[p.doca_id] for p in Agendamento.query.filter(Agendamento.id.in_(ids))}
+        assert finais == {'A': 'D1', 'B': 'D2'}, finais
+        ocupacoes = {}
+        for p in Agendamento.query.filter(Agendamento.status.in_(('pendente', 'confirmado'))):
+            ocupacoes.setdefault(p.doca_id, []).append((p.id, p.data_agendamento, p.data_fim))
+        assert not sobreposicoes(ocupacoes)
+        print(f'alocar_pendentes ({db.engine.dialect.name}): ok')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sorteios', type=int, default=2000)
+    args = parser.parse_args()
+    try:
+        casos_fixos()
+        sorteios(args.sorteios)
+        banco()
+    finally:
+        if _arquivo_db is not None:
+            os.unlink(_arquivo_db.name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Teste de carga: reservas simultâneas na mesma doca sem agendamento duplicado.
+
+Uso: python check_concorrencia.py [--reservas 400] [--threads 32] [--sem-trava]
+
+Dispara as reservas (POST /usuario/novo-agendamento) de várias threads ao
+mesmo tempo, todas na mesma doca e com horários que se sobrepõem, e ao final
+confere no banco que nenhum par de agendamentos ativos da doca se sobrepõe.
+Mostra reservas aceitas, recusadas por conflito e reservas por segundo.
+
+Usa um banco SQLite temporário, ou o banco de DATABASE_URL se definido (as
+tabelas são recriadas: não use num banco com dados). --sem-trava desliga
+app.scheduling.travar_docas para reproduzir a condição de corrida. No
+PostgreSQL a restrição de exclusão da migração 0008 também é criada; com
+--sem-trava é ela que barra as sobreposições.
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, time as hora, timedelta
+
+_arquivo_db = None
+if not os.environ.get('DATABASE_URL'):
+    _arquivo_db = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + _arquivo_db.name
+
+from app import create_app, db
+from app.models import Agendamento, Doca, Terminal, User
+from app.scheduling import STATUS_ATIVOS
+
+SENHA = 'senha-de-teste'
+
+# Mesma restrição da migração 0008 (as tabelas do teste vêm de create_all)
+RESTRICAO_POSTGRESQL = (
+    "ALTER TABLE agendamento ADD CONSTRAINT ex_agendamento_doca_sem_sobreposicao "
+    "EXCLUDE USING gist (doca_id WITH =, tsrange(data_agendamento, data_fim, '[)') WITH &&) "
+    "WHERE (status IN ('pendente', 'confirmado')) "
+    "DEFERRABLE INITIALLY IMMEDIATE"
+)
+
+
+def preparar(app, usuarios):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(db.text('CREATE EXTENSION IF NOT EXISTS btree_gist'))
+            db.session.execute(db.text(RESTRICAO_POSTGRESQL))
+        terminal = Terminal(nome='Terminal Teste', endereco='Teste',
+                            horario_abertura=hora(0, 0), horario_fechamento=hora(23, 59))
+        doca = Doca(terminal=terminal, numero='D01', tipo_carga='geral', status='ativa')
+        db.session.add_all([terminal, doca])
+        for i in range(usuarios):
+            user = User(email=f'motorista{i}@teste.com', nome=f'Motorista {i}', empresa='Teste',
+                        tipo='usuario', email_confirmado=True, perfil_completo=True, nivel_acesso='completo')
+            user.set_password(SENHA)
+            db.session.add(user)
+        db.session.commit()
+        return doca.id
+
+
+def contar_sobreposicoes(doca_id):
+    """Pares de agendamentos ativos da doca que se sobrepõem (deve ser zero)"""
+    a = db.aliased(Agendamento)
+    b = db.aliased(Agendamento)
+    return db.session.query(db.func.count()).select_from(a).join(b, db.and_(
+        a.doca_id == b.doca_id,
+        a.id < b.id,
+        a.data_agendamento < b.data_fim,
+        b.data_agendamento < a.data_fim
+    )).filter(
+        a.doca_id == doca_id,
+        a.status.in_(STATUS_ATIVOS),
+        b.status.in_(STATUS_ATIVOS)
+    ).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reservas', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--horarios', type=int, default=48,
+                        help='horários possíveis (a cada 30 min); menos horários = mais disputa')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--sem-trava', action='store_true')
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config.update(
+        WTF_CSRF_ENABLED=False,
+        EMAIL_FILA_WORKERS=0,
+        # Hash barato: o teste mede as reservas, não o login
+        PASSWORD_HASH_METHOD='pbkdf2:sha256:1000'
+    )
+    if args.sem_trava:
+        import app.routes.usuario as rotas_usuario
+        rotas_usuario.travar_docas = lambda doca_ids: None
+
+    doca_id = preparar(app, args.threads)
+    amanha = (datetime.now() + timedelta(days=1)).replace(hour=6, minute=0, second=0, microsecond=0)
+    sorteio = random.Random(args.seed)
+    pedidos = [
+        (amanha + timedelta(minutes=30 * sorteio.randrange(args.horarios)), sorteio.choice((30, 60, 90)))
+        for _ in range(args.reservas)
+    ]
+
+    clientes = []
+    for i in range(args.threads):
+        cliente = app.test_client()
+        cliente.post('/login', data={'email': f'motorista{i}@teste.com', 'password': SENHA})
+        clientes.append(cliente)
+
+    trava = threading.Lock()
+    resultados = {'aceitas': 0, 'recusadas': 0, 'erros': 0}
+    largada = threading.Barrier(args.threads)
+
+    def reservar(i):
+        cliente = clientes[i]
+        largada.wait()
+        for inicio, duracao in pedidos[i::args.threads]:
+            resposta = cliente.post('/usuario/novo-agendamento', data={
+                'doca_id': doca_id,
+                'data_agendamento': inicio.strftime('%Y-%m-%d %H:%M'),
+                'duracao_estimada': duracao,
+                'tipo_operacao': 'carga',
+                'tipo_carga': 'geral',
+                'placa_veiculo': 'ABC1D23',
+                'nome_motorista': f'Motorista {i}'
+            })
+            if resposta.status_code == 302:
+                chave = 'aceitas'
+            elif resposta.status_code == 200:
+                chave = 'recusadas'
+            else:
+                chave = 'erros'
+            with trava:
+                resultados[chave] += 1
+
+    threads = [threading.Thread(target=reservar, args=(i,)) for i in range(args.threads)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+
+    with app.app_context():
+        sobreposicoes = contar_sobreposicoes(doca_id)
+        gravadas = Agendamento.query.filter_by(doca_id=doca_id).count()
+        banco = db.engine.url.get_backend_name()
+
+    print(f'Banco: {banco} | trava por doca: {"não" if args.sem_trava else "sim"}')
+    print(f'{args.reservas} reservas em {args.threads} threads: {duracao:.2f}s ({args.reservas / duracao:.0f} reservas/s)')
+    print(f'Aceitas: {resultados["aceitas"]} | recusadas por conflito: {resultados["recusadas"]} | erros: {resultados["erros"]}')
+    print(f'Agendamentos gravados: {gravadas} | pares sobrepostos: {sobreposicoes}')
+
+    if _arquivo_db is not None:
+        os.unlink(_arquivo_db.name)
+    if sobreposicoes:
+        raise SystemExit('FALHA: agendamentos sobrepostos na mesma doca')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Mede a vazão da fila de emails contra um servidor SMTP local de teste.
+
+Uso: python check_email.py [--mensagens 2000] [--workers 4] [--falhas 0.0]
+
+Sobe um servidor SMTP mínimo em 127.0.0.1, enfileira as mensagens em um banco
+SQLite temporário e mede mensagens por segundo e conexões SMTP abertas pelos
+workers da fila, comparando com o envio antigo (uma conexão por mensagem).
+Localmente o custo dominante é montar o MIME; contra um servidor real o ganho
+da fila vem de não repetir o handshake TLS e a autenticação a cada mensagem.
+"""
+import argparse
+import os
+import random
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+
+_arquivo_db = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+os.environ['DATABASE_URL'] = 'sqlite:///' + _arquivo_db.name
+
+from app import create_app, db, mail
+from app.email import send_email
+from app.fila_email import DespachanteEmail, _mensagem
+from app.models import EmailSaida
+
+
+class ServidorSMTP(socketserver.ThreadingTCPServer):
+    """Servidor SMTP de teste: aceita tudo e apenas conta conexões e mensagens"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, endereco, taxa_falhas=0.0):
+        super().__init__(endereco, _SessaoSMTP)
+        self.taxa_falhas = taxa_falhas
+        self.trava = threading.Lock()
+        self.conexoes = 0
+        self.mensagens = 0
+        self.rejeitadas = 0
+
+
+class _SessaoSMTP(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        # Sem o algoritmo de Nagle: respostas curtas saem imediatamente
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _responder(self, linha):
+        self.wfile.write(linha.encode() + b'\r\n')
+
+    def handle(self):
+        servidor = self.server
+        with servidor.trava:
+            servidor.conexoes += 1
+        self._responder('220 localhost ESMTP teste')
+        while True:
+            linha = self.rfile.readline()
+            if not linha:
+                return
+            comando = linha.decode(errors='replace').strip().upper()
+            if comando.startswith(('EHLO', 'HELO')):
+                self._responder('250 localhost')
+            elif comando == 'DATA':
+                self._responder('354 fim com <CRLF>.<CRLF>')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                if random.random() < servidor.taxa_falhas:
+                    with servidor.trava:
+                        servidor.rejeitadas += 1
+                    self._responder('451 falha temporaria')
+                else:
+                    with servidor.trava:
+                        servidor.mensagens += 1
+                    self._responder('250 OK')
+            elif comando == 'QUIT':
+                self._responder('221 tchau')
+                return
+            else:
+                # MAIL FROM, RCPT TO, RSET, NOOP
+                self._responder('250 OK')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mensagens', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--falhas', type=float, default=0.0, help='Fração de mensagens rejeitadas pelo servidor.')
+    args = parser.parse_args()
+
+    servidor = ServidorSMTP(('127.0.0.1', 0), args.falhas)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    app = create_app()
+    app.config.update(
+        TESTING=False,
+        MAIL_SERVER='127.0.0.1',
+        MAIL_PORT=servidor.server_address[1],
+        MAIL_USE_TLS=False,
+        MAIL_USERNAME=None,
+        MAIL_PASSWORD=None,
+        MAIL_DEFAULT_SENDER='jit@localhost',
+        MAIL_SUPPRESS_SEND=False,
+        EMAIL_FILA_WORKERS=args.workers,
+        EMAIL_FILA_INTERVALO=1
+    )
+    mail.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        for numero in range(args.mensagens):
+            send_email(
+                subject=f'Teste {numero}',
+                sender='jit@localhost',
+                recipients=[f'usuario{numero}@localhost'],
+                text_body='Corpo de teste',
+                html_body='<p>Corpo de teste</p>'
+            )
+        db.session.commit()
+
+        # Envio pela fila
+        despachante = DespachanteEmail(app)
+        inicio = time.perf_counter()
+        despachante.iniciar()
+        while EmailSaida.query.filter(EmailSaida.status.in_(('pendente', 'enviando'))).filter(
+                EmailSaida.tentativas == 0).count():
+            db.session.remove()
+            time.sleep(0.05)
+        duracao = time.perf_counter() - inicio
+        despachante.parar()
+        db.session.remove()
+
+        enviados = EmailSaida.query.filter_by(status='enviado').count()
+        reagendados = EmailSaida.query.filter(EmailSaida.tentativas > 0).count()
+        print(f'Fila: {enviados} enviados em {duracao:.2f}s '
+              f'({enviados / duracao:.0f} msg/s) com {servidor.conexoes} conexão(ões) SMTP '
+              f'e {args.workers} worker(s); {reagendados} reagendado(s) para nova tentativa')
+
+        # Comparação: uma conexão por mensagem, como no envio antigo
+        amostra = min(args.mensagens, 200)
+        conexoes_antes = servidor.conexoes
+        inicio = time.perf_counter()
+        for email in EmailSaida.query.limit(amostra):
+            try:
+                with mail.connect() as conexao:
+                    conexao.send(_mensagem(email))
+            except Exception:
+                pass
+        duracao = time.perf_counter() - inicio
+        print(f'Uma conexão por mensagem: {amostra / duracao:.0f} msg/s '
+              f'({servidor.conexoes - conexoes_antes} conexões para {amostra} mensagens)')
+
+    servidor.shutdown()
+    os.unlink(_arquivo_db.name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Mede o custo do hash de senhas para cada configuração de PASSWORD_HASH_METHOD.
+
+Uso: python check_senhas.py [--metodos pbkdf2:sha256:600000,scrypt:32768:8:1]
+                            [--segundos 3] [--workers N] [--login]
+
+Para cada método mostra o tamanho do hash, verificações por segundo em um
+núcleo (uma thread) e com N threads em paralelo, como o pool de verificação
+de app.senhas com SENHA_WORKERS=N. Com --login mede também logins completos por segundo (POST /login
+pelo cliente de teste, banco SQLite temporário), que inclui a consulta do
+usuário, a sessão e o redirecionamento.
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_arquivo_db = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+os.environ['DATABASE_URL'] = 'sqlite:///' + _arquivo_db.name
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+METODOS_PADRAO = [
+    'pbkdf2:sha256:260000',
+    'pbkdf2:sha256:600000',
+    'scrypt:16384:8:1',
+    'scrypt:32768:8:1',
+]
+
+
+def medir(funcao, segundos, threads=1):
+    """Executa funcao() em `threads` threads por `segundos`; retorna chamadas por segundo"""
+    fim = time.perf_counter() + segundos
+    contagens = [0] * threads
+
+    def laco(i):
+        while time.perf_counter() < fim:
+            funcao()
+            contagens[i] += 1
+
+    inicio = time.perf_counter()
+    if threads == 1:
+        laco(0)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(laco, range(threads)))
+    return sum(contagens) / (time.perf_counter() - inicio)
+
+
+def medir_login(metodo, segundos):
+    from app import create_app, db
+    from app.models import User
+
+    app = create_app()
+    app.config.update(PASSWORD_HASH_METHOD=metodo, WTF_CSRF_ENABLED=False, EMAIL_FILA_WORKERS=0)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(email='motorista@teste.com', nome='Motorista', tipo='usuario',
+                    email_confirmado=True, perfil_completo=True, nivel_acesso='completo')
+        user.set_password('senha-de-teste')
+        db.session.add(user)
+        db.session.commit()
+
+    cliente = app.test_client()
+    dados = {'email': 'motorista@teste.com', 'password': 'senha-de-teste'}
+
+    def login():
+        resposta = cliente.post('/login', data=dados)
+        assert resposta.status_code == 302, resposta.status_code
+
+    return medir(login, segundos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--metodos', default=','.join(METODOS_PADRAO))
+    parser.add_argument('--segundos', type=float, default=3)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--login', action='store_true', help='mede também logins completos')
+    args = parser.parse_args()
+
+    print(f'{os.cpu_count()} núcleo(s); pool com {args.workers} worker(s)\n')
+    cabecalho = f'{"método":<24}{"tamanho":>8}{"verif/s 1 núcleo":>18}{"verif/s pool":>14}'
+    if args.login:
+        cabecalho += f'{"logins/s":>10}'
+    print(cabecalho)
+
+    for metodo in args.metodos.split(','):
+        hash_senha = generate_password_hash('senha-de-teste', method=metodo)
+        verificar = lambda: check_password_hash(hash_senha, 'senha-de-teste')
+        por_nucleo = medir(verificar, args.segundos)
+        no_pool = medir(verificar, args.segundos, threads=args.workers)
+        linha = f'{metodo:<24}{len(hash_senha):>8}{por_nucleo:>18.1f}{no_pool:>14.1f}'
+        if args.login:
+            linha += f'{medir_login(metodo, args.segundos):>10.1f}'
+        print(linha)
+
+    os.unlink(_arquivo_db.name)
+
+
+if __name__ == '__main__':
+    main()
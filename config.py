@@ -5,6 +5,11 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-key-jit-scheduler-2024'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///jit_scheduler.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # SQLite: reservas concorrentes esperam o bloqueio de escrita em vez de falhar
+    # com "database is locked" (ver app.scheduling.travar_docas)
+    SQLALCHEMY_ENGINE_OPTIONS = (
+        {'connect_args': {'timeout': 30}} if SQLALCHEMY_DATABASE_URI.startswith('sqlite') else {}
+    )
 
     # Configurações de Email - SEGURAS
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
@@ -15,4 +20,54 @@ class Config:
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER')  # ← REMOVA o email padrão
 
     # Assunto dos emails
-    EMAIL_SUBJECT_PREFIX = '[Sistema JIT] '
\ No newline at end of file
+    EMAIL_SUBJECT_PREFIX = '[Sistema JIT] '
+
+    # Fila de emails: workers no processo web (0 = usar apenas `flask enviar-emails`),
+    # mensagens reservadas por vez, tentativas antes de desistir e intervalo de verificação
+    EMAIL_FILA_WORKERS = int(os.environ.get('EMAIL_FILA_WORKERS', 2))
+    EMAIL_FILA_LOTE = int(os.environ.get('EMAIL_FILA_LOTE', 20))
+    EMAIL_FILA_TENTATIVAS = int(os.environ.get('EMAIL_FILA_TENTATIVAS', 5))
+    EMAIL_FILA_INTERVALO = int(os.environ.get('EMAIL_FILA_INTERVALO', 30))
+
+    # Aviso de novos agendamentos aos administradores: 'imediato' (um email por
+    # agendamento) ou 'resumo' (um email por administrador a cada janela)
+    EMAIL_ADMIN_MODO = os.environ.get('EMAIL_ADMIN_MODO', 'imediato')
+    EMAIL_ADMIN_JANELA_MINUTOS = int(os.environ.get('EMAIL_ADMIN_JANELA_MINUTOS', 15))
+
+    # Segundos em que o retrato de terminais e docas (app.topologia) é usado sem
+    # consultar o banco; é o atraso máximo para outros processos verem alterações
+    TOPOLOGIA_TTL = int(os.environ.get('TOPOLOGIA_TTL', 30))
+
+    # Segundos em que um usuário autenticado é servido do cache de load_user e
+    # intervalo entre as gravações em lote de data_ultimo_acesso
+    USUARIOS_CACHE_TTL = int(os.environ.get('USUARIOS_CACHE_TTL', 30))
+    ULTIMO_ACESSO_INTERVALO = int(os.environ.get('ULTIMO_ACESSO_INTERVALO', 60))
+
+    # Método e custo do hash de senhas (formato do werkzeug). O padrão equivale
+    # ao do werkzeug 2.3; 'scrypt:32768:8:1' é mais resistente e mais caro.
+    # Hashes antigos são regravados no próximo login. SENHA_WORKERS limita as
+    # verificações simultâneas (padrão: um por núcleo)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    SENHA_WORKERS = int(os.environ.get('SENHA_WORKERS', os.cpu_count() or 1))
+
+    # Métricas por endpoint (latência, SQL, fila de emails) em /admin/metrics
+    METRICAS_ATIVAS = os.environ.get('METRICAS_ATIVAS', '1') == '1'
+
+    # Registro de consultas lentas com EXPLAIN (/admin/consultas-lentas): desligado
+    # por padrão; comandos a partir de CONSULTAS_LENTAS_LIMITE_MS, últimas N ocorrências
+    CONSULTAS_LENTAS_ATIVAS = os.environ.get('CONSULTAS_LENTAS_ATIVAS', '0') == '1'
+    CONSULTAS_LENTAS_LIMITE_MS = int(os.environ.get('CONSULTAS_LENTAS_LIMITE_MS', 200))
+    CONSULTAS_LENTAS_TAMANHO = int(os.environ.get('CONSULTAS_LENTAS_TAMANHO', 200))
+
+    # Perfil sob demanda (?perfilar=1 ou X-Perfilar: 1, só administradores):
+    # intervalo de amostragem e perfis mantidos em /admin/perfis
+    PERFILADOR_INTERVALO_MS = float(os.environ.get('PERFILADOR_INTERVALO_MS', 2))
+    PERFIS_TAMANHO = int(os.environ.get('PERFIS_TAMANHO', 20))
+
+    # Arquivamento (flask arquivar-agendamentos): idade mínima, em dias, dos
+    # agendamentos encerrados movidos para o arquivo e linhas movidas por transação
+    ARQUIVAMENTO_IDADE_DIAS = int(os.environ.get('ARQUIVAMENTO_IDADE_DIAS', 365))
+    ARQUIVAMENTO_LOTE = int(os.environ.get('ARQUIVAMENTO_LOTE', 1000))
+
+    # Tamanho das páginas das listagens de agendamentos
+    ITENS_POR_PAGINA = int(os.environ.get('ITENS_POR_PAGINA', 50))
@@ -0,0 +1,40 @@
+"""sem sobreposicao de agendamentos no postgresql
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 08:04:39.382654
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Apenas PostgreSQL: duas reservas ativas da mesma doca não podem se
+    # sobrepor, mesmo que a gravação não passe por app.scheduling.travar_docas.
+    # Falha se já houver sobreposições ativas; elas precisam ser resolvidas antes.
+    # DEFERRABLE INITIALLY IMMEDIATE: cada INSERT/UPDATE continua verificado na
+    # hora, e a realocação em lote (app.scheduling.alocar_pendentes) adia a
+    # verificação para o commit, já que move pedidos para horários que outros deixaram.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.execute(
+        "ALTER TABLE agendamento ADD CONSTRAINT ex_agendamento_doca_sem_sobreposicao "
+        "EXCLUDE USING gist (doca_id WITH =, tsrange(data_agendamento, data_fim, '[)') WITH &&) "
+        "WHERE (status IN ('pendente', 'confirmado')) "
+        "DEFERRABLE INITIALLY IMMEDIATE"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("ALTER TABLE agendamento DROP CONSTRAINT ex_agendamento_doca_sem_sobreposicao")
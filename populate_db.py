@@ -1,8 +1,251 @@
+"""Popula o banco com os dados de demonstração e, opcionalmente, um volume sintético.
+
+Uso:
+    python populate_db.py
+    python populate_db.py --agendamentos 2000000 --terminais 8 --docas 12 --usuarios 500 --seed 42
+
+Sem opções cria apenas os dados de demonstração (usuários de teste, dois
+terminais, cinco docas e dois agendamentos). Com --agendamentos N gera também
+terminais, docas, transportadoras e N agendamentos sem sobreposição por doca,
+distribuídos dia a dia a partir de --inicio conforme a ocupação desejada.
+
+A geração é determinística: mesmos --seed, --inicio (ou --hoje) e demais
+opções produzem os mesmos dados; --hoje separa os agendamentos passados dos
+futuros na escolha do status. As linhas são gravadas em lotes (executemany;
+COPY no PostgreSQL), sem passar pelo ORM. Transportadoras geradas usam a
+senha user123.
+"""
+import argparse
+import csv
+import io
+import random
+import time as relogio
 from app import create_app, db 
 from app.models import User, Terminal, Doca, Agendamento 
-from datetime import datetime, time 
- 
-def populate_database(): 
+from app.resumo import reconstruir as reconstruir_resumo 
+from app import utilizacao
+from datetime import date, datetime, time, timedelta
+
+# Distribuições usadas na geração (valor, peso)
+TIPOS_CARGA = [('geral', 50), ('frigorifica', 20), ('granel', 15), ('perigosa', 15)]
+DURACOES = [(30, 15), (45, 10), (60, 35), (90, 20), (120, 15), (180, 5)]
+TIPOS_OPERACAO = [('carga', 45), ('descarga', 45), ('ambos', 10)]
+# Horários de funcionamento possíveis; (0, 0) = 24 horas
+HORARIOS = [((6, 0), (22, 0)), ((7, 0), (19, 0)), ((8, 0), (18, 0)), ((0, 0), (0, 0))]
+# Status por situação do agendamento em relação a --hoje
+STATUS_PASSADOS = [('confirmado', 75), ('cancelado', 12), ('rejeitado', 8), ('pendente', 5)]
+STATUS_FUTUROS = [('pendente', 40), ('confirmado', 50), ('cancelado', 10)]
+
+NOMES = ['Ana', 'Bruno', 'Carlos', 'Daniela', 'Eduardo', 'Fernanda', 'Gilberto', 'Helena',
+         'Igor', 'Joana', 'Luís', 'Marta', 'Nuno', 'Olga', 'Paulo', 'Rita', 'Sérgio', 'Tânia']
+SOBRENOMES = ['Silva', 'Santos', 'Macuácua', 'Nhantumbo', 'Cossa', 'Mondlane', 'Tembe',
+              'Sitoe', 'Langa', 'Machava', 'Oliveira', 'Pereira']
+CIDADES = ['Maputo', 'Matola', 'Beira', 'Nacala', 'Nampula', 'Quelimane', 'Tete', 'Pemba']
+
+COLUNAS_AGENDAMENTO = [
+    'user_id', 'doca_id', 'data_agendamento', 'duracao_estimada', 'data_fim',
+    'tipo_operacao', 'tipo_carga', 'placa_veiculo', 'nome_motorista', 'telefone_motorista',
+    'status', 'data_criacao', 'data_atualizacao', 'data_cancelamento'
+]
+
+
+def _sortear(aleatorio, opcoes):
+    valores, pesos = zip(*opcoes)
+    return aleatorio.choices(valores, pesos)[0]
+
+
+def _placa(aleatorio):
+    letras = 'ABCDEFGHJKLMNPRSTUVWXYZ'
+    return (''.join(aleatorio.choice(letras) for _ in range(3)) + str(aleatorio.randrange(10))
+            + aleatorio.choice(letras) + f'{aleatorio.randrange(100):02d}')
+
+
+def _telefone(aleatorio):
+    return f'+258 8{aleatorio.choice("234567")} {aleatorio.randrange(1000000, 10000000)}'
+
+
+def gerar_topologia(aleatorio, terminais, docas_por_terminal):
+    """Cria terminais e docas (poucas linhas: ORM)"""
+    criadas = []
+    for i in range(terminais):
+        abertura, fechamento = aleatorio.choice(HORARIOS)
+        terminal = Terminal(
+            nome=f'Terminal {CIDADES[i % len(CIDADES)]} {i // len(CIDADES) + 1:02d}',
+            endereco=f'Av. Marginal, {100 + i * 10} - {CIDADES[i % len(CIDADES)]}',
+            telefone=_telefone(aleatorio),
+            horario_abertura=time(*abertura),
+            horario_fechamento=time(*fechamento)
+        )
+        for j in range(docas_por_terminal):
+            criadas.append(Doca(terminal=terminal, numero=f'G{j + 1:02d}',
+                                tipo_carga=_sortear(aleatorio, TIPOS_CARGA), status='ativa'))
+    db.session.add_all(criadas)
+    db.session.commit()
+    return criadas
+
+
+def gerar_usuarios(aleatorio, quantidade, lote):
+    """Cria as transportadoras em lote; todas com o mesmo hash de senha"""
+    modelo = User(email='modelo@x')
+    modelo.set_password('user123')
+    agora = datetime.utcnow()
+    linhas = []
+    for i in range(quantidade):
+        nome = f'{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)}'
+        linhas.append({
+            'email': f'transportadora{i + 1:05d}@carga.teste',
+            'password_hash': modelo.password_hash,
+            'nome': nome,
+            'empresa': f'Transportes {aleatorio.choice(SOBRENOMES)} {i + 1:05d}',
+            'tipo': 'usuario',
+            'telefone': _telefone(aleatorio),
+            'cidade': aleatorio.choice(CIDADES),
+            'email_confirmado': True,
+            'perfil_completo': True,
+            'nivel_acesso': 'completo',
+            'ativo': True,
+            'data_criacao': agora
+        })
+    for i in range(0, len(linhas), lote):
+        db.session.execute(db.insert(User), linhas[i:i + lote])
+    db.session.commit()
+    return [id for id, in db.session.query(User.id).filter(User.email.like('%@carga.teste')).order_by(User.id)]
+
+
+def _janela(dia, terminal):
+    inicio = datetime.combine(dia, terminal.horario_abertura)
+    fim = datetime.combine(dia, terminal.horario_fechamento)
+    if fim <= inicio:
+        fim += timedelta(days=1)
+    return inicio, fim
+
+
+def gerar_agendamentos(aleatorio, docas, usuarios, total, inicio, hoje, ocupacao):
+    """Gera os agendamentos dia a dia, doca a doca, sem sobreposição na mesma doca.
+
+    Em cada doca os agendamentos são encadeados dentro da janela de
+    funcionamento, com intervalos livres sorteados de forma que a fração
+    ocupada fique perto de `ocupacao`.
+    """
+    gerados = 0
+    dia = inicio
+    while gerados < total:
+        for doca in docas:
+            cursor, fim_janela = _janela(dia, doca.terminal)
+            while gerados < total:
+                duracao = _sortear(aleatorio, DURACOES)
+                # Intervalo livre médio proporcional à duração, arredondado a 15 minutos
+                folga = aleatorio.expovariate(ocupacao / (duracao * (1 - ocupacao) + 1))
+                cursor += timedelta(minutes=int(folga // 15) * 15)
+                fim = cursor + timedelta(minutes=duracao)
+                if fim > fim_janela:
+                    break
+                passado = cursor.date() < hoje
+                status = _sortear(aleatorio, STATUS_PASSADOS if passado else STATUS_FUTUROS)
+                criacao = cursor - timedelta(hours=aleatorio.randrange(2, 24 * 14))
+                yield (
+                    aleatorio.choice(usuarios), doca.id, cursor, duracao, fim,
+                    _sortear(aleatorio, TIPOS_OPERACAO), doca.tipo_carga, _placa(aleatorio),
+                    f'{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)}', _telefone(aleatorio),
+                    status, criacao, criacao,
+                    criacao + timedelta(hours=1) if status == 'cancelado' else None
+                )
+                gerados += 1
+                cursor = fim
+            if gerados >= total:
+                break
+        dia += timedelta(days=1)
+
+
+def _gravar_copy(linhas):
+    """COPY ... FROM STDIN (PostgreSQL)"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    for linha in linhas:
+        escritor.writerow('' if valor is None else valor for valor in linha)
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert(
+        f"COPY agendamento ({', '.join(COLUNAS_AGENDAMENTO)}) FROM STDIN WITH (FORMAT csv)", buffer
+    )
+
+
+def _gravar_executemany(linhas):
+    # INSERT do Core direto na tabela: um único executemany por lote (o INSERT
+    # em lote do ORM divide o lote conforme as colunas nulas de cada linha)
+    db.session.execute(Agendamento.__table__.insert(), [dict(zip(COLUNAS_AGENDAMENTO, linha)) for linha in linhas])
+
+
+def gravar_agendamentos(linhas, lote):
+    """Grava as linhas em lotes, um commit por lote"""
+    gravar = _gravar_copy if db.engine.dialect.name == 'postgresql' else _gravar_executemany
+    pendentes = []
+    gravados = 0
+    inicio = relogio.perf_counter()
+    for linha in linhas:
+        pendentes.append(linha)
+        if len(pendentes) >= lote:
+            gravar(pendentes)
+            db.session.commit()
+            gravados += len(pendentes)
+            pendentes = []
+            print(f'  {gravados} agendamentos ({gravados / (relogio.perf_counter() - inicio):.0f}/s)', end='\r')
+    if pendentes:
+        gravar(pendentes)
+        db.session.commit()
+        gravados += len(pendentes)
+    print(f'  {gravados} agendamentos em {relogio.perf_counter() - inicio:.1f}s' + ' ' * 20)
+    return gravados
+
+
+def gerar_volume(args):
+    aleatorio = random.Random(args.seed)
+    if db.engine.dialect.name == 'sqlite':
+        # Carga descartável: sem fsync a cada commit
+        db.session.execute(db.text('PRAGMA synchronous=OFF'))
+    docas = gerar_topologia(aleatorio, args.terminais, args.docas)
+    print(f'  {args.terminais} terminais e {len(docas)} docas')
+    usuarios = gerar_usuarios(aleatorio, args.usuarios, args.lote)
+    print(f'  {len(usuarios)} transportadoras')
+    gravar_agendamentos(
+        gerar_agendamentos(aleatorio, docas, usuarios, args.agendamentos,
+                           args.inicio, args.hoje, args.ocupacao),
+        args.lote
+    )
+
+
+def _data(valor):
+    return datetime.strptime(valor, '%Y-%m-%d').date()
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description='Popula o banco (demonstração e volume sintético)')
+    parser.add_argument('--agendamentos', type=int, default=0, help='agendamentos sintéticos (0 = só demonstração)')
+    parser.add_argument('--terminais', type=int, default=4)
+    parser.add_argument('--docas', type=int, default=10, help='docas por terminal')
+    parser.add_argument('--usuarios', type=int, default=200, help='transportadoras')
+    parser.add_argument('--inicio', type=_data,
+                        help='primeiro dia (AAAA-MM-DD; padrão: 90 dias antes de --hoje)')
+    parser.add_argument('--hoje', type=_data,
+                        help='data de referência dos status passados/futuros (AAAA-MM-DD; padrão: --inicio + 90 dias, '
+                             'ou a data atual se nenhuma das duas for informada)')
+    parser.add_argument('--ocupacao', type=float, default=0.6, help='fração ocupada de cada doca (0-1)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--lote', type=int, default=20000, help='linhas por lote/commit')
+    args = parser.parse_args()
+    if not 0 < args.ocupacao < 1:
+        parser.error('--ocupacao deve estar entre 0 e 1')
+    if args.agendamentos and min(args.terminais, args.docas, args.usuarios) < 1:
+        parser.error('--terminais, --docas e --usuarios devem ser ao menos 1 ao gerar agendamentos')
+    # Com --inicio ou --hoje a geração não depende do dia em que é executada
+    if args.hoje is None:
+        args.hoje = args.inicio + timedelta(days=90) if args.inicio else date.today()
+    if args.inicio is None:
+        args.inicio = args.hoje - timedelta(days=90)
+    return args
+
+
+def populate_database(args): 
     app = create_app() 
  
     with app.app_context(): 
@@ -90,6 +333,13 @@ def populate_database():
                            doca1, doca2, doca3, doca4, doca5, 
                            agendamento1, agendamento2]) 
         db.session.commit() 
+
+        if args.agendamentos:
+            print('Gerando volume sintético...')
+            gerar_volume(args)
+
+        reconstruir_resumo() 
+        utilizacao.atualizar(completo=True)
  
         print('Banco de dados populado com sucesso!') 
         print(f'Usuarios criados: {User.query.count()}') 
@@ -98,4 +348,4 @@ def populate_database():
         print(f'Agendamentos criados: {Agendamento.query.count()}') 
  
 if __name__ == '__main__': 
-    populate_database() 
+    populate_database(_argumentos()) 